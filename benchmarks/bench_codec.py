@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Decode/encode time of the available JSON codecs over the bundled schema fixtures.
+
+Each fixture of docs/source/schemas is decoded from bytes, as the client does with
+response bodies. The largest list of each one (or the object itself) is replicated to
+reach multi-MB payloads, like asset searches and assessment results.
+
+Usage:
+    python -m benchmarks.bench_codec [target size in MB]
+"""
+import os
+import sys
+import json
+import time
+
+from dome9.codec import CODECS
+
+SCHEMAS = os.path.join(os.path.dirname(__file__), '..', 'docs', 'source', 'schemas')
+
+
+def inflate(obj, size):
+    """Replicate the largest top-level list of `obj` (or `obj` itself) until its JSON is about `size` bytes"""
+    if isinstance(obj, dict):
+        lists = [k for k, v in obj.items() if isinstance(v, list) and v]
+        if lists:
+            key = max(lists, key=lambda k: len(json.dumps(obj[k])))
+            return dict(obj, **{key: inflate(obj[key], size)})
+    factor = max(1, size // len(json.dumps(obj)))
+    return obj * factor if isinstance(obj, list) else [obj] * factor
+
+
+def timed(func, arg, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def available():
+    codecs = []
+    for name, codec in CODECS.items():
+        try:
+            codecs.append(codec())
+        except ImportError:
+            pass
+    return codecs
+
+
+def main(megabytes=4):
+    codecs = available()
+    print('%-28s %8s  %s' % ('fixture', 'size', '  '.join('%14s' % c.name for c in codecs)))
+    for name in sorted(os.listdir(SCHEMAS)):
+        obj = inflate(json.load(open(os.path.join(SCHEMAS, name))), int(megabytes * 2 ** 20))
+        data = json.dumps(obj).encode()
+        decode = ['%6.1f/%-6.1fms' % (timed(c.loads, data) * 1000, timed(c.encode, obj) * 1000) for c in codecs]
+        print('%-28s %6.1fMB  %s' % (name, len(data) / 2 ** 20, '  '.join(decode)))
+    print('(decode/encode, best of 5)')
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:]])
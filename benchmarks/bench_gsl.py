@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Offline GSL evaluation of a ruleset over a synthetic inventory.
+
+Reports the compile time of the ruleset and the rule evaluations per second of
+RulesetEvaluator, rules being evaluated only on the entities of their type.
+
+Usage:
+    python -m benchmarks.bench_gsl [entities]
+"""
+import sys
+import time
+import random
+
+from dome9.gsl import RulesetEvaluator
+
+RULES = [
+    "Instance should have tags contain [key='Owner']",
+    "Instance where isPublic=true should not have nics contain [securityGroups contain [inboundRules contain "
+    "[port<=22 and portTo>=22 and scope='0.0.0.0/0']]]",
+    "Instance should have imageId regexMatch /^ami-[0-9a-f]+$/",
+    "Instance where region in('us_east_1', 'us_west_2') should have vpc.id like 'vpc-%'",
+    "IamUser where passwordEnabled=true should have mfaActive=true",
+    "IamUser should not have firstAccessKey with [isActive=true and lastRotated before(-90, 'days')]",
+    "IamUser should have policies isEmpty()",
+    "S3Bucket should have encryption.serverSideEncryptionRules length() > 0",
+    "S3Bucket should not have acl.grants contain [uri like '%AllUsers' or uri like '%AuthenticatedUsers']",
+    "S3Bucket where tags contain-none [key='public'] should have publicAccessBlock.blockPublicAcls=true",
+    "SecurityGroup should not have inboundRules contain [scope='0.0.0.0/0' and (port=3389 or port=22)]",
+    "SecurityGroup should have description unlike 'launch-wizard%'",
+]
+
+
+def synthetic_inventory(entities):
+    random.seed(1)
+    regions = ['us_east_1', 'us_west_2', 'eu_west_1', 'ap_south_1']
+
+    def rule():
+        return {'port': random.choice([22, 80, 443, 3389]), 'portTo': random.choice([22, 443, 3389]),
+                'scope': random.choice(['0.0.0.0/0', '10.0.0.0/8'])}
+
+    def tags():
+        return [{'key': key, 'value': 'x'} for key in random.sample(['Owner', 'env', 'public', 'team'], 2)]
+
+    factories = [
+        lambda n: {'type': 'Instance', 'id': 'i-%08d' % n, 'region': random.choice(regions), 'tags': tags(),
+                   'isPublic': random.random() > 0.8, 'imageId': 'ami-%08x' % n, 'vpc': {'id': 'vpc-%d' % (n % 10)},
+                   'nics': [{'securityGroups': [{'inboundRules': [rule() for _ in range(3)]}]}]},
+        lambda n: {'type': 'IamUser', 'id': 'user-%d' % n, 'passwordEnabled': random.random() > 0.5,
+                   'mfaActive': random.random() > 0.3, 'policies': random.choice([[], ['admin']]),
+                   'firstAccessKey': {'isActive': True, 'lastRotated': '2021-0%d-01T00:00:00Z' % random.randint(1, 9)}},
+        lambda n: {'type': 'S3Bucket', 'id': 'bucket-%d' % n, 'tags': tags(),
+                   'encryption': {'serverSideEncryptionRules': random.choice([[], [{'algorithm': 'AES256'}]])},
+                   'acl': {'grants': [{'uri': random.choice(['http://acs/AllUsers', 'http://acs/Owner'])}]},
+                   'publicAccessBlock': {'blockPublicAcls': random.random() > 0.2}},
+        lambda n: {'type': 'SecurityGroup', 'id': 'sg-%d' % n, 'description': random.choice(['web', 'launch-wizard-1']),
+                   'inboundRules': [rule() for _ in range(5)]},
+    ]
+    return [factories[n % len(factories)](n) for n in range(entities)]
+
+
+def main(entities=100000):
+    inventory = synthetic_inventory(entities)
+    start = time.perf_counter()
+    evaluator = RulesetEvaluator([{'name': 'rule %d' % n, 'logic': logic} for n, logic in enumerate(RULES)])
+    compiled = time.perf_counter() - start
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        result = evaluator.evaluate(inventory)
+        best = min(best, time.perf_counter() - start)
+    evaluations = sum(test['testedCount'] for test in result['tests'])
+    failed = sum(test['nonComplyingCount'] for test in result['tests'])
+    print('%d rules compiled in %.2fms' % (len(RULES), compiled * 1000))
+    print('%d entities, %d evaluations (%d failed) in %.3fs: %.0f evaluations/s, %.0f entities/s' % (
+        entities, evaluations, failed, best, evaluations / best, entities / best))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Dict walking vs AssessmentTable for the usual assessment aggregations.
+
+Usage:
+    python -m benchmarks.bench_table [entities]
+"""
+import sys
+import time
+import random
+import tracemalloc
+from collections import Counter
+
+from dome9.table import AssessmentTable, SEVERITIES
+
+
+def synthetic_result(entities, rules=200):
+    random.seed(1)
+    regions = ['us_east_1', 'us_west_2', 'eu_west_1', 'ap_south_1']
+    tests = []
+    for r in range(rules):
+        tests.append({
+            'rule': {'name': 'rule %d' % r, 'ruleId': 'D9.AWS.%d' % r, 'severity': random.choice(SEVERITIES)},
+            'entityResults': [{
+                'isRelevant': random.random() > 0.1, 'isValid': random.random() > 0.3,
+                'isExcluded': random.random() > 0.95, 'exclusionId': None, 'remediationId': None,
+                'validationStatus': 'Relevant',
+                'testObj': {'id': 'i-%08d' % e, 'entityType': 'Instance', 'region': random.choice(regions)},
+            } for e in range(entities // rules)],
+        })
+    return {'tests': tests}
+
+
+def walk(result):
+    bySeverity = Counter()
+    byRegion = Counter()
+    for test in result['tests']:
+        for er in test['entityResults']:
+            if er['isRelevant'] and not er['isValid'] and not er['isExcluded']:
+                bySeverity[test['rule']['severity']] += 1
+                byRegion[(er['testObj']['region'], test['rule']['severity'])] += 1
+    return bySeverity, byRegion
+
+
+def columnar(table):
+    return table.count_by('severity', status='failed'), table.count_by('region', 'severity', status='failed')
+
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main(entities=200000):
+    tracemalloc.start()
+    result = synthetic_result(entities)
+    dictBytes = tracemalloc.get_traced_memory()[0]
+    table = AssessmentTable.from_result(result)
+    tableBytes = tracemalloc.get_traced_memory()[0] - dictBytes
+    tracemalloc.stop()
+
+    walkTime, expected = timed(walk, result)
+    tableTime, got = timed(columnar, table)
+    assert expected[0] == got[0] and expected[1] == got[1]
+    print('entities: %d' % len(table))
+    print('memory  dicts: %.1f MB  table: %.1f MB' % (dictBytes / 1e6, tableBytes / 1e6))
+    print('group-by  dicts: %.1f ms  table: %.1f ms  (x%.1f)' % (walkTime * 1e3, tableTime * 1e3, walkTime / tableTime))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Per-call latency of one-shot ``requests.get`` vs the pooled Dome9 transport.
+
+Usage:
+    python -m benchmarks.bench_transport [calls]
+"""
+import sys
+import time
+
+import requests
+
+from dome9 import Dome9
+from benchmarks.server import MockServer
+
+
+def one_shot(url, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        requests.get(url, auth=('key', 'secret')).json()
+    return (time.perf_counter() - start) / calls
+
+
+def pooled(endpoint, calls):
+    with Dome9('key', 'secret', endpoint=endpoint) as d9:
+        start = time.perf_counter()
+        for _ in range(calls):
+            d9._get('CloudAccounts')
+        return (time.perf_counter() - start) / calls
+
+
+def main(calls=500):
+    with MockServer() as server:
+        url = server.url + '/v2/CloudAccounts'
+        fresh = one_shot(url, calls)
+        reused = pooled(server.url, calls)
+    print('calls: %d' % calls)
+    print('one-shot requests.get : %.3f ms/call' % (fresh * 1000))
+    print('pooled transport      : %.3f ms/call' % (reused * 1000))
+    print('speed-up              : x%.2f' % (fresh / reused))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
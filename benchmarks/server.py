@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Local stand-in of the Dome9 API used by the benchmarks.
+
+Responses are generated from the documented schemas (docs/source/schemas), with
+configurable latency, number of assets, page sizes, assessment size and a rate of
+throttled (HTTP 429) responses.
+"""
+import os
+import copy
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCHEMAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docs', 'source', 'schemas')
+REGIONS = ('us_east_1', 'us_west_2', 'eu_west_1', 'eu_central_1', 'ap_south_1', 'ap_northeast_1')
+ACCOUNT_ROUTES = {'CloudAccounts': 'AwsCloudAccount', 'AzureCloudAccount': 'AzureCloudAccount',
+                  'GoogleCloudAccount': 'GoogleCloudAccount', 'KubernetesAccount': 'KubernetesCloudAccount'}
+RESOURCES = {'Exclusion': 'Exclusion', 'user': 'User', 'CompliancePolicy': 'ComplianceRuleset'}
+
+
+def schema(name):
+    with open(os.path.join(SCHEMAS, name + '.json')) as f:
+        return json.load(f)
+
+
+class MockAPI(object):
+    """State and behaviour of the mock API
+
+    Args:
+        latency (float): Seconds every response is delayed.
+        assets (int): Number of protected assets.
+        accounts (int): Cloud accounts per vendor.
+        entities (int): Entity results of an assessment.
+        rules (int): Rules (tests) of an assessment.
+        throttle (float): Fraction of the requests answered with HTTP 429.
+        seed (int): Random seed, so runs are reproducible.
+    """
+
+    def __init__(self, latency=0.0, assets=10000, accounts=50, entities=20000, rules=100, throttle=0.0, seed=1):
+        self.latency = latency
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0}
+        self.assets = self._assets(assets)
+        self.accounts = dict((route, self._accounts(name, accounts)) for route, name in ACCOUNT_ROUTES.items())
+        self.assessment = json.dumps(self._assessment(entities, rules)).encode('utf-8')
+        self.resources = dict((route, {}) for route in RESOURCES)
+        self.nextId = 1
+
+    def _assets(self, count):
+        template = schema('ProtectedAsset')['assets'][0]
+        assets = []
+        for n in range(count):
+            asset = copy.deepcopy(template)
+            asset['id'] = '%s|%08d' % (template['id'], n)
+            asset['entityId'] = 'i-%08d' % n
+            asset['region'] = REGIONS[n % len(REGIONS)]
+            assets.append(asset)
+        return assets
+
+    def _accounts(self, name, count):
+        template = schema(name)
+        return [dict(template, id='%s-%04d' % (name, n), name='account %d' % n) for n in range(count)]
+
+    def _assessment(self, entities, rules):
+        result = schema('AssessmentResult')
+        test = result['tests'][0]
+        entityResult = test['entityResults'][0]
+        tests = []
+        for r in range(rules):
+            rule = dict(test['rule'], name='rule %d' % r, ruleId='D9.BENCH.%d' % r, logicHash='hash%d' % r)
+            entityResults = []
+            for e in range(entities // rules):
+                valid = self.random.random() > 0.3
+                entityResults.append(dict(entityResult, isValid=valid, isExcluded=False, testObj={
+                    'id': 'i-%08d' % e, 'entityType': 'Instance', 'region': REGIONS[e % len(REGIONS)],
+                    'tags': [{'key': 'env', 'value': 'bench'}], 'description': 'x' * 200}))
+            tests.append(dict(test, rule=rule, entityResults=entityResults))
+        result['tests'] = tests
+        return result
+
+    def throttled(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.throttle and self.random.random() < self.throttle:
+                self.stats['throttled'] += 1
+                return True
+        return False
+
+    def search(self, payload):
+        size = payload.get('pageSize') or 1000
+        fields = dict((f['name'], f['value']) for f in payload.get('filter', {}).get('fields') or [])
+        assets = [a for a in self.assets if all(a.get(k) == v for k, v in fields.items())]
+        start = int(payload['searchAfter'][0]) if payload.get('searchAfter') else 0
+        page = assets[start:start + size]
+        regions = {}
+        for asset in assets:
+            regions[asset['region']] = regions.get(asset['region'], 0) + 1
+        return {'assets': page, 'totalCount': len(assets),
+                'aggregations': {'region': [{'value': k, 'count': v} for k, v in sorted(regions.items())]},
+                'searchAfter': [str(start + size)] if start + size < len(assets) else None}
+
+    def create(self, family, payload):
+        with self.lock:
+            item = dict(payload or {}, id=self.nextId)
+            self.nextId += 1
+            self.resources[family][str(item['id'])] = item
+        return item
+
+    def delete(self, family, resourceId):
+        with self.lock:
+            return self.resources[family].pop(resourceId, None) is not None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, raw=None, headers=()):
+        data = raw if raw is not None else (json.dumps(body).encode('utf-8') if body is not None else b'')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _drain(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _route(self):
+        return self.path.split('/', 2)[-1].split('?', 1)[0]
+
+    def _handle(self, method):
+        body = self._drain()
+        api = getattr(self.server, 'api', None)
+        if api is None:
+            return self._reply(200, {'route': self.path})
+        if api.latency:
+            time.sleep(api.latency)
+        if api.throttled():
+            return self._reply(429, {'message': 'Too Many Requests'}, headers=[('Retry-After', '0')])
+        route = self._route()
+        family, _, resourceId = route.partition('/')
+        if method == 'GET' and route in api.accounts:
+            return self._reply(200, api.accounts[route])
+        if (method, family) == ('GET', 'AssessmentHistoryV2') or (method, route) == ('POST', 'assessment/bundleV2'):
+            return self._reply(200, raw=api.assessment)
+        if method == 'POST' and route == 'protected-asset/search':
+            return self._reply(200, api.search(json.loads(body)))
+        if method == 'POST' and family in RESOURCES:
+            return self._reply(201, api.create(family, json.loads(body) if body else None))
+        if method == 'DELETE' and family in RESOURCES:
+            return self._reply(204 if api.delete(family, resourceId) else 404)
+        if method == 'GET' and family in RESOURCES:
+            return self._reply(200, list(api.resources[family].values()))
+        self._reply(200, {'route': self.path})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class MockServer(object):
+    """Run a mock Dome9 API in a background thread
+
+    Usage:
+        with MockServer(MockAPI(latency=0.02, throttle=0.05)) as server:
+            Dome9('key', 'secret', endpoint=server.url)
+
+    Args:
+        api (MockAPI, optional): Generated data and behaviour. Without it every request gets a tiny echo response.
+    """
+
+    def __init__(self, api=None, host='127.0.0.1', port=0, handler=MockHandler):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = api
+        self.api = api
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""End-to-end benchmarks of the SDK against the local mock API.
+
+Every scenario runs in its own process (so its peak RSS is the client's alone)
+against a MockServer running in this process, and reports wall time, throughput,
+per-request p50/p99 latency and peak RSS. Results can be appended to a JSON
+lines file to track them over time.
+
+Usage:
+    python -m benchmarks.suite [--latency 0.01] [--throttle 0.05] [--assets 20000] [--page-size 1000]
+                               [--entities 50000] [--repeat 3] [--json results.jsonl] [scenario ...]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+
+from dome9 import Dome9
+from dome9.retry import RetryPolicy
+from benchmarks.server import MockAPI, MockServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def list_protected_assets(d9, options):
+    return len(d9.list_protected_assets(pageSize=options.page_size)['assets'])
+
+
+def list_protected_assets_partitioned(d9, options):
+    return len(d9.list_protected_assets(pageSize=options.page_size, partitionBy='region')['assets'])
+
+
+def list_cloud_accounts(d9, options):
+    return len(d9.list_cloud_accounts())
+
+
+def run_assessment(d9, options):
+    result = d9.run_assessment('1', 'CloudAccounts-0000', 'Aws')
+    return sum(len(test['entityResults']) for test in result['tests'])
+
+
+def iter_assessment(d9, options):
+    return sum(1 for _ in d9.iter_assessment('1'))
+
+
+def bulk_crud(d9, options):
+    created = d9.create_exclusions_bulk([{'comment': 'bench %d' % n} for n in range(options.crud)])
+    deleted = d9.delete_exclusions_bulk([outcome.result['id'] for outcome in created if outcome.ok])
+    return sum(outcome.ok for outcome in deleted) * 2
+
+
+SCENARIOS = dict((func.__name__, func) for func in (list_protected_assets, list_protected_assets_partitioned,
+                                                    list_cloud_accounts, run_assessment, iter_assessment, bulk_crud))
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def peak_rss():
+    """Peak resident memory of this process, in MB"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+def measure(name, endpoint, options, queue):
+    latencies = []
+    retry = RetryPolicy(maxAttempts=10, backoffFactor=0.01)
+    with Dome9('key', 'secret', endpoint=endpoint, retry=retry, poolSize=16,
+               hooks={'after': lambda info: latencies.append(info.timings['total'])}) as d9:
+        best = float('inf')
+        for _ in range(options.repeat):
+            start = time.perf_counter()
+            items = SCENARIOS[name](d9, options)
+            best = min(best, time.perf_counter() - start)
+    queue.put({
+        'scenario': name, 'items': items, 'seconds': best, 'itemsPerSecond': items / best,
+        'requests': len(latencies) // options.repeat, 'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99), 'peakRSS': peak_rss(),
+    })
+
+
+def run(name, endpoint, options):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(name, endpoint, options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def report(results):
+    print('%-34s %9s %10s %12s %6s %9s %9s %9s' % ('scenario', 'items', 'seconds', 'items/s', 'reqs', 'p50 ms',
+                                                   'p99 ms', 'RSS MB'))
+    for r in results:
+        print('%-34s %9d %10.3f %12.0f %6d %9.2f %9.2f %9.1f' % (
+            r['scenario'], r['items'], r['seconds'], r['itemsPerSecond'], r['requests'], (r['p50'] or 0) * 1000,
+            (r['p99'] or 0) * 1000, r['peakRSS'] or 0))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Dome9 SDK benchmarks against a local mock API')
+    parser.add_argument('scenarios', nargs='*', help='Scenarios to run (all by default): ' + ', '.join(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds each response is delayed')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Fraction of requests answered with HTTP 429')
+    parser.add_argument('--assets', type=int, default=20000, help='Protected assets')
+    parser.add_argument('--page-size', type=int, default=1000, help='Asset search page size')
+    parser.add_argument('--accounts', type=int, default=200, help='Cloud accounts per vendor')
+    parser.add_argument('--entities', type=int, default=50000, help='Entity results of an assessment')
+    parser.add_argument('--crud', type=int, default=500, help='Resources created and deleted by bulk_crud')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario (the best one is reported)')
+    parser.add_argument('--json', help='Append the results to this JSON lines file')
+    options = parser.parse_args(argv)
+    for name in options.scenarios:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario %r' % name)
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    api = MockAPI(latency=options.latency, assets=options.assets, accounts=options.accounts,
+                  entities=options.entities, throttle=options.throttle)
+    with MockServer(api) as server:
+        results = [run(name, server.url, options) for name in options.scenarios or SCENARIOS]
+    report(results)
+    print('requests served: %(requests)d, throttled: %(throttled)d' % api.stats)
+    if options.json:
+        with open(options.json, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'python': platform.python_version(),
+                                'version': open(os.path.join(ROOT, 'VERSION')).read().strip(),
+                                'options': vars(options), 'results': results}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,5 +15,22 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from .dome9 import Dome9
+from .aio import AsyncDome9
+from .pool import Dome9Pool
+from .cache import ResponseCache, MemoryCache, SQLiteCache
+from .inventory import AssetInventory
+from .exclusions import ExclusionMatcher
+from .gsl import GSLError, RulesetEvaluator
+from .circuitbreaker import CircuitBreaker
+from .concurrency import AdaptiveConcurrency
+from .exceptions import Dome9Error, Dome9APIError, PartialResultError, CircuitOpenError
+from .metrics import MetricsCollector
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .table import AssessmentTable
 
-__all__ = ['Dome9']
+__all__ = ['Dome9', 'AsyncDome9', 'Dome9Pool', 'Dome9Error', 'Dome9APIError', 'PartialResultError', 'CircuitOpenError',
+           'RateLimiter', 'RetryPolicy', 'CircuitBreaker', 'AdaptiveConcurrency',
+           'ResponseCache', 'MemoryCache', 'SQLiteCache',
+           'AssessmentTable', 'AssetInventory', 'ExclusionMatcher', 'RulesetEvaluator', 'GSLError',
+           'MetricsCollector']
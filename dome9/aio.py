@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import asyncio
+import inspect
+
+from .dome9 import INDEXED, Dome9
+from .bulk import BulkResult, ProgressLog
+from .diff import DIFF_FIELDS, AssessmentDiff
+from .export import ASSET_COLUMNS, ENTITY_RESULT_COLUMNS, Exporter, entity_result_record
+from .inventory import sync_scope
+from .routes import route_family
+from .singleflight import AsyncSingleFlight
+from .streaming import EntityResultParser
+from .transport import AsyncTransport, RawResponse
+
+
+class AsyncDome9(Dome9):
+    """Asyncio version of :class:`dome9.Dome9`.
+
+    Every public method of ``Dome9`` is available and returns an awaitable.
+    Routes and payloads are shared with the blocking client; only the
+    request layer and the methods chaining several calls are redefined here.
+
+    Usage:
+        async with AsyncDome9(key='xxxxxx', secret='yyyyyyy') as dome9:
+            rulesets = await dome9.list_rulesets()
+
+    Args:
+        poolSize (int): Max. number of open connections.
+        maxConcurrency (int): Max. number of requests in flight.
+    """
+
+    def __init__(self, key=None, secret=None, endpoint='https://api.dome9.com', apiVersion='v2',
+                 transport=None, poolSize=100, maxConcurrency=100, retry=None, rateLimiter=None, cache=None,
+                 indexMaxAge=60, codec=None, hooks=None, singleFlight=True, connectTimeout=10, readTimeout=300,
+                 circuitBreaker=None, concurrency=None):
+        transport = transport or AsyncTransport(poolSize=poolSize, maxConcurrency=maxConcurrency)
+        super(AsyncDome9, self).__init__(key, secret, endpoint, apiVersion, transport=transport, retry=retry,
+                                         rateLimiter=rateLimiter, cache=cache, indexMaxAge=indexMaxAge,
+                                         codec=codec, hooks=hooks, singleFlight=singleFlight,
+                                         connectTimeout=connectTimeout, readTimeout=readTimeout,
+                                         circuitBreaker=circuitBreaker, concurrency=concurrency)
+
+    # ------ System Methods ------
+    # ----------------------------
+
+    async def close(self):
+        """Release the pooled connections of the client"""
+        await self.transport.close()
+
+    def _single_flight(self):
+        return AsyncSingleFlight()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _send(self, method, route, payload=None, info=None, **options):
+        url = '{}{}'.format(self.endpoint, route)
+        kwargs = self._request_args(method, payload)
+        kwargs.update(options)
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if self.rateLimiter:
+                delay = self.rateLimiter.reserve(route)
+                if delay:
+                    await asyncio.sleep(delay)
+            try:
+                res, start = await self._transmit(method, url, route, kwargs)
+            except (ConnectionError, asyncio.TimeoutError):
+                self._record_attempt(info, attempt, kwargs)
+                if not self.retry.should_retry(attempt, method, route):
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                continue
+
+            self._record_attempt(info, attempt, kwargs, start, res)
+            if not self.retry.should_retry(attempt, method, route, res.status_code):
+                return res
+            res.close()
+            await asyncio.sleep(self.retry.delay(attempt, res.headers.get('Retry-After')))
+
+    async def _transmit(self, method, url, route, kwargs):
+        started = await self.concurrency.acquire_async(route) if self.concurrency is not None else None
+        self._allow(route, started)
+        sent = time.perf_counter()
+        try:
+            res = await self.transport.request(method, url, headers=self.headers, auth=(self.key, self.secret), **kwargs)
+        except asyncio.CancelledError:
+            self._abandon(route, started, True)
+            raise
+        except Exception:
+            self._settle(route, started, None)
+            raise
+        except BaseException:
+            self._abandon(route, started, True)
+            raise
+        self._settle(route, started, res.status_code)
+        return res, sent
+
+    async def _request(self, method, route, payload=None):
+        info = self._start_request(method, route)
+        error = None
+        try:
+            return await self._fetch(method, route, payload, info)
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            self._finish_request(info, error)
+
+    async def _fetch(self, method, route, payload, info):
+        cacheKey = self._cache_key(method, route, payload)
+        cached = self.cache.get(cacheKey) if cacheKey else None
+        if cached is not None:
+            if info is not None:
+                info.cached = True
+            return self._decode(info, cached)
+        generation = self.cache.generation(route) if cacheKey else None
+
+        if self.singleFlight is not None and method == 'get':
+            res, shared = await self.singleFlight.do(self._flight_key(route, payload),
+                                                     lambda: self._send(method, route, payload, info=info),
+                                                     route_family(route))
+            if shared:
+                return self._parse_response(res, self._coalesced(info, res))
+            return self._cache_response(cacheKey, route, res, info, generation)
+
+        try:
+            res = await self._send(method, route, payload, info=info)
+        finally:
+            self._invalidate_cache(method, route)
+        if method == 'delete':
+            return self._update_indexes(method, route, bool(res.status_code == 204))
+        return self._update_indexes(method, route, self._cache_response(cacheKey, route, res, info, generation))
+
+    async def _iter_entity_results(self, method, route, payload, fields, includeTestObj, meta, chunkSize=65536):
+        info = self._start_request(method, route)
+        error = None
+        try:
+            res = await self._send(method, route, payload, info=info, stream=True)
+            try:
+                if str(res.status_code)[0] != '2':
+                    self._parse_response(RawResponse(res.status_code, res.reason, res.headers, await res.read()))
+                parser = EntityResultParser(fields, includeTestObj, meta)
+                start = time.perf_counter()
+                async for chunk in res.iter_content(chunkSize):
+                    if info is not None:
+                        info.bytesIn += len(chunk)
+                    for record in parser.feed(chunk):
+                        yield record
+                for record in parser.close():
+                    yield record
+                if info is not None:
+                    info.timings['download'] = time.perf_counter() - start
+            finally:
+                res.close()
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            self._finish_request(info, error)
+
+    async def _index_lookup(self, family, field, value):
+        index = self.indexes[family]
+        listing = getattr(self, INDEXED[family][0])
+        if index.stale():
+            index.load(await listing())
+        item = index.lookup(field, value)
+        if item is None and index.refreshable():
+            index.load(await listing())
+            item = index.lookup(field, value)
+        return item
+
+    async def refresh_indexes(self):
+        for family, (listing, _) in INDEXED.items():
+            self.indexes[family].load(await getattr(self, listing)())
+
+    # ------------------   Accounts   ------------------
+    # --------------------------------------------------
+
+    async def list_cloud_accounts(self, strict=True):
+        listings = self._vendor_listings()
+        results = await asyncio.gather(*[listing() for _, listing in listings], return_exceptions=True)
+        return self._merge_vendor_accounts([vendor for vendor, _ in listings], results, strict)
+
+    # ------------------- Assets -------------------
+    # ----------------------------------------------
+
+    async def _iter_asset_pages(self, textSearch, filters, pageSize, prefetch=False, searchAfter=None):
+        def fetch(searchAfter=None):
+            return self._post(route='protected-asset/search',
+                              payload=self._asset_search(textSearch, filters, pageSize, searchAfter))
+
+        cursor = searchAfter
+        task = asyncio.ensure_future(fetch(cursor))
+        try:
+            while task:
+                rsp = await task
+                task = None
+                if rsp['searchAfter']:
+                    cursor = rsp['searchAfter']
+                    task = fetch(cursor)
+                    task = asyncio.ensure_future(task) if prefetch else task
+                yield rsp
+        except Exception as ex:
+            ex.searchAfter = cursor
+            raise
+        finally:
+            if asyncio.isfuture(task):
+                task.cancel()
+            elif task is not None:
+                task.close()
+
+    async def _asset_partitions(self, textSearch, filters, partitionBy):
+        rsp = await self._post(route='protected-asset/search', payload=self._asset_search(textSearch, filters, 1))
+        return rsp, self._partition_values(rsp, partitionBy)
+
+    async def _iter_partitioned_asset_pages(self, textSearch, filters, pageSize, partitionBy, workers):
+        _, partitions = await self._asset_partitions(textSearch, filters, partitionBy)
+        if partitions is None:
+            iterator = self._iter_asset_pages(textSearch, filters, pageSize)
+        else:
+            iterator = self._iter_partition_scans(textSearch, filters, pageSize, partitionBy, workers, partitions)
+        try:
+            async for page in iterator:
+                yield page
+        finally:
+            await iterator.aclose()
+
+    async def _iter_partition_scans(self, textSearch, filters, pageSize, partitionBy, workers, partitions):
+        pages = asyncio.Queue(maxsize=workers * 2)
+        semaphore = asyncio.Semaphore(workers)
+        tasks = [asyncio.ensure_future(self._scan_partition(pages, semaphore, textSearch,
+                                                            self._partition_filters(filters, partitionBy, value),
+                                                            pageSize))
+                 for value in partitions]
+        try:
+            async for page in self._drain_pages(pages, len(tasks)):
+                yield page
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _scan_partition(self, pages, semaphore, textSearch, filters, pageSize):
+        async with semaphore:
+            try:
+                async for page in self._iter_asset_pages(textSearch, filters, pageSize):
+                    await pages.put(page)
+            except Exception as ex:
+                await pages.put(ex)
+        await pages.put(None)
+
+    @staticmethod
+    async def _drain_pages(pages, remaining):
+        while remaining:
+            page = await pages.get()
+            if page is None:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+
+    async def iter_protected_assets(self, textSearch="", filters=[], pageSize=1000, pages=False, prefetch=False,
+                                    partitionBy=None, workers=8, searchAfter=None):
+        if partitionBy:
+            seen = set()
+            iterator = self._iter_partitioned_asset_pages(textSearch, filters, pageSize, partitionBy, workers)
+        else:
+            iterator = self._iter_asset_pages(textSearch, filters, pageSize, prefetch, searchAfter)
+
+        async for page in iterator:
+            if partitionBy:
+                page['assets'] = self._dedup_assets(page['assets'], seen)
+            if pages:
+                yield page
+            else:
+                for asset in page['assets']:
+                    yield asset
+
+    async def list_protected_assets(self, textSearch="", filters=[], pageSize=1000, partitionBy=None, workers=8,
+                                    searchAfter=None):
+        if partitionBy:
+            return await self._list_partitioned_assets(textSearch, filters, pageSize, partitionBy, workers)
+
+        results = None
+        async for page in self._iter_asset_pages(textSearch, filters, pageSize, searchAfter=searchAfter):
+            if results is None:
+                results = page
+            else:
+                results['assets'].extend(page['assets'])
+
+        return results
+
+    async def sync_inventory(self, inventory, textSearch="", filters=[], pageSize=1000, partitionBy=None, workers=8):
+        scope = sync_scope(textSearch, filters)
+        syncId = inventory.start_sync()
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0}
+        async for page in self.iter_protected_assets(textSearch, filters, pageSize, pages=True, prefetch=True,
+                                                     partitionBy=partitionBy, workers=workers):
+            for name, count in inventory.upsert(syncId, page['assets']).items():
+                stats[name] += count
+        stats['deleted'] = inventory.finish_sync(syncId, scope, scope is not None)
+        return stats
+
+    async def export_protected_assets(self, path, format=None, compression=None, textSearch="", filters=[],
+                                      pageSize=1000, partitionBy=None, workers=8):
+        with Exporter(path, ASSET_COLUMNS, format, compression) as exporter:
+            async for page in self.iter_protected_assets(textSearch, filters, pageSize, pages=True, prefetch=True,
+                                                         partitionBy=partitionBy, workers=workers):
+                exporter.write_many(page['assets'])
+        return exporter.count
+
+    async def _list_partitioned_assets(self, textSearch, filters, pageSize, partitionBy, workers):
+        results, partitions = await self._asset_partitions(textSearch, filters, partitionBy)
+        if partitions is None:
+            return await self.list_protected_assets(textSearch, filters, pageSize)
+
+        semaphore = asyncio.Semaphore(workers)
+
+        async def scan(value):
+            subquery = self._partition_filters(filters, partitionBy, value)
+            async with semaphore:
+                return [asset async for page in self._iter_asset_pages(textSearch, subquery, pageSize)
+                        for asset in page['assets']]
+
+        seen = set()
+        results['assets'] = []
+        results['searchAfter'] = None
+        for assets in await asyncio.gather(*[scan(value) for value in partitions]):
+            results['assets'].extend(self._dedup_assets(assets, seen))
+        return results
+
+    # ------------------ Rulesets ------------------
+    # ----------------------------------------------
+
+    async def get_ruleset(self, rulesetId=None, name=None):
+        if rulesetId:
+            return await self._get(route='CompliancePolicy/%s' % str(rulesetId))
+        elif name:
+            return await self._index_lookup('CompliancePolicy', 'name', name)
+
+    # ------------------ Remediations ------------------
+    # --------------------------------------------------
+
+    async def get_remediation(self, remediationId):
+        return await self._index_lookup('Compliance/Remediation', 'id', remediationId)
+
+    # ------------------  Exclusions  ------------------
+    # --------------------------------------------------
+
+    async def get_exclusion(self, exclusionId):
+        exclusion = await self._index_lookup('Exclusion', 'id', exclusionId)
+        if exclusion is None:
+            exclusion = await self._get(route='Exclusion/%s' % str(exclusionId))
+        return exclusion
+
+    # ------------------ Assessments  ------------------
+    # --------------------------------------------------
+
+    async def export_assessment(self, assessmentId, path, format=None, compression=None):
+        with Exporter(path, ENTITY_RESULT_COLUMNS, format, compression) as exporter:
+            async for rule, entityResult in self.iter_assessment(assessmentId):
+                exporter.write(entity_result_record(assessmentId, rule, entityResult))
+        return exporter.count
+
+    async def diff_assessments(self, previousId, currentId):
+        diff = AssessmentDiff()
+        async for rule, entityResult in self.iter_assessment(previousId, fields=DIFF_FIELDS):
+            diff.add_previous(rule, entityResult)
+        async for rule, entityResult in self.iter_assessment(currentId, fields=DIFF_FIELDS):
+            diff.add_current(rule, entityResult)
+        return diff.finish()
+
+    async def simulate_exclusions(self, assessmentId, add=None, remove=None, exclusions=None, bundleId=None):
+        if exclusions is None:
+            exclusions = await self.list_exclusions()
+        result = await self.get_assessment(assessmentId)
+        return self._simulate_exclusions(result, exclusions, add, remove, bundleId)
+
+    async def _bulk(self, operation, items, workers=8, dryRun=False, unpack=False):
+        client = self._dry_run() if dryRun else self
+        method = getattr(client, operation)
+        semaphore = asyncio.Semaphore(workers)
+
+        async def run(item):
+            async with semaphore:
+                try:
+                    result = method(**item) if unpack else method(item)
+                    if inspect.isawaitable(result):
+                        result = await result
+                    return BulkResult(item, result, None)
+                except Exception as ex:
+                    return BulkResult(item, None, ex)
+
+        return list(await asyncio.gather(*[run(item) for item in items]))
+
+    async def run_assessments_bulk(self, jobs, workers=4, callback=None, progressFile=None):
+        progress = ProgressLog(progressFile) if progressFile else None
+        summary = {'completed': 0, 'skipped': 0, 'failed': []}
+        semaphore = asyncio.Semaphore(workers)
+
+        async def run(job):
+            async with semaphore:
+                try:
+                    return job, await self.run_assessment(**job), None
+                except Exception as ex:
+                    return job, None, ex
+
+        try:
+            tasks = [run(job) for job in self._pending_assessments(jobs, progress, summary)]
+            for task in asyncio.as_completed(tasks):
+                job, result, error = await task
+                self._record_assessment(summary, progress, callback, job, result, error)
+        finally:
+            if progress:
+                progress.close()
+        return summary
+
+
+for _name in ('list_cloud_accounts', 'iter_protected_assets', 'list_protected_assets', 'get_ruleset', 'get_remediation',
+              'get_exclusion', 'refresh_indexes', 'sync_inventory', 'export_protected_assets', 'export_assessment',
+              'diff_assessments', 'simulate_exclusions', 'run_assessments_bulk'):
+    getattr(AsyncDome9, _name).__doc__ = getattr(Dome9, _name).__doc__
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import json
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class BulkResult(namedtuple('BulkResult', ['item', 'result', 'error'])):
+    """Outcome of one item of a bulk operation. `error` is the raised exception, if any."""
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def iter_bulk(func, items, workers=8):
+    """Call `func` on every item concurrently, yielding outcomes as soon as they complete
+
+    At most `workers` calls are in flight, and no more than twice that many items
+    are read ahead from `items`, so arbitrarily long iterables can be processed.
+
+    Args:
+        func (callable): Function called with each item.
+        items (iterable): Items to process.
+        workers (int): Max. concurrent calls.
+
+    Yields:
+        tuple: (position of the item, BulkResult)
+    """
+    items = enumerate(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for position, item in items:
+                pending[executor.submit(func, item)] = (position, item)
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                position, item = pending.pop(future)
+                error = future.exception()
+                yield position, BulkResult(item, None if error else future.result(), error)
+
+
+def run_bulk(func, items, workers=8):
+    """Call `func` on every item concurrently
+
+    Returns:
+        list: BulkResult of every item, in input order.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for position, outcome in iter_bulk(func, items, workers):
+        results[position] = outcome
+    return results
+
+
+def assessment_jobs(rulesetIds, accounts, regions=None):
+    """Build the account x ruleset x region matrix of a bulk assessment
+
+    Args:
+        rulesetIds (list): Ids of the rulesets to run.
+        accounts (list): Cloud Accounts as returned by `list_cloud_accounts`, or (cloudAccountId, cloudAccountType) tuples.
+        regions (list, optional): Regions to assess separately. Whole accounts if None.
+
+    Returns:
+        list: Jobs, dicts with the arguments of `run_assessment`.
+    """
+    jobs = []
+    for account in accounts:
+        if isinstance(account, dict):
+            account = (account['id'], account['vendor'][:1].upper() + account['vendor'][1:])
+        for rulesetId in rulesetIds:
+            for region in regions or [None]:
+                jobs.append({'rulesetId': rulesetId, 'cloudAccountId': account[0],
+                             'cloudAccountType': account[1], 'region': region})
+    return jobs
+
+
+def job_key(job):
+    return '{}|{}|{}'.format(job['rulesetId'], job['cloudAccountId'], job.get('region') or '')
+
+
+class ProgressLog(object):
+    """Append-only file of the completed jobs of a bulk run, used to resume it
+
+    A last line cut short by a crash is dropped when the file is loaded: its job is
+    run again.
+
+    Args:
+        path (str): Progress file. Created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.done = set()
+        if os.path.exists(path):
+            self._load(path)
+        self.file = open(path, 'a')
+        self.lock = threading.Lock()
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            lines = f.readlines()
+        for line in lines[:-1]:
+            self._read(line)
+        last = lines[-1] if lines else b''
+        try:
+            self._read(last)
+        except ValueError:
+            with open(path, 'r+b') as f:
+                f.truncate(sum(len(line) for line in lines[:-1]))
+            return
+        if last and not last.endswith(b'\n'):
+            # Complete but not terminated: the next key must start on its own line
+            with open(path, 'ab') as f:
+                f.write(b'\n')
+
+    def _read(self, line):
+        if line.strip():
+            self.done.add(json.loads(line.decode('utf-8')))
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def add(self, key):
+        with self.lock:
+            self.done.add(key)
+            self.file.write(json.dumps(key) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
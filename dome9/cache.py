@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .routes import route_family
+
+
+class MemoryCache(object):
+    """In-memory LRU storage for :class:`ResponseCache`
+
+    Args:
+        maxSize (int): Max. number of responses kept.
+    """
+
+    def __init__(self, maxSize=1024):
+        self.maxSize = maxSize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            family, value, expires = item
+            if expires <= time.time():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, family, value, ttl):
+        with self.lock:
+            self.items[key] = (family, value, time.time() + ttl)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxSize:
+                self.items.popitem(last=False)
+
+    def invalidate(self, family):
+        with self.lock:
+            for key in [k for k, item in self.items.items() if item[0] == family]:
+                del self.items[key]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class SQLiteCache(object):
+    """On-disk LRU storage for :class:`ResponseCache`, shared by every client using the same file
+
+    Args:
+        path (str): SQLite database file.
+        maxSize (int): Max. number of responses kept.
+    """
+
+    def __init__(self, path, maxSize=10000):
+        self.maxSize = maxSize
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, family TEXT, value BLOB, '
+                        'expires REAL, used REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS cache_family ON cache (family)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS cache_used ON cache (used)')
+
+    def get(self, key):
+        with self.lock:
+            now = time.time()
+            row = self.db.execute('SELECT value FROM cache WHERE key = ? AND expires > ?', (key, now)).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE cache SET used = ? WHERE key = ?', (now, key))
+            return row[0]
+
+    def set(self, key, family, value, ttl):
+        with self.lock:
+            now = time.time()
+            self.db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)', (key, family, value, now + ttl, now))
+            self.db.execute('DELETE FROM cache WHERE expires <= ? OR key IN '
+                            '(SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)', (now, self.maxSize))
+
+    def invalidate(self, family):
+        with self.lock:
+            self.db.execute('DELETE FROM cache WHERE family = ?', (family,))
+
+    def clear(self):
+        with self.lock:
+            self.db.execute('DELETE FROM cache')
+
+    def close(self):
+        self.db.close()
+
+
+class ResponseCache(object):
+    """Cache of the read-only (GET) responses of a client
+
+    Responses are kept per route family with their own TTL. Any create, update or
+    delete call made through the client drops the cached responses of its family
+    (i.e.: `create_ruleset` invalidates `list_rulesets` and `get_ruleset`), and
+    responses of GETs sent before it are not stored once they arrive.
+
+    Usage:
+        cache = ResponseCache(ttl=60, ttls={'CompliancePolicy': 600}, backend=SQLiteCache('dome9.db'))
+        Dome9(key, secret, cache=cache)
+
+    Args:
+        ttl (float): Seconds a response is kept. 0 disables caching for the families not in `ttls`.
+        ttls (dict, optional): TTL per route family (`CompliancePolicy`, `Compliance/Remediation`,
+            `Exclusion`, `user`, `CloudAccounts`...).
+        backend (optional): Storage, :class:`MemoryCache` (default) or :class:`SQLiteCache`.
+    """
+
+    def __init__(self, ttl=60, ttls=None, backend=None):
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.backend = backend or MemoryCache()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def key(self, namespace, route, payload):
+        raw = '\n'.join((namespace, route, payload or ''))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def generation(self, route):
+        """Invalidations of the family of `route` so far, to give to `set`"""
+        with self.lock:
+            return self.generations.get(route_family(route), 0)
+
+    def set(self, key, route, value, generation=None):
+        """Store a response, unless its family was invalidated since `generation` (when the request was sent)"""
+        family = route_family(route)
+        ttl = self.ttls.get(family, self.ttl)
+        if ttl <= 0:
+            return
+        with self.lock:
+            if generation is None or generation == self.generations.get(family, 0):
+                self.backend.set(key, family, value, ttl)
+
+    def invalidate(self, route):
+        """Drop every cached response of the family of `route`"""
+        family = route_family(route)
+        with self.lock:
+            self.generations[family] = self.generations.get(family, 0) + 1
+            self.backend.invalidate(family)
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import threading
+
+from .exceptions import CircuitOpenError
+from .routes import route_family
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class Circuit(object):
+    """State of the circuit of one route family
+
+    Closed, requests flow and consecutive failures are counted; once they reach
+    `failureThreshold` the circuit opens and requests fail fast for `recoveryTime`
+    seconds. It is then half-open: `halfOpenCalls` trial requests are let through,
+    closing it if they all succeed or opening it again on the first failure.
+    """
+
+    def __init__(self, failureThreshold, recoveryTime, halfOpenCalls):
+        self.failureThreshold = failureThreshold
+        self.recoveryTime = recoveryTime
+        self.halfOpenCalls = halfOpenCalls
+        self.state = CLOSED
+        self.failures = 0
+        self.trials = 0
+        self.successes = 0
+        self.openedAt = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request can be sent
+
+        Returns:
+            float: None when it can, else seconds until the circuit lets a trial through.
+        """
+        with self.lock:
+            if self.state == OPEN:
+                remaining = self.openedAt + self.recoveryTime - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self.state, self.trials, self.successes = HALF_OPEN, 0, 0
+            if self.state == HALF_OPEN:
+                if self.trials >= self.halfOpenCalls:
+                    return 0.0
+                self.trials += 1
+            return None
+
+    def discard(self):
+        # A trial abandoned before its outcome (i.e.: cancelled) lets another one through
+        with self.lock:
+            if self.state == HALF_OPEN and self.trials > self.successes:
+                self.trials -= 1
+
+    def record(self, success):
+        with self.lock:
+            if success:
+                self.failures = 0
+                if self.state == HALF_OPEN:
+                    self.successes += 1
+                    if self.successes >= self.halfOpenCalls:
+                        self.state = CLOSED
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failureThreshold:
+                self.state = OPEN
+                self.openedAt = time.monotonic()
+
+
+class CircuitBreaker(object):
+    """Client-side circuit breakers, one per route family
+
+    Server errors (5xx), connection errors and timeouts are failures; any other
+    response (429 included: the API is up, only busy) is a success; a request cancelled
+    before its response is neither. While the circuit
+    of a family is open its requests raise :class:`dome9.exceptions.CircuitOpenError`
+    immediately instead of waiting for timeouts. A breaker can be given to several
+    clients (or threads).
+
+    Usage:
+        Dome9(key, secret, circuitBreaker=CircuitBreaker(failureThreshold=5, recoveryTime=30))
+
+    Args:
+        failureThreshold (int, optional): Consecutive failures opening a circuit. Defaults to 5.
+        recoveryTime (float, optional): Seconds an open circuit fails fast before a trial. Defaults to 30.
+        halfOpenCalls (int, optional): Successful trials closing a half-open circuit. Defaults to 1.
+    """
+
+    def __init__(self, failureThreshold=5, recoveryTime=30, halfOpenCalls=1):
+        self.failureThreshold = failureThreshold
+        self.recoveryTime = recoveryTime
+        self.halfOpenCalls = halfOpenCalls
+        self.circuits = {}
+        self.lock = threading.Lock()
+
+    def _circuit(self, family):
+        with self.lock:
+            if family not in self.circuits:
+                self.circuits[family] = Circuit(self.failureThreshold, self.recoveryTime, self.halfOpenCalls)
+            return self.circuits[family]
+
+    def allow(self, route):
+        """Check that a request to `route` can be sent
+
+        Raises:
+            CircuitOpenError: The circuit of its family is open.
+        """
+        family = route_family(route)
+        retryAfter = self._circuit(family).allow()
+        if retryAfter is not None:
+            raise CircuitOpenError(family, retryAfter)
+
+    def record(self, route, success):
+        """Record the outcome of a request to `route`"""
+        self._circuit(route_family(route)).record(success)
+
+    def discard(self, route):
+        """Forget a request to `route` allowed but abandoned before its outcome (cancelled or interrupted)"""
+        self._circuit(route_family(route)).discard()
+
+    def states(self):
+        """State (closed, open or half-open) of the circuit of every family seen"""
+        with self.lock:
+            circuits = list(self.circuits.items())
+        return dict((family, circuit.state) for family, circuit in circuits)
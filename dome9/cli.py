@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import sys
+import time
+import json
+import argparse
+
+# Subcommands import what they need when they run, so that `dome9 --help` or a
+# command that does not use them does not pay for optional dependencies.
+
+BULK = {
+    ('create', 'rulesets'): 'create_ruleset', ('update', 'rulesets'): 'update_ruleset',
+    ('delete', 'rulesets'): 'delete_ruleset', ('create', 'remediations'): 'create_remediation',
+    ('update', 'remediations'): 'update_remediation', ('delete', 'remediations'): 'delete_remediation',
+    ('create', 'exclusions'): 'create_exclusion', ('delete', 'exclusions'): 'delete_exclusion',
+    ('create', 'users'): 'create_user', ('delete', 'users'): 'delete_user',
+}
+
+
+class Progress(object):
+    """Item count and throughput, redrawn on stderr at most every `interval` seconds"""
+
+    def __init__(self, unit='items', enabled=True, stream=None, interval=0.5):
+        self.unit = unit
+        self.enabled = enabled
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.count = 0
+        self.errors = 0
+        self.started = self.drawn = time.perf_counter()
+
+    def update(self, count=1, errors=0):
+        self.count += count
+        self.errors += errors
+        now = time.perf_counter()
+        if self.enabled and now - self.drawn >= self.interval:
+            self.drawn = now
+            self._draw(now, '\r')
+
+    def _draw(self, now, end):
+        elapsed = max(now - self.started, 1e-9)
+        errors = ', %d errors' % self.errors if self.errors else ''
+        self.stream.write('%s%d %s in %.1fs (%.0f/s%s)' % (end, self.count, self.unit, elapsed, self.count / elapsed, errors))
+        self.stream.flush()
+
+    def close(self):
+        if self.enabled:
+            self._draw(time.perf_counter(), '\r')
+            self.stream.write('\n')
+            self.stream.flush()
+
+
+class Output(object):
+    """NDJSON lines on stdout, encoded with the codec of the client"""
+
+    def __init__(self, codec, stream=None):
+        self.codec = codec
+        self.stream = stream or sys.stdout
+
+    def write(self, obj):
+        self.stream.write(self.codec.dumps(obj))
+        self.stream.write('\n')
+
+    def flush(self):
+        self.stream.flush()
+
+
+def parse_filters(values):
+    filters = []
+    for value in values or ():
+        name, sep, text = value.partition('=')
+        if not sep:
+            raise ValueError('invalid filter %r, expected name=value' % value)
+        filters.append({'name': name, 'value': text})
+    return filters
+
+
+def cloud_account(value):
+    accountId, sep, accountType = value.partition(':')
+    if not (accountId and sep and accountType):
+        raise argparse.ArgumentTypeError('invalid account %r, expected ID:TYPE' % value)
+    return accountId, accountType
+
+
+def read_items(path):
+    """Items of a NDJSON file (`-` for stdin), read lazily"""
+    stream = sys.stdin if path == '-' else open(path)
+    try:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _client(args):
+    from .dome9 import Dome9
+    return Dome9(args.key, args.secret, endpoint=args.endpoint, codec=args.codec, poolSize=max(10, args.workers))
+
+
+def _search_arguments(args):
+    return {'textSearch': args.search, 'filters': parse_filters(args.filter), 'pageSize': args.page_size,
+            'partitionBy': args.partition_by, 'workers': args.workers}
+
+
+def cmd_inventory(args, client, progress, output):
+    """Dump protected assets as NDJSON, or sync them into a local inventory"""
+    if args.db:
+        from .inventory import AssetInventory
+        inventory = AssetInventory(args.db)
+        progress.unit = 'requests'
+        client.add_hook('after', lambda info: progress.update())
+        output.write(client.sync_inventory(inventory, **_search_arguments(args)))
+        return 0
+    for asset in client.iter_protected_assets(**_search_arguments(args)):
+        output.write(asset)
+        progress.update()
+    return 0
+
+
+def _assessment_summary(job, result):
+    tests = result.get('tests') or []
+    return {'job': job, 'id': result.get('id'), 'assessmentPassed': result.get('assessmentPassed'), 'tests': len(tests),
+            'failedTests': sum(1 for test in tests if not test.get('testPassed', True)),
+            'nonComplying': sum(test.get('nonComplyingCount') or 0 for test in tests)}
+
+
+def cmd_assess(args, client, progress, output):
+    """Run the assessments of every ruleset x account x region, writing a line per completed one"""
+    from .bulk import assessment_jobs
+    if args.all_accounts:
+        accounts = client.list_cloud_accounts()
+    else:
+        accounts = args.account
+    jobs = assessment_jobs(args.ruleset, accounts, args.region)
+
+    def completed(job, result):
+        output.write(dict(result, job=job) if args.full else _assessment_summary(job, result))
+        output.flush()
+        progress.update()
+    summary = client.run_assessments_bulk(jobs, workers=args.workers, callback=completed, progressFile=args.resume)
+    for job, error in summary['failed']:
+        output.write({'job': job, 'error': str(error)})
+        progress.update(0, 1)
+    return 1 if summary['failed'] else 0
+
+
+def cmd_export(args, client, progress, output):
+    """Export protected assets or the entity results of an assessment to a NDJSON, CSV or Parquet file"""
+    client.add_hook('after', lambda info: progress.update())
+    if args.what == 'assets':
+        rows = client.export_protected_assets(args.path, args.format, args.compression, **_search_arguments(args))
+    else:
+        rows = client.export_assessment(args.assessment, args.path, args.format, args.compression)
+    output.write({'path': args.path, 'rows': rows})
+    return 0
+
+
+def cmd_bulk(args, client, progress, output):
+    """Create, update or delete many resources concurrently, read as NDJSON"""
+    from .bulk import iter_bulk
+    method = getattr(client._dry_run() if args.dry_run else client, BULK[(args.action, args.resource)])
+    if args.action == 'delete':
+        items = (item['id'] if isinstance(item, dict) else item for item in read_items(args.input))
+    else:
+        items = read_items(args.input)
+    call = (lambda item: method(**item)) if args.resource == 'users' and args.action == 'create' else method
+    failed = 0
+    for _, outcome in iter_bulk(call, items, args.workers):
+        failed += not outcome.ok
+        output.write({'item': outcome.item, 'result': outcome.result, 'error': None if outcome.ok else str(outcome.error)})
+        progress.update(1, int(not outcome.ok))
+    return 1 if failed else 0
+
+
+def _add_search_options(parser):
+    parser.add_argument('--search', default='', help='Free text search')
+    parser.add_argument('--filter', action='append', metavar='NAME=VALUE',
+                        help='Search filter (platform, type, cloudAccountId, region...). Repeatable.')
+    parser.add_argument('--page-size', type=int, default=1000, help='Assets per page (default: 1000)')
+    parser.add_argument('--partition-by', metavar='FILTER', help='Split the search by the values of a filter '
+                        '(i.e.: region) and paginate the parts concurrently')
+
+
+def _add_export_options(parser):
+    parser.add_argument('--format', choices=('ndjson', 'csv', 'parquet'), help='Defaults to the extension of PATH')
+    parser.add_argument('--compression', choices=('gzip', 'zstd'), help='Defaults to the extension of PATH')
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--key', help='API key (default: $DOME9_ACCESS_KEY)')
+    common.add_argument('--secret', help='API secret (default: $DOME9_SECRET_KEY)')
+    common.add_argument('--endpoint', default='https://api.dome9.com', help='API endpoint')
+    common.add_argument('--codec', choices=('orjson', 'ujson', 'json'), help='JSON codec (default: fastest installed)')
+    common.add_argument('--workers', type=int, default=8, help='Concurrent requests (default: 8)')
+    progress = common.add_mutually_exclusive_group()
+    progress.add_argument('--progress', action='store_true', default=None, help='Show progress (default: on a terminal)')
+    progress.add_argument('--quiet', '-q', dest='progress', action='store_false', help='Hide progress')
+
+    parser = argparse.ArgumentParser(prog='dome9', description='Dome9 command line. Results are written to stdout '
+                                     'as NDJSON, progress to stderr.')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    inventory = commands.add_parser('inventory', parents=[common], help=cmd_inventory.__doc__,
+                                    description=cmd_inventory.__doc__)
+    _add_search_options(inventory)
+    inventory.add_argument('--db', metavar='PATH', help='Sync into this SQLite inventory instead, printing the counts '
+                           'of added, updated, unchanged and deleted assets')
+    inventory.set_defaults(func=cmd_inventory, unit='assets')
+
+    assess = commands.add_parser('assess', parents=[common], help=cmd_assess.__doc__, description=cmd_assess.__doc__)
+    assess.add_argument('--ruleset', action='append', required=True, metavar='ID', help='Ruleset id. Repeatable.')
+    accounts = assess.add_mutually_exclusive_group(required=True)
+    accounts.add_argument('--account', action='append', type=cloud_account, metavar='ID:TYPE',
+                          help='Cloud account id and type (i.e.: 0000-...:Aws). Repeatable.')
+    accounts.add_argument('--all-accounts', action='store_true', help='Every cloud account')
+    assess.add_argument('--region', action='append', help='Assess this region separately. Repeatable.')
+    assess.add_argument('--resume', metavar='FILE', help='Record completed jobs in FILE and skip those already there')
+    assess.add_argument('--full', action='store_true', help='Write whole results instead of summaries')
+    assess.set_defaults(func=cmd_assess, unit='assessments')
+
+    export = commands.add_parser('export', help=cmd_export.__doc__, description=cmd_export.__doc__)
+    exports = export.add_subparsers(dest='what', metavar='what')
+    exports.required = True
+    assets = exports.add_parser('assets', parents=[common], help='Protected assets')
+    assets.add_argument('path', metavar='PATH')
+    _add_export_options(assets)
+    _add_search_options(assets)
+    assessment = exports.add_parser('assessment', parents=[common], help='Entity results of an assessment')
+    assessment.add_argument('assessment', metavar='ID')
+    assessment.add_argument('path', metavar='PATH')
+    _add_export_options(assessment)
+    export.set_defaults(func=cmd_export, unit='requests')
+
+    bulk = commands.add_parser('bulk', parents=[common], help=cmd_bulk.__doc__,
+                               description=cmd_bulk.__doc__ + '. Deletions take ids or objects with an id. '
+                               'Writes a line per item: {item, result, error}.')
+    bulk.add_argument('action', choices=('create', 'update', 'delete'))
+    bulk.add_argument('resource', choices=('rulesets', 'remediations', 'exclusions', 'users'))
+    bulk.add_argument('--input', '-i', default='-', metavar='FILE', help='NDJSON items (default: stdin)')
+    bulk.add_argument('--dry-run', action='store_true', help='Write the requests that would be sent instead')
+    bulk.set_defaults(func=cmd_bulk, unit='items')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'bulk' and (args.action, args.resource) not in BULK:
+        parser.error('%s %s is not supported' % (args.action, args.resource))
+    enabled = sys.stderr.isatty() if args.progress is None else args.progress
+    progress = Progress(args.unit, enabled)
+    try:
+        with _client(args) as client:
+            output = Output(client.codec)
+            try:
+                return args.func(args, client, progress, output)
+            finally:
+                output.flush()
+                progress.close()
+    except BrokenPipeError:
+        # The reader (i.e.: `| head`) went away: stop quietly, without failing to flush stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except KeyboardInterrupt:
+        return 130
+    except ValueError as ex:
+        sys.stderr.write('dome9: error: %s\n' % ex)
+        return 2
+    except Exception as ex:
+        sys.stderr.write('dome9: error: %s: %s\n' % (type(ex).__name__, ex))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+
+
+class JSONCodec(object):
+    """Serialization of payloads and responses with the standard library
+
+    Codecs decode the raw response bytes (`loads`) and encode payloads either as
+    text, for query strings (`dumps`), or as bytes, for request bodies (`encode`).
+    """
+    name = 'json'
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def encode(self, obj):
+        return json.dumps(obj).encode('utf-8')
+
+
+class OrjsonCodec(JSONCodec):
+    """Serialization with orjson, several times faster than the standard library"""
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+    def dumps(self, obj):
+        return self.orjson.dumps(obj).decode('utf-8')
+
+    def encode(self, obj):
+        return self.orjson.dumps(obj)
+
+
+class UjsonCodec(JSONCodec):
+    """Serialization with ujson"""
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.ujson = ujson
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+    def dumps(self, obj):
+        return self.ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+
+    def encode(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+
+CODECS = {'orjson': OrjsonCodec, 'ujson': UjsonCodec, 'json': JSONCodec}
+
+
+def get_codec(codec=None):
+    """Codec by name (orjson, ujson or json), or the fastest one installed when None
+
+    Args:
+        codec (str or object, optional): Codec name, or an object with `loads`, `dumps` and `encode` methods.
+
+    Returns:
+        object: Codec
+    """
+    if codec is not None and not isinstance(codec, str):
+        return codec
+    if codec is not None:
+        if codec not in CODECS:
+            raise ValueError('Unknown codec %r, expected one of %s' % (codec, ', '.join(CODECS)))
+        return CODECS[codec]()
+    for name in ('orjson', 'ujson'):
+        try:
+            return CODECS[name]()
+        except ImportError:
+            pass
+    return JSONCodec()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import asyncio
+import threading
+from collections import deque
+
+from .routes import route_family
+
+
+class AIMDLimit(object):
+    """Concurrency limit of one route family, adjusted by additive increase / multiplicative decrease
+
+    Each successful response raises the limit by `increase / limit` (about `increase`
+    per round trip of a full window). A failure (throttling, server error, timeout) or
+    a latency above `tolerance` times the baseline multiplies it by `backoff`, at most
+    once per round trip: only requests sent after the last decrease can decrease it
+    again. The baseline is the lowest latency seen, drifting slowly towards the
+    current ones so that it follows lasting changes.
+    """
+
+    def __init__(self, initial, minLimit, maxLimit, increase, backoff, tolerance, drift=0.01):
+        self.limit = float(initial)
+        self.minLimit = minLimit
+        self.maxLimit = maxLimit
+        self.increase = increase
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.drift = drift
+        self.baseline = None
+        self.decreasedAt = 0.0
+        self.inFlight = 0
+        self.condition = threading.Condition()
+        # (loop, future) of the coroutines waiting for a slot
+        self.waiters = deque()
+
+    def capacity(self):
+        return max(self.minLimit, int(self.limit))
+
+    def acquire(self):
+        """Wait for a slot, blocking the thread"""
+        with self.condition:
+            while self.inFlight >= self.capacity():
+                self.condition.wait()
+            self.inFlight += 1
+
+    async def acquire_async(self):
+        """Wait for a slot, without blocking the event loop"""
+        with self.condition:
+            if self.inFlight < self.capacity() and not self.waiters:
+                self.inFlight += 1
+                return
+            loop = asyncio.get_event_loop()
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.condition:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    raise
+            # The slot was granted as the waiter was cancelled
+            if waiter[1].done() and not waiter[1].cancelled():
+                self._free()
+            raise
+
+    def _grant(self, future):
+        if future.cancelled():
+            self._free()
+        else:
+            future.set_result(None)
+
+    def _wake(self):
+        # Called with the lock held: hand free slots to waiting coroutines, then to threads
+        while self.waiters and self.inFlight < self.capacity():
+            loop, future = self.waiters.popleft()
+            self.inFlight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+        self.condition.notify_all()
+
+    def _free(self):
+        with self.condition:
+            self.inFlight -= 1
+            self._wake()
+
+    def release(self, started, latency, failed):
+        """Free the slot of a request and adjust the limit with its outcome
+
+        Args:
+            started (float): `time.monotonic()` when the request was sent.
+            latency (float): Seconds until its response (or error).
+            failed (bool): Throttled, server error, connection error or timeout.
+        """
+        with self.condition:
+            self.inFlight -= 1
+            congested = failed or (self.baseline is not None and latency > self.tolerance * self.baseline)
+            if congested:
+                if started >= self.decreasedAt:
+                    self.limit = max(self.minLimit, self.limit * self.backoff)
+                    self.decreasedAt = time.monotonic()
+            else:
+                self.limit = min(self.maxLimit, self.limit + self.increase / self.limit)
+            if not failed:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline += (latency - self.baseline) * self.drift
+            self._wake()
+
+
+class AdaptiveConcurrency(object):
+    """Adaptive limit of the requests in flight, one AIMD limit per route family
+
+    The limit of a family grows while its responses are fast and successful, and
+    is cut when the API throttles (429), fails (5xx), times out or its latency
+    rises above `tolerance` times the usual one, so throughput backs off under stress
+    and recovers with the API. Requests over the limit wait for a slot. A limiter
+    can be given to several clients (or threads).
+
+    Usage:
+        Dome9(key, secret, concurrency=AdaptiveConcurrency(initial=8, maxLimit=64))
+
+    Args:
+        initial (int, optional): Starting limit of each family. Defaults to 8.
+        minLimit (int, optional): Lowest limit. Defaults to 1.
+        maxLimit (int, optional): Highest limit. Defaults to 64.
+        increase (float, optional): Additive increase per round trip. Defaults to 1.
+        backoff (float, optional): Multiplicative decrease on congestion. Defaults to 0.5.
+        tolerance (float, optional): Latency over the baseline counted as congestion. Defaults to 2.
+    """
+
+    def __init__(self, initial=8, minLimit=1, maxLimit=64, increase=1.0, backoff=0.5, tolerance=2.0):
+        self.initial = initial
+        self.minLimit = minLimit
+        self.maxLimit = maxLimit
+        self.increase = increase
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.families = {}
+        self.lock = threading.Lock()
+
+    def _limit(self, route):
+        family = route_family(route)
+        with self.lock:
+            if family not in self.families:
+                self.families[family] = AIMDLimit(self.initial, self.minLimit, self.maxLimit, self.increase,
+                                                  self.backoff, self.tolerance)
+            return self.families[family]
+
+    def acquire(self, route):
+        """Wait for a slot to send a request to `route`
+
+        Returns:
+            float: `time.monotonic()` when the slot was acquired, to give back to `release`.
+        """
+        self._limit(route).acquire()
+        return time.monotonic()
+
+    async def acquire_async(self, route):
+        """Wait for a slot to send a request to `route`, in a coroutine (see `acquire`)"""
+        await self._limit(route).acquire_async()
+        return time.monotonic()
+
+    def release(self, route, started, failed):
+        """Free the slot of a request to `route` and adapt the limit of its family
+
+        Args:
+            route (str): API route
+            started (float): Value returned by `acquire`.
+            failed (bool): Throttled, server error, connection error or timeout.
+        """
+        self._limit(route).release(started, time.monotonic() - started, failed)
+
+    def discard(self, route):
+        """Free the slot of a request to `route` abandoned before its outcome, leaving the limit as is"""
+        self._limit(route)._free()
+
+    def limits(self):
+        """Current limit and requests in flight of every family seen
+
+        Returns:
+            dict: {family: {'limit', 'inFlight', 'baseline'}}
+        """
+        with self.lock:
+            families = list(self.families.items())
+        return dict((family, {'limit': limit.capacity(), 'inFlight': limit.inFlight, 'baseline': limit.baseline})
+                    for family, limit in families)
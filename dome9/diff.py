@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from collections import Counter, namedtuple
+
+from .table import STATUSES, entity_status, rule_key
+
+# Entity result fields needed to compare two assessments
+DIFF_FIELDS = ('isRelevant', 'isValid', 'isExcluded', 'testObj.id', 'testObj.dome9Id', 'testObj.entityIndex')
+
+
+def entity_key(rule, entityResult):
+    """Identity of an entity result across assessments: (rule id/logic hash, entity id)"""
+    testObj = entityResult.get('testObj') or {}
+    entityId = testObj.get('id')
+    if entityId is None:
+        entityId = testObj.get('dome9Id', testObj.get('entityIndex'))
+    return rule_key(rule), entityId
+
+
+class Change(namedtuple('Change', ['rule', 'entityId', 'previous', 'current'])):
+    """Status change of an entity for a rule. A status is None when the entity is missing from that assessment."""
+
+
+class AssessmentDiff(object):
+    """Linear-time comparison of the entity results of two assessments
+
+    Only the key and status of each entity result of the previous assessment are
+    kept (in a hash map); the current assessment is compared record by record as it
+    is read, so neither result needs to be held in memory.
+
+    Usage:
+        diff = AssessmentDiff()
+        for rule, entityResult in previous:
+            diff.add_previous(rule, entityResult)
+        for rule, entityResult in current:
+            diff.add_current(rule, entityResult)
+        delta = diff.finish()
+
+    Every previous record must be added before the first current one.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.previous = {}
+        self.changes = []
+        self.unchanged = 0
+
+    def _key(self, rule, entityResult):
+        key = entity_key(rule, entityResult)
+        if key[0] not in self.rules:
+            self.rules[key[0]] = rule
+        return key
+
+    def add_previous(self, rule, entityResult):
+        self.previous[self._key(rule, entityResult)] = STATUSES.index(entity_status(entityResult))
+
+    def add_current(self, rule, entityResult):
+        key = self._key(rule, entityResult)
+        status = STATUSES.index(entity_status(entityResult))
+        previous = self.previous.pop(key, None)
+        if previous == status:
+            self.unchanged += 1
+        else:
+            self.changes.append(Change(key[0], key[1], None if previous is None else STATUSES[previous], STATUSES[status]))
+
+    def finish(self):
+        """Delta between both assessments
+
+        Returns:
+            AssessmentDelta
+        """
+        changes = self.changes
+        changes.extend(Change(key[0], key[1], STATUSES[status], None) for key, status in self.previous.items())
+        self.previous = {}
+        return AssessmentDelta(changes, self.unchanged, self.rules)
+
+
+class AssessmentDelta(object):
+    """Entities whose status changed between two assessments
+
+    Attributes:
+        changes (list): :class:`Change` of every entity whose status is different.
+        unchanged (int): Number of entity results with the same status in both assessments.
+        rules (dict): Rule of each rule key.
+    """
+
+    def __init__(self, changes, unchanged, rules):
+        self.changes = changes
+        self.unchanged = unchanged
+        self.rules = rules
+
+    def new_failures(self):
+        """Entities failing now that were not failing (or not assessed) before"""
+        return [c for c in self.changes if c.current == 'failed']
+
+    def resolved(self):
+        """Entities failing before that now pass, are no longer relevant or no longer exist"""
+        return [c for c in self.changes if c.previous == 'failed' and c.current != 'excluded']
+
+    def new_exclusions(self):
+        """Entities excluded now that were not excluded before"""
+        return [c for c in self.changes if c.current == 'excluded']
+
+    def transitions(self):
+        """Number of changes per (previous status, current status)
+
+        Returns:
+            collections.Counter
+        """
+        return Counter((c.previous, c.current) for c in self.changes)
+
+    def report(self):
+        """Compact, JSON serializable, report of the delta
+
+        Returns:
+            dict: {'counts': {...}, 'rules': {ruleKey: {'name', 'severity', 'newFailures', 'resolved', 'newExclusions'}}}
+        """
+        categories = (('newFailures', self.new_failures()), ('resolved', self.resolved()),
+                      ('newExclusions', self.new_exclusions()))
+        rules = {}
+        for category, changes in categories:
+            for change in changes:
+                if change.rule not in rules:
+                    rule = self.rules.get(change.rule) or {}
+                    rules[change.rule] = {'name': rule.get('name'), 'severity': rule.get('severity'),
+                                          'newFailures': [], 'resolved': [], 'newExclusions': []}
+                rules[change.rule][category].append(change.entityId)
+        counts = dict((category, len(changes)) for category, changes in categories)
+        counts['unchanged'] = self.unchanged
+        return {'counts': counts, 'rules': rules}
+
+
+def diff_assessments(previous, current):
+    """Compare the entity results of two assessments
+
+    Args:
+        previous (iterable): (rule, entityResult) records of the previous assessment.
+        current (iterable): (rule, entityResult) records of the current assessment.
+
+    Returns:
+        AssessmentDelta
+    """
+    diff = AssessmentDiff()
+    for rule, entityResult in previous:
+        diff.add_previous(rule, entityResult)
+    for rule, entityResult in current:
+        diff.add_current(rule, entityResult)
+    return diff.finish()
@@ -14,21 +14,93 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import copy
 import json
+import time
+import queue
+import threading
 import requests
+from datetime import timedelta
 from requests import ConnectionError
+from concurrent.futures import ThreadPoolExecutor
+
+from .codec import get_codec
+from .bulk import ProgressLog, iter_bulk, job_key, run_bulk
+from .diff import DIFF_FIELDS, diff_assessments
+from .export import ASSET_COLUMNS, ENTITY_RESULT_COLUMNS, Exporter, entity_result_record
+from .exceptions import Dome9APIError, PartialResultError
+from .exclusions import ExclusionMatcher
+from .index import ResourceIndex
+from .metrics import RequestInfo
+from .inventory import sync_scope
+from .retry import RetryPolicy
+from .routes import route_family, route_id
+from .singleflight import SingleFlight
+from .streaming import iter_entity_results
+from .transport import Transport
+
+# Route families served from a local index: list method and indexed fields
+INDEXED = {
+    'CompliancePolicy': ('list_rulesets', ('id', 'name')),
+    'Compliance/Remediation': ('list_remediations', ('id',)),
+    'Exclusion': ('list_exclusions', ('id',)),
+}
 
 
 class Dome9(object):
 
-    def __init__(self, key=None, secret=None, endpoint='https://api.dome9.com', apiVersion='v2'):
+    def __init__(self, key=None, secret=None, endpoint='https://api.dome9.com', apiVersion='v2',
+                 transport=None, poolSize=10, retry=None, rateLimiter=None, cache=None, indexMaxAge=60, codec=None,
+                 hooks=None, singleFlight=True, connectTimeout=10, readTimeout=300, circuitBreaker=None,
+                 concurrency=None):
         self.key = None
         self.secret = None
         self.headers = {'Content-Type': 'application/json',
                         'Accept': 'application/json'}
         self.endpoint = endpoint + '/{}/'.format(apiVersion)
+        self.transport = transport or Transport(poolSize=poolSize)
+        self.retry = retry or RetryPolicy()
+        self.rateLimiter = rateLimiter
+        self.circuitBreaker = circuitBreaker
+        self.concurrency = concurrency
+        self.timeout = (connectTimeout, readTimeout)
+        self.cache = cache
+        self.codec = get_codec(codec)
+        self.singleFlight = self._single_flight() if singleFlight else None
+        self.hooks = {'before': [], 'after': []}
+        for event, hook in (hooks or {}).items():
+            for h in (hook if isinstance(hook, (list, tuple)) else [hook]):
+                self.add_hook(event, h)
+        self.indexes = dict((family, ResourceIndex(fields, maxAge=indexMaxAge)) for family, (_, fields) in INDEXED.items())
         self._load_credentials(key, secret)
 
+    def close(self):
+        """Release the pooled connections of the client"""
+        self.transport.close()
+
+    def _single_flight(self):
+        return SingleFlight()
+
+    def add_hook(self, event, hook):
+        """Call `hook` with a :class:`dome9.metrics.RequestInfo` before or after every API request
+
+        After hooks receive the status, retries, sizes and timings of the request
+        (see :class:`dome9.metrics.MetricsCollector` for a built-in collector).
+
+        Args:
+            event (str): before or after
+            hook (callable): Function called with the request info.
+        """
+        if event not in self.hooks:
+            raise ValueError('Unknown hook event %r, expected before or after' % event)
+        self.hooks[event].append(hook)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     # ------ System Methods ------
     # ----------------------------
 
@@ -42,37 +114,20 @@ class Dome9(object):
         else:
             raise ValueError('No provided credentials')
 
-    def _request(self, method, route, payload=None):  # noqa: C901 (lint ignore)
-        res = url = err = jsonObject = None
-        _payload = json.dumps(payload)
-        url = '{}{}'.format(self.endpoint, route)
-
-        try:
-            if method == 'get':
-                res = requests.get(
-                    url=url, params=_payload, headers=self.headers, auth=(self.key, self.secret))
-            elif method == 'post':
-                res = requests.post(
-                    url=url, data=_payload, headers=self.headers, auth=(self.key, self.secret))
-            elif method == 'patch':
-                res = requests.patch(
-                    url=url, json=_payload, headers=self.headers, auth=(self.key, self.secret))
-            elif method == 'put':
-                res = requests.put(
-                    url=url, data=_payload, headers=self.headers, auth=(self.key, self.secret))
-            elif method == 'delete':
-                res = requests.delete(
-                    url=url, params=_payload, headers=self.headers, auth=(self.key, self.secret))
-                return bool(res.status_code == 204)
-
-        except requests.ConnectionError as ex:
-            raise ConnectionError(url, ex.message)
+    def _request_args(self, method, payload):
+        if method in ('get', 'delete'):
+            return {'params': self.codec.dumps(payload)}
+        elif method == 'patch':
+            return {'json': self.codec.dumps(payload)}
+        return {'data': self.codec.encode(payload)}
 
+    def _parse_response(self, res, info=None):
+        err = jsonObject = None
         # If status_code is in range 200-209
         if str(res.status_code)[0] == '2':
             try:
                 if res.content:
-                    jsonObject = res.json()
+                    jsonObject = self._decode(info, res.content)
             except Exception as ex:
                 err = {'code': res.status_code, 'message': getattr(
                     ex, 'message', ''), 'content': res.content}
@@ -81,9 +136,254 @@ class Dome9(object):
                    'message': res.reason, 'content': res.content}
 
         if err:
-            raise Exception(err)
+            raise Dome9APIError(err)
         return jsonObject
 
+    def _send(self, method, route, payload=None, info=None, **options):
+        url = '{}{}'.format(self.endpoint, route)
+        kwargs = self._request_args(method, payload)
+        kwargs.update(options)
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if self.rateLimiter:
+                self.rateLimiter.acquire(route)
+            try:
+                res, start = self._transmit(method, url, route, kwargs)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                self._record_attempt(info, attempt, kwargs)
+                if not self.retry.should_retry(attempt, method, route):
+                    raise ConnectionError(url, str(ex))
+                time.sleep(self.retry.delay(attempt))
+                continue
+
+            self._record_attempt(info, attempt, kwargs, start, res)
+            if not self.retry.should_retry(attempt, method, route, res.status_code):
+                return res
+            res.close()
+            time.sleep(self.retry.delay(attempt, res.headers.get('Retry-After')))
+
+    def _transmit(self, method, url, route, kwargs):
+        # One attempt, through the concurrency limit and the circuit breaker of the route family.
+        # Returns the response and when it was sent, once a slot was free
+        started = self.concurrency.acquire(route) if self.concurrency is not None else None
+        self._allow(route, started)
+        sent = time.perf_counter()
+        try:
+            res = self.transport.request(method, url, headers=self.headers, auth=(self.key, self.secret), **kwargs)
+        except Exception:
+            self._settle(route, started, None)
+            raise
+        except BaseException:
+            self._abandon(route, started, True)
+            raise
+        self._settle(route, started, res.status_code)
+        return res, sent
+
+    def _allow(self, route, started):
+        # Taken once the concurrency slot is held, so waiting for one never keeps a half-open trial
+        if self.circuitBreaker is None:
+            return
+        try:
+            self.circuitBreaker.allow(route)
+        except BaseException:
+            self._abandon(route, started, False)
+            raise
+
+    def _abandon(self, route, started, trial):
+        # Neither a success nor a failure: give back the trial and the slot
+        if trial and self.circuitBreaker is not None:
+            self.circuitBreaker.discard(route)
+        if self.concurrency is not None:
+            self.concurrency.discard(route)
+
+    def _settle(self, route, started, status):
+        failed = status is None or status >= 500
+        if self.circuitBreaker is not None:
+            self.circuitBreaker.record(route, not failed)
+        if self.concurrency is not None:
+            self.concurrency.release(route, started, failed or status == 429)
+
+    def _start_request(self, method, route):
+        if not (self.hooks['before'] or self.hooks['after']):
+            return None
+        info = RequestInfo(method, route)
+        for hook in self.hooks['before']:
+            hook(info)
+        return info
+
+    def _record_attempt(self, info, attempt, kwargs, start=None, res=None):
+        if info is None:
+            return
+        info.attempts = attempt
+        info.bytesOut = len(kwargs.get('data') or kwargs.get('params') or kwargs.get('json') or '')
+        if res is None:
+            return
+        now = time.perf_counter()
+        elapsed = getattr(res, 'elapsed', None)
+        ttfb = min(elapsed.total_seconds(), now - start) if isinstance(elapsed, timedelta) else now - start
+        info.status = res.status_code
+        info.timings.update(wait=start - info.started, ttfb=ttfb, download=now - start - ttfb)
+
+    def _finish_request(self, info, error=None):
+        if info is None:
+            return
+        info.error = error
+        info.timings['total'] = time.perf_counter() - info.started
+        for hook in self.hooks['after']:
+            hook(info)
+
+    def _decode(self, info, content):
+        if info is None:
+            return self.codec.loads(content)
+        start = time.perf_counter()
+        result = self.codec.loads(content)
+        info.timings['decode'] = time.perf_counter() - start
+        info.bytesIn = len(content)
+        return result
+
+    def _cache_key(self, method, route, payload):
+        if self.cache is None or method != 'get':
+            return None
+        return self.cache.key('{} {}'.format(self.key, self.endpoint), route, json.dumps(payload))
+
+    def _cache_response(self, cacheKey, route, res, info=None, generation=None):
+        # The raw body is cached: no re-encoding, and every hit decodes a fresh copy
+        jsonObject = self._parse_response(res, info)
+        if cacheKey and res.content:
+            self.cache.set(cacheKey, route, res.content, generation)
+        return jsonObject
+
+    def _invalidate_cache(self, method, route):
+        if method == 'get':
+            return
+        if self.cache is not None:
+            self.cache.invalidate(route)
+        if self.singleFlight is not None:
+            # GETs in flight may have been read before the write: later callers must not join them
+            self.singleFlight.detach(route_family(route))
+
+    def _request(self, method, route, payload=None):
+        info = self._start_request(method, route)
+        error = None
+        try:
+            return self._fetch(method, route, payload, info)
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            self._finish_request(info, error)
+
+    def _fetch(self, method, route, payload, info):
+        cacheKey = self._cache_key(method, route, payload)
+        cached = self.cache.get(cacheKey) if cacheKey else None
+        if cached is not None:
+            if info is not None:
+                info.cached = True
+            return self._decode(info, cached)
+        generation = self.cache.generation(route) if cacheKey else None
+
+        if self.singleFlight is not None and method == 'get':
+            res, shared = self.singleFlight.do(self._flight_key(route, payload),
+                                               lambda: self._load(self._send(method, route, payload, info=info)),
+                                               route_family(route))
+            if shared:
+                return self._parse_response(res, self._coalesced(info, res))
+            return self._cache_response(cacheKey, route, res, info, generation)
+
+        try:
+            res = self._send(method, route, payload, info=info)
+        finally:
+            self._invalidate_cache(method, route)
+        if method == 'delete':
+            return self._update_indexes(method, route, bool(res.status_code == 204))
+        return self._update_indexes(method, route, self._cache_response(cacheKey, route, res, info, generation))
+
+    def _flight_key(self, route, payload):
+        return route if payload is None else '{}?{}'.format(route, self.codec.dumps(payload))
+
+    @staticmethod
+    def _load(res):
+        # The body is read by the caller leading the flight, before others share the response
+        res.content
+        return res
+
+    @staticmethod
+    def _coalesced(info, res):
+        if info is not None:
+            info.coalesced = True
+            info.status = res.status_code
+        return info
+
+    def _count_bytes(self, info, chunks):
+        for chunk in chunks:
+            info.bytesIn += len(chunk)
+            yield chunk
+
+    def _iter_entity_results(self, method, route, payload, fields, includeTestObj, meta, chunkSize=65536):
+        info = self._start_request(method, route)
+        error = None
+        try:
+            res = self._send(method, route, payload, info=info, stream=True)
+            try:
+                if str(res.status_code)[0] != '2':
+                    self._parse_response(res)
+                chunks = res.iter_content(chunkSize)
+                if info is not None:
+                    chunks = self._count_bytes(info, chunks)
+                start = time.perf_counter()
+                for record in iter_entity_results(chunks, fields, includeTestObj, meta):
+                    yield record
+                if info is not None:
+                    info.timings['download'] = time.perf_counter() - start
+            finally:
+                res.close()
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            self._finish_request(info, error)
+
+    def _update_indexes(self, method, route, result):
+        index = self.indexes.get(route_family(route))
+        if index is None or method == 'get':
+            return result
+        if method == 'delete':
+            if result:
+                index.discard(route_id(route))
+        else:
+            index.upsert(result)
+        return result
+
+    def _index_lookup(self, family, field, value):
+        index = self.indexes[family]
+        listing = getattr(self, INDEXED[family][0])
+        if index.stale():
+            index.load(listing())
+        item = index.lookup(field, value)
+        if item is None and index.refreshable():
+            index.load(listing())
+            item = index.lookup(field, value)
+        return item
+
+    def refresh_indexes(self):
+        """Reload the local indexes of rulesets, remediations and exclusions"""
+        for family, (listing, _) in INDEXED.items():
+            self.indexes[family].load(getattr(self, listing)())
+
+    def _dry_run(self):
+        # Copy of the client that returns the requests it would send instead of sending them
+        client = copy.copy(self)
+        client._request = lambda method, route, payload=None: {'method': method, 'route': route, 'payload': payload}
+        return client
+
+    def _bulk(self, operation, items, workers=8, dryRun=False, unpack=False):
+        client = self._dry_run() if dryRun else self
+        method = getattr(client, operation)
+        return run_bulk((lambda item: method(**item)) if unpack else method, items, workers)
+
     def _get(self, route, payload=None):
         return self._request('get', route, payload)
 
@@ -160,20 +460,47 @@ class Dome9(object):
         """
         return self._get(route='KubernetesAccount')
 
-    def list_cloud_accounts(self):
+    def _vendor_listings(self):
+        return [('azure', self.list_azure_accounts), ('aws', self.list_aws_accounts),
+                ('google', self.list_google_accounts), ('kubernetes', self.list_kubernetes_accounts)]
+
+    def _merge_vendor_accounts(self, vendors, results, strict):
+        accounts = []
+        errors = {}
+        for vendor, result in zip(vendors, results):
+            if isinstance(result, Exception):
+                errors[vendor] = result
+            elif result:
+                accounts.extend(result)
+        if errors and strict:
+            raise PartialResultError(accounts, errors)
+        return accounts
+
+    def list_cloud_accounts(self, strict=True):
         """List all accounts (AWS, Azure, GCP & Kubernetes)
 
+        Every vendor is listed concurrently and the results are merged in a fixed order:
+        Azure, AWS, Google and Kubernetes.
+
+        Args:
+            strict (bool, optional): Raise if any vendor listing fails. When False, the accounts
+                of the vendors that succeeded are returned. Defaults to True.
+
         Returns:
             list: List of Cloud Accounts.
 
+        Raises:
+            PartialResultError: Some vendor listings failed. Accounts of the others are
+                available in `results` and the error of each failed vendor in `errors`.
+
         Response object:
             .. literalinclude:: schemas/AwsCloudAccount.json
         """
-        accounts = self.list_azure_accounts()
-        accounts.extend(self.list_aws_accounts())
-        accounts.extend(self.list_google_accounts())
-        accounts.extend(self.list_kubernetes_accounts())
-        return accounts
+        listings = self._vendor_listings()
+        with ThreadPoolExecutor(max_workers=len(listings)) as executor:
+            futures = [executor.submit(listing) for _, listing in listings]
+        results = [future.exception() or future.result() for future in futures]
+        return self._merge_vendor_accounts([vendor for vendor, _ in listings], results, strict)
 
     def connect_aws_account(self, name, secret, roleArn):
         """Connect AWS account to Dome9
@@ -214,7 +541,164 @@ class Dome9(object):
     # ------------------- Assets -------------------
     # ----------------------------------------------
 
-    def list_protected_assets(self, textSearch="", filters=[], pageSize=1000):
+    def _asset_search(self, textSearch, filters, pageSize, searchAfter=None):
+        pagination = {"pageSize": pageSize, "filter": {
+            "fields": filters, 'freeTextPhrase': textSearch}}
+        if searchAfter:
+            pagination['searchAfter'] = searchAfter
+        return pagination
+
+    def _iter_asset_pages(self, textSearch, filters, pageSize, prefetch=False, searchAfter=None):
+        def fetch(searchAfter=None):
+            return self._post(route='protected-asset/search',
+                              payload=self._asset_search(textSearch, filters, pageSize, searchAfter))
+
+        # On failure, the cursor of the page that could not be fetched is attached to the
+        # exception (`searchAfter`) so the scan can be resumed from there.
+        cursor = searchAfter
+        try:
+            if not prefetch:
+                rsp = fetch(cursor)
+                yield rsp
+                while rsp['searchAfter']:
+                    cursor = rsp['searchAfter']
+                    rsp = fetch(cursor)
+                    yield rsp
+                return
+
+            executor = ThreadPoolExecutor(max_workers=1)
+            try:
+                future = executor.submit(fetch, cursor)
+                while future:
+                    rsp = future.result()
+                    future = None
+                    if rsp['searchAfter']:
+                        cursor = rsp['searchAfter']
+                        future = executor.submit(fetch, cursor)
+                    yield rsp
+            finally:
+                executor.shutdown(wait=False)
+        except Exception as ex:
+            ex.searchAfter = cursor
+            raise
+
+    def _asset_partitions(self, textSearch, filters, partitionBy):
+        """Discover the values of `partitionBy` through the search aggregations.
+
+        Returns the first search response and the values, or no values when the
+        aggregation buckets do not cover every asset of the query.
+        """
+        rsp = self._post(route='protected-asset/search', payload=self._asset_search(textSearch, filters, 1))
+        return rsp, self._partition_values(rsp, partitionBy)
+
+    def _partition_values(self, rsp, partitionBy):
+        buckets = (rsp.get('aggregations') or {}).get(partitionBy) or []
+        if sum(bucket['count'] for bucket in buckets) != rsp['totalCount']:
+            return None
+        return [bucket['value'] for bucket in buckets]
+
+    def _partition_filters(self, filters, partitionBy, value):
+        return [f for f in filters if f['name'] != partitionBy] + [{'name': partitionBy, 'value': value}]
+
+    def _iter_partitioned_asset_pages(self, textSearch, filters, pageSize, partitionBy, workers):
+        _, partitions = self._asset_partitions(textSearch, filters, partitionBy)
+        if partitions is None:
+            return self._iter_asset_pages(textSearch, filters, pageSize)
+        return self._iter_partition_scans(textSearch, filters, pageSize, partitionBy, workers, partitions)
+
+    def _iter_partition_scans(self, textSearch, filters, pageSize, partitionBy, workers, partitions):
+        pages = queue.Queue(maxsize=workers * 2)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for value in partitions:
+                executor.submit(self._scan_partition, pages, stop, textSearch,
+                                self._partition_filters(filters, partitionBy, value), pageSize)
+            for page in self._drain_pages(pages, len(partitions)):
+                yield page
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+
+    def _scan_partition(self, pages, stop, textSearch, filters, pageSize):
+        try:
+            for page in self._iter_asset_pages(textSearch, filters, pageSize):
+                if stop.is_set():
+                    break
+                self._put_page(pages, stop, page)
+        except Exception as ex:
+            self._put_page(pages, stop, ex)
+        self._put_page(pages, stop, None)
+
+    @staticmethod
+    def _put_page(pages, stop, item):
+        while not stop.is_set():
+            try:
+                return pages.put(item, timeout=0.1)
+            except queue.Full:
+                pass
+
+    @staticmethod
+    def _drain_pages(pages, remaining):
+        while remaining:
+            page = pages.get()
+            if page is None:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+
+    def _dedup_assets(self, assets, seen):
+        unique = []
+        for asset in assets:
+            if asset['id'] not in seen:
+                seen.add(asset['id'])
+                unique.append(asset)
+        return unique
+
+    def iter_protected_assets(self, textSearch="", filters=[], pageSize=1000, pages=False, prefetch=False,
+                              partitionBy=None, workers=8, searchAfter=None):
+        """Iterate over Cloud Assets as pages arrive, keeping a single page in memory
+
+        Args:
+            textSearch (list): Filter query by using text string. (i.e.: prod-uk)
+            filters (list): List of filters. `[{name: "platform", value: "aws"},{name: "cloudAccountId", value: "0123456789"}]`
+            List of filter names: organizationalUnitId, platform, type, cloudAccountId, region, network, resourceGroup.
+            pageSize (int): Items per query
+            pages (bool, optional): Yield whole pages (search responses) instead of assets. Defaults to False.
+            prefetch (bool, optional): Fetch the next page in background while the current one
+                is being consumed. Defaults to False.
+            partitionBy (str, optional): Split the query by the values of this filter
+                (cloudAccountId, region, platform, type...) and paginate every sub-query concurrently.
+                Assets are yielded in arrival order, deduplicated by `id`. Defaults to None.
+            workers (int, optional): Sub-queries paginated at the same time. Defaults to 8.
+            searchAfter (list, optional): Resume a scan from this cursor. When a page cannot be fetched,
+                the raised exception has the cursor to resume from in its `searchAfter` attribute.
+
+        Yields:
+            dict: Protected asset (or search response when `pages` is set).
+
+        Response object:
+            .. literalinclude:: schemas/ProtectedAsset.json
+        """
+        if partitionBy:
+            seen = set()
+            iterator = self._iter_partitioned_asset_pages(textSearch, filters, pageSize, partitionBy, workers)
+        else:
+            iterator = self._iter_asset_pages(textSearch, filters, pageSize, prefetch, searchAfter)
+
+        for page in iterator:
+            if partitionBy:
+                page['assets'] = self._dedup_assets(page['assets'], seen)
+            if pages:
+                yield page
+            else:
+                for asset in page['assets']:
+                    yield asset
+
+    def list_protected_assets(self, textSearch="", filters=[], pageSize=1000, partitionBy=None, workers=8,
+                              searchAfter=None):
         """List all Cloud Assets
 
         Args:
@@ -222,6 +706,14 @@ class Dome9(object):
             filters (list): List of filters. `[{name: "platform", value: "aws"},{name: "cloudAccountId", value: "0123456789"}]`
             List of filter names: organizationalUnitId, platform, type, cloudAccountId, region, network, resourceGroup.
             pageSize (int): Items per query
+            partitionBy (str, optional): Split the query by the values of this filter
+                (cloudAccountId, region, platform, type...), discovered from the search aggregations,
+                and paginate every sub-query concurrently. Assets are merged in partition order and
+                deduplicated by `id`. If the aggregations do not cover every asset, a sequential
+                search is done instead. Defaults to None.
+            workers (int, optional): Sub-queries paginated at the same time. Defaults to 8.
+            searchAfter (list, optional): Resume a scan from this cursor. When a page cannot be fetched,
+                the raised exception has the cursor to resume from in its `searchAfter` attribute.
 
         Returns:
             dict: Pagination of protected assets.
@@ -229,18 +721,73 @@ class Dome9(object):
         Response object:
             .. literalinclude:: schemas/ProtectedAsset.json
         """
-        results = {}
-        pagination = {"pageSize": pageSize, "filter": {
-            "fields": filters, 'freeTextPhrase': textSearch}}
-        rsp = self._post(route='protected-asset/search', payload=pagination)
-        results = rsp
+        if partitionBy:
+            return self._list_partitioned_assets(textSearch, filters, pageSize, partitionBy, workers)
+
+        results = None
+        for page in self._iter_asset_pages(textSearch, filters, pageSize, searchAfter=searchAfter):
+            if results is None:
+                results = page
+            else:
+                results['assets'].extend(page['assets'])
+
+        return results
+
+    def sync_inventory(self, inventory, textSearch="", filters=[], pageSize=1000, partitionBy=None, workers=8):
+        """Sync Cloud Assets into a local inventory
 
-        while rsp['searchAfter']:
-            pagination['searchAfter'] = rsp['searchAfter']
-            rsp = self._post(route='protected-asset/search',
-                             payload=pagination)
-            results['assets'].extend(rsp['assets'])
+        Only the assets that changed are written, one transaction per page. Stored assets
+        matching `filters` that are no longer listed are marked as deleted (not when `textSearch`
+        is used, or filters that are not inventory columns, since the listing is then partial).
 
+        Args:
+            inventory (dome9.inventory.AssetInventory): Local inventory.
+            textSearch, filters, pageSize, partitionBy, workers: See `iter_protected_assets`.
+
+        Returns:
+            dict: Number of assets added, updated, unchanged and deleted.
+        """
+        scope = sync_scope(textSearch, filters)
+        pages = self.iter_protected_assets(textSearch, filters, pageSize, pages=True, prefetch=True,
+                                           partitionBy=partitionBy, workers=workers)
+        return inventory.sync((page['assets'] for page in pages), scope, scope is not None)
+
+    def export_protected_assets(self, path, format=None, compression=None, textSearch="", filters=[], pageSize=1000,
+                                partitionBy=None, workers=8):
+        """Export Cloud Assets to a NDJSON, CSV or Parquet file as pages arrive
+
+        Assets are flattened to `dome9.export.ASSET_COLUMNS`; tags and additional fields are kept as JSON.
+
+        Args:
+            path (str): Output file. The format and compression default to its extension (i.e.: assets.csv.gz).
+            format (str, optional): ndjson, csv or parquet (requires pyarrow).
+            compression (str, optional): gzip or zstd (requires zstandard).
+            textSearch, filters, pageSize, partitionBy, workers: See `iter_protected_assets`.
+
+        Returns:
+            int: Number of assets exported.
+        """
+        with Exporter(path, ASSET_COLUMNS, format, compression) as exporter:
+            for page in self.iter_protected_assets(textSearch, filters, pageSize, pages=True, prefetch=True,
+                                                   partitionBy=partitionBy, workers=workers):
+                exporter.write_many(page['assets'])
+        return exporter.count
+
+    def _list_partitioned_assets(self, textSearch, filters, pageSize, partitionBy, workers):
+        results, partitions = self._asset_partitions(textSearch, filters, partitionBy)
+        if partitions is None:
+            return self.list_protected_assets(textSearch, filters, pageSize)
+
+        def scan(value):
+            subquery = self._partition_filters(filters, partitionBy, value)
+            return [asset for page in self._iter_asset_pages(textSearch, subquery, pageSize) for asset in page['assets']]
+
+        seen = set()
+        results['assets'] = []
+        results['searchAfter'] = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for assets in executor.map(scan, partitions):
+                results['assets'].extend(self._dedup_assets(assets, seen))
         return results
 
     # ------------------ Rulesets ------------------
@@ -260,6 +807,9 @@ class Dome9(object):
     def get_ruleset(self, rulesetId=None, name=None):
         """Get a specific Compliance ruleset
 
+        Rulesets located by name are served from a local index, loaded once and kept
+        up to date with the rulesets created, updated and deleted by this client.
+
         Args:
             rulesetId (str): Locate ruleset by id
             name (str): Locate ruleset by name
@@ -273,7 +823,7 @@ class Dome9(object):
         if rulesetId:
             return self._get(route='CompliancePolicy/%s' % str(rulesetId))
         elif name:
-            return filter(lambda x: x['name'] == name, self.list_rulesets())[0]
+            return self._index_lookup('CompliancePolicy', 'name', name)
 
     def create_ruleset(self, ruleset):
         """Create a Compliance ruleset
@@ -314,6 +864,48 @@ class Dome9(object):
         """
         return self._delete(route='CompliancePolicy/%s' % str(rulesetId))
 
+    def create_rulesets_bulk(self, rulesets, workers=8, dryRun=False):
+        """Create many rulesets concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            rulesets (list): Rulesets (see `create_ruleset`).
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('create_ruleset', rulesets, workers, dryRun)
+
+    def update_rulesets_bulk(self, rulesets, workers=8, dryRun=False):
+        """Update many rulesets concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            rulesets (list): Rulesets (see `update_ruleset`).
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('update_ruleset', rulesets, workers, dryRun)
+
+    def delete_rulesets_bulk(self, rulesetIds, workers=8, dryRun=False):
+        """Delete many rulesets concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            rulesetIds (list): Ids of the rulesets.
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('delete_ruleset', rulesetIds, workers, dryRun)
+
     # ------------------ Remediations ------------------
     # --------------------------------------------------
 
@@ -329,7 +921,7 @@ class Dome9(object):
         return self._get(route='Compliance/Remediation')
 
     def get_remediation(self, remediationId):
-        """Get a specific remediation
+        """Get a specific remediation from the local index of remediations
 
         Args:
             remediationId (str): ID of the remediation
@@ -340,8 +932,7 @@ class Dome9(object):
         Response object:
             .. literalinclude:: schemas/Remediation.json
         """
-        remediations = self.list_remediations()
-        return next(filter(lambda x: x['id'] == remediationId, remediations)) if remediations else None
+        return self._index_lookup('Compliance/Remediation', 'id', remediationId)
 
     def create_remediation(self, remediation):
         """Create a Remediation
@@ -382,6 +973,48 @@ class Dome9(object):
         """
         return self._delete(route='Compliance/Remediation?id=%s' % str(remediationId))
 
+    def create_remediations_bulk(self, remediations, workers=8, dryRun=False):
+        """Create many remediations concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            remediations (list): Remediations (see `create_remediation`).
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('create_remediation', remediations, workers, dryRun)
+
+    def update_remediations_bulk(self, remediations, workers=8, dryRun=False):
+        """Update many remediations concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            remediations (list): Remediations (see `update_remediation`).
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('update_remediation', remediations, workers, dryRun)
+
+    def delete_remediations_bulk(self, remediationIds, workers=8, dryRun=False):
+        """Delete many remediations concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            remediationIds (list): Ids of the remediations.
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('delete_remediation', remediationIds, workers, dryRun)
+
     # ------------------  Exclusions  ------------------
     # --------------------------------------------------
 
@@ -397,7 +1030,7 @@ class Dome9(object):
         return self._get(route='Exclusion')
 
     def get_exclusion(self, exclusionId):
-        """Get a specific exclusion
+        """Get a specific exclusion from the local index of exclusions, or from the API when it is not there
 
         Args:
             exclusionId (str): ID of the exclusion
@@ -408,7 +1041,10 @@ class Dome9(object):
         Response object:
             .. literalinclude:: schemas/Exclusion.json
         """
-        return self._get(route='Exclusion/%s' % str(exclusionId))
+        exclusion = self._index_lookup('Exclusion', 'id', exclusionId)
+        if exclusion is None:
+            exclusion = self._get(route='Exclusion/%s' % str(exclusionId))
+        return exclusion
 
     def create_exclusion(self, exclusion):
         """Create an exclusion
@@ -435,6 +1071,57 @@ class Dome9(object):
         """
         return self._delete(route='Exclusion/%s' % str(exclusionId))
 
+    def create_exclusions_bulk(self, exclusions, workers=8, dryRun=False):
+        """Create many exclusions concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            exclusions (list): Exclusions (see `create_exclusion`).
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('create_exclusion', exclusions, workers, dryRun)
+
+    def delete_exclusions_bulk(self, exclusionIds, workers=8, dryRun=False):
+        """Delete many exclusions concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            exclusionIds (list): Ids of the exclusions.
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('delete_exclusion', exclusionIds, workers, dryRun)
+
+    def simulate_exclusions(self, assessmentId, add=None, remove=None, exclusions=None, bundleId=None):
+        """What-if analysis of exclusions against an assessment, computed locally instead of re-running it
+
+        Args:
+            assessmentId (str): Report/Assessment id
+            add (list, optional): Proposed exclusions (Exclusion objects).
+            remove (list, optional): Ids of the exclusions to leave out.
+            exclusions (list, optional): Exclusions to evaluate. Defaults to `list_exclusions()`.
+            bundleId (int, optional): Ruleset of the assessment, when its result does not tell.
+
+        Returns:
+            dict: Impact report (see `dome9.exclusions.ExclusionMatcher.impact`): {'counts': {'excluded',
+                'newlyExcluded', 'noLongerExcluded', 'failuresExcluded'}, 'exclusions', 'rules', 'unsupported'}
+        """
+        if exclusions is None:
+            exclusions = self.list_exclusions()
+        return self._simulate_exclusions(self.get_assessment(assessmentId), exclusions, add, remove, bundleId)
+
+    def _simulate_exclusions(self, result, exclusions, add, remove, bundleId):
+        removed = set(str(exclusionId) for exclusionId in remove or ())
+        exclusions = [exclusion for exclusion in exclusions if str(exclusion.get('id')) not in removed]
+        return ExclusionMatcher(exclusions + list(add or ())).impact(result, bundleId)
+
     # ------------------ Assessments  ------------------
     # --------------------------------------------------
 
@@ -453,6 +1140,11 @@ class Dome9(object):
         Response object:
             .. literalinclude:: schemas/AssessmentResult.json
         """
+        bundle = self._assessment_bundle(rulesetId, cloudAccountId, cloudAccountType, region)
+        results = self._post(route='assessment/bundleV2', payload=bundle)
+        return results
+
+    def _assessment_bundle(self, rulesetId, cloudAccountId, cloudAccountType, region=None):
         bundle = {
             'id': rulesetId,
             'CloudAccountId': cloudAccountId,
@@ -460,8 +1152,30 @@ class Dome9(object):
         }
         if region:
             bundle['region'] = region
-        results = self._post(route='assessment/bundleV2', payload=bundle)
-        return results
+        return bundle
+
+    def iter_run_assessment(self, rulesetId, cloudAccountId, cloudAccountType, region=None,
+                            fields=None, includeTestObj=False, meta=None):
+        """Run a compliance assessment and parse its results incrementally
+
+        The response is parsed as it is downloaded and each entity result is yielded
+        with its rule, so memory stays bounded whatever the size of the assessment.
+
+        Args:
+            rulesetId (str): Id of the Compliance Policy Ruleset to run
+            cloudAccountId (str): Id of the Cloud Account
+            cloudAccountType (str): Type of the Cloud Account (Google, Aws, Azure, Kubernetes, ...)
+            region (str, optional): Set a specific region. Defaults to None.
+            fields (list, optional): Entity result fields to keep (i.e.: `['isValid', 'testObj.id']`). Defaults to all.
+            includeTestObj (bool, optional): Keep the whole `testObj` of each entity result instead of
+                its identity keys (id, dome9Id, entityType, region...). Defaults to False.
+            meta (dict, optional): Filled with the top-level fields of the result (id, request...).
+
+        Yields:
+            tuple: (rule, entityResult)
+        """
+        bundle = self._assessment_bundle(rulesetId, cloudAccountId, cloudAccountType, region)
+        return self._iter_entity_results('post', 'assessment/bundleV2', bundle, fields, includeTestObj, meta)
 
     def get_assessment(self, assessmentId):
         """Get results of an assesment by id
@@ -477,6 +1191,102 @@ class Dome9(object):
         """
         return self._get(route='AssessmentHistoryV2/%s' % str(assessmentId))
 
+    def iter_assessment(self, assessmentId, fields=None, includeTestObj=False, meta=None):
+        """Get results of an assessment by id, parsed incrementally
+
+        Args:
+            assessmentId (str): Report/Assessment id
+            fields (list, optional): Entity result fields to keep (i.e.: `['isValid', 'testObj.id']`). Defaults to all.
+            includeTestObj (bool, optional): Keep the whole `testObj` of each entity result instead of
+                its identity keys (id, dome9Id, entityType, region...). Defaults to False.
+            meta (dict, optional): Filled with the top-level fields of the result (id, request...).
+
+        Yields:
+            tuple: (rule, entityResult)
+        """
+        route = 'AssessmentHistoryV2/%s' % str(assessmentId)
+        return self._iter_entity_results('get', route, None, fields, includeTestObj, meta)
+
+    def export_assessment(self, assessmentId, path, format=None, compression=None):
+        """Export the entity results of an assessment to a NDJSON, CSV or Parquet file, parsed incrementally
+
+        Entity results are flattened with their rule to `dome9.export.ENTITY_RESULT_COLUMNS`.
+
+        Args:
+            assessmentId (str): Report/Assessment id
+            path (str): Output file. The format and compression default to its extension (i.e.: results.parquet).
+            format (str, optional): ndjson, csv or parquet (requires pyarrow).
+            compression (str, optional): gzip or zstd (requires zstandard).
+
+        Returns:
+            int: Number of entity results exported.
+        """
+        with Exporter(path, ENTITY_RESULT_COLUMNS, format, compression) as exporter:
+            for rule, entityResult in self.iter_assessment(assessmentId):
+                exporter.write(entity_result_record(assessmentId, rule, entityResult))
+        return exporter.count
+
+    def diff_assessments(self, previousId, currentId):
+        """Compare two assessments: newly failing entities, resolved ones, new exclusions...
+
+        Both results are streamed; only the keys and statuses of the previous one are kept.
+
+        Args:
+            previousId (str): Report/Assessment id of the previous run
+            currentId (str): Report/Assessment id of the current run
+
+        Returns:
+            dome9.diff.AssessmentDelta: Use its `report()` method for a compact, JSON serializable, summary.
+        """
+        return diff_assessments(self.iter_assessment(previousId, fields=DIFF_FIELDS),
+                                self.iter_assessment(currentId, fields=DIFF_FIELDS))
+
+    def _pending_assessments(self, jobs, progress, summary):
+        for job in jobs:
+            if progress and job_key(job) in progress:
+                summary['skipped'] += 1
+            else:
+                yield job
+
+    def _record_assessment(self, summary, progress, callback, job, result, error):
+        if error is not None:
+            summary['failed'].append((job, error))
+            return
+        if callback:
+            callback(job, result)
+        if progress:
+            progress.add(job_key(job))
+        summary['completed'] += 1
+
+    def run_assessments_bulk(self, jobs, workers=4, callback=None, progressFile=None):
+        """Run many compliance assessments concurrently
+
+        Requests go through the client rate limiter and retry policy. Results are not
+        kept: each one is handed to `callback` as soon as its assessment completes.
+
+        Args:
+            jobs (iterable): Assessments to run, dicts with the arguments of `run_assessment`
+                (rulesetId, cloudAccountId, cloudAccountType and optionally region).
+                See `dome9.bulk.assessment_jobs` to build an account x ruleset x region matrix.
+            workers (int, optional): Assessments running at the same time. Defaults to 4.
+            callback (callable, optional): Called as `callback(job, result)` from the calling thread.
+            progressFile (str, optional): File where completed jobs are recorded. Running again
+                with the same file skips them, resuming an interrupted run.
+
+        Returns:
+            dict: Number of `completed` and `skipped` jobs, and `failed` (job, exception) pairs.
+        """
+        progress = ProgressLog(progressFile) if progressFile else None
+        summary = {'completed': 0, 'skipped': 0, 'failed': []}
+        try:
+            pending = self._pending_assessments(jobs, progress, summary)
+            for _, outcome in iter_bulk(lambda job: self.run_assessment(**job), pending, workers):
+                self._record_assessment(summary, progress, callback, outcome.item, outcome.result, outcome.error)
+        finally:
+            if progress:
+                progress.close()
+        return summary
+
     # -------------------- Users -------------------
     # ----------------------------------------------
 
@@ -542,3 +1352,31 @@ class Dome9(object):
             bool
         """
         return self._delete(route='user/%s' % str(userId))
+
+    def create_users_bulk(self, users, workers=8, dryRun=False):
+        """Create many users concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            users (list): Users, dicts with the arguments of `create_user` (email, name, surname).
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('create_user', users, workers, dryRun, unpack=True)
+
+    def delete_users_bulk(self, userIds, workers=8, dryRun=False):
+        """Delete many users concurrently, through the rate limiter and retry policy of the client
+
+        Args:
+            userIds (list): Ids of the users.
+            workers (int, optional): Max. concurrent requests. Defaults to 8.
+            dryRun (bool, optional): Do not call the API: the result of each item is the request
+                that would be sent ({method, route, payload}). Defaults to False.
+
+        Returns:
+            list: dome9.bulk.BulkResult (item, result, error) of every item, in input order.
+        """
+        return self._bulk('delete_user', userIds, workers, dryRun)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+class Dome9Error(Exception):
+    """Base class of the errors raised by the SDK"""
+
+
+class PartialResultError(Dome9Error):
+    """Some of the calls grouped in one operation failed
+
+    Attributes:
+        results: Merged results of the calls that succeeded.
+        errors (dict): Exception raised by each failed call, by name (i.e.: vendor).
+    """
+
+    def __init__(self, results, errors):
+        super(PartialResultError, self).__init__(
+            'Failed: {}'.format(', '.join('{} ({})'.format(k, v) for k, v in errors.items())))
+        self.results = results
+        self.errors = errors
+
+
+class Dome9APIError(Dome9Error):
+    """The API answered with an error status (or an invalid body)
+
+    The first argument is the error dict ``{'code', 'message', 'content'}``.
+    """
+
+    def __init__(self, err):
+        super(Dome9APIError, self).__init__(err)
+        self.code = err.get('code')
+        self.message = err.get('message')
+        self.content = err.get('content')
+
+
+class CircuitOpenError(Dome9Error):
+    """The circuit breaker of the route family is open: the request was not sent
+
+    Attributes:
+        family (str): Route family (i.e.: `CompliancePolicy`).
+        retryAfter (float): Seconds until a trial request will be let through.
+    """
+
+    def __init__(self, family, retryAfter):
+        super(CircuitOpenError, self).__init__(
+            'Circuit open for {} (retry in {:.1f}s)'.format(family, retryAfter))
+        self.family = family
+        self.retryAfter = retryAfter
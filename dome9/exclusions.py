@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+import copy
+from collections import Counter
+
+from .diff import entity_key
+from .gsl import GSLError, compile_condition, compile_rule
+
+# `[<entity type> where] field='value' [and field='value' ...]`, the logic of entity exclusions
+_LOGIC = re.compile(r"^\s*(?:\w+\s+where\s+)?(.+?)\s*$", re.IGNORECASE | re.DOTALL)
+_TERM = re.compile(r"^\s*([\w.]+)\s*=\s*'((?:[^'\\]|\\.)*)'\s*$", re.DOTALL)
+_TYPED = re.compile(r"^\s*\w+\s+where\s", re.IGNORECASE)
+_AND = re.compile(r"\s+and\s+", re.IGNORECASE)
+
+
+def normalize_region(region):
+    """Region in the notation of the assets (us_east_1), whatever the notation of the cloud (us-east-1)"""
+    return region.lower().replace('-', '_') if region else region
+
+
+def compile_logic(logic):
+    """Compile the entity logic of an exclusion
+
+    Only conjunctions of equalities, the usual entity exclusions, are supported
+    (i.e.: `Instance where id='i-1' and region='us_east_1'`); see `compile_predicate` for the rest.
+
+    Args:
+        logic (str): Exclusion logic.
+
+    Returns:
+        dict: {field path: value} the entity must have.
+
+    Raises:
+        ValueError: Unsupported logic.
+    """
+    conditions = {}
+    for term in _AND.split(_LOGIC.match(logic).group(1)):
+        match = _TERM.match(term)
+        if match is None:
+            raise ValueError('Unsupported exclusion logic: %r' % logic)
+        conditions[match.group(1)] = match.group(2).replace("\\'", "'")
+    return conditions
+
+
+def compile_predicate(logic):
+    """Compile any exclusion logic, `[<entity type> where] <GSL condition>`, into a predicate of entities
+
+    Raises:
+        GSLError: Invalid or unsupported GSL.
+    """
+    if not _TYPED.match(logic):
+        return compile_condition(logic)
+    rule = compile_rule(logic)
+    if rule.where is None or rule.should is not None:
+        raise GSLError('Expected "<EntityType> where <condition>" in %r' % logic)
+    return lambda testObj: rule.applies_to(testObj) and rule.where(testObj)
+
+
+def _field(obj, path):
+    for name in path.split('.'):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(name)
+    return obj
+
+
+class CompiledExclusion(object):
+    """Exclusion with its scope precomputed
+
+    Attributes:
+        id (str): Exclusion id.
+        regions (frozenset): Normalized regions it applies to. None for all of them.
+        entityId (str): Entity it applies to when its logic is `id='...'`.
+        conditions (dict): Other {field path: value} conditions of its logic.
+        predicate (function): GSL predicate of its logic, when it is not a conjunction of equalities.
+    """
+
+    def __init__(self, exclusion):
+        self.exclusion = exclusion
+        self.id = exclusion.get('id')
+        regions = exclusion.get('regions') or ([exclusion['region']] if exclusion.get('region') else None)
+        self.regions = frozenset(normalize_region(region) for region in regions) if regions else None
+        self.conditions = {}
+        self.predicate = None
+        if exclusion.get('logic'):
+            try:
+                self.conditions = compile_logic(exclusion['logic'])
+            except ValueError:
+                self.predicate = compile_predicate(exclusion['logic'])
+        self.entityId = self.conditions.pop('id', None)
+
+    def matches(self, testObj, region):
+        if self.regions is not None and region not in self.regions:
+            return False
+        for path, value in self.conditions.items():
+            actual = _field(testObj, path)
+            if actual is None or str(actual) != value:
+                return False
+        return self.predicate is None or bool(self.predicate(testObj))
+
+
+class _RulePlan(object):
+    """Exclusions of a rule, split by entity id (hash lookup) and the ones to check on every entity"""
+
+    def __init__(self, exclusions):
+        self.byEntity = {}
+        self.scan = []
+        for exclusion in exclusions:
+            if exclusion.entityId is None:
+                self.scan.append(exclusion)
+            else:
+                self.byEntity.setdefault(exclusion.entityId, []).append(exclusion)
+
+    def match(self, testObj, region):
+        entityId = testObj.get('id')
+        for exclusion in self.byEntity.get(None if entityId is None else str(entityId), ()):
+            if exclusion.matches(testObj, region):
+                return exclusion
+        for exclusion in self.scan:
+            if exclusion.matches(testObj, region):
+                return exclusion
+        return None
+
+
+class ExclusionMatcher(object):
+    """Offline evaluation of exclusions against assessment results
+
+    Exclusions are compiled once and indexed by ruleset (`bundleId`), rule (`ruleLogicHash`,
+    `ruleId` or `ruleName`) and entity (`id='...'` logic). For each assessment, the ones of
+    other rulesets or cloud accounts are discarded, and every entity result is then matched
+    against the exclusions of its rule in a single pass, without a server-side assessment.
+
+    Usage:
+        matcher = ExclusionMatcher(dome9.list_exclusions() + [proposedExclusion])
+        matcher.impact(dome9.get_assessment(assessmentId))
+
+    Args:
+        exclusions (list): Exclusion objects (see `Dome9.list_exclusions`). Besides the fields of the API,
+            a `region` or a `regions` list limits an exclusion to those regions.
+
+    Attributes:
+        unsupported (list): (exclusion, error) of the exclusions whose logic is not valid GSL.
+            They never match.
+    """
+
+    def __init__(self, exclusions):
+        self.exclusions = []
+        self.unsupported = []
+        for exclusion in exclusions:
+            try:
+                self.exclusions.append(CompiledExclusion(exclusion))
+            except ValueError as error:
+                self.unsupported.append((exclusion, error))
+
+    def _candidates(self, request, bundleId):
+        """Exclusions of the ruleset and cloud account of an assessment, by rule"""
+        accounts = set(str(request[name]) for name in ('dome9CloudAccountId', 'cloudAccountId', 'externalCloudAccountId')
+                       if request.get(name))
+        byRule = {}
+        for compiled in self.exclusions:
+            exclusion = compiled.exclusion
+            if exclusion.get('bundleId') is not None and bundleId is not None and str(exclusion['bundleId']) != str(bundleId):
+                continue
+            if exclusion.get('cloudAccountId') and accounts and str(exclusion['cloudAccountId']) not in accounts:
+                continue
+            for field, kind in (('ruleLogicHash', 'hash'), ('ruleId', 'id'), ('ruleName', 'name')):
+                if exclusion.get(field):
+                    byRule.setdefault((kind, exclusion[field]), []).append(compiled)
+                    break
+            else:
+                byRule.setdefault(None, []).append(compiled)
+        return byRule
+
+    def _plan(self, byRule, rule):
+        exclusions = list(byRule.get(None, ()))
+        for field, kind in (('logicHash', 'hash'), ('ruleId', 'id'), ('name', 'name')):
+            if rule.get(field):
+                exclusions.extend(byRule.get((kind, rule[field]), ()))
+        return _RulePlan(exclusions)
+
+    def match(self, result, bundleId=None):
+        """Matching exclusion of every entity result of an assessment
+
+        Args:
+            result (dict): Assessment result (see `Dome9.get_assessment`).
+            bundleId (int, optional): Ruleset of the assessment, when its request does not tell
+                (`request.id`). Exclusions of any ruleset apply to assessments of an unknown one.
+
+        Yields:
+            tuple: (test, entityResult, exclusion or None)
+        """
+        request = result.get('request') or {}
+        if bundleId is None:
+            bundleId = request.get('id', request.get('bundleId'))
+        byRule = self._candidates(request, bundleId)
+        defaultRegion = normalize_region(request.get('region'))
+        for test in result.get('tests') or ():
+            plan = self._plan(byRule, test.get('rule') or {})
+            empty = not plan.byEntity and not plan.scan
+            for entityResult in test.get('entityResults') or ():
+                if empty:
+                    yield test, entityResult, None
+                    continue
+                testObj = entityResult.get('testObj') or {}
+                region = normalize_region(testObj.get('region')) or defaultRegion
+                match = plan.match(testObj, region)
+                yield test, entityResult, None if match is None else match.exclusion
+
+    def apply(self, result, bundleId=None, inPlace=False):
+        """Recompute `isExcluded`, `exclusionId`, `exclusionStats`, `testPassed` and `assessmentPassed`
+
+        Args:
+            result (dict): Assessment result (see `Dome9.get_assessment`).
+            bundleId (int, optional): Ruleset of the assessment (see `match`).
+            inPlace (bool, optional): Update `result` instead of a copy of it. Defaults to False.
+
+        Returns:
+            dict: Assessment result, as the server would compute it with these exclusions.
+        """
+        if not inPlace:
+            result = copy.deepcopy(result)
+        stats = {}
+        for test, entityResult, exclusion in self.match(result, bundleId):
+            counts = stats.get(id(test))
+            if counts is None:
+                counts = stats[id(test)] = [test, 0, 0, 0, False]
+            entityResult['isExcluded'] = exclusion is not None
+            entityResult['exclusionId'] = None if exclusion is None else exclusion.get('id')
+            relevant = entityResult.get('isRelevant', True)
+            failed = relevant and not entityResult.get('isValid', True)
+            if exclusion is None:
+                counts[4] = counts[4] or failed
+            else:
+                counts[1] += 1
+                counts[2] += bool(relevant)
+                counts[3] += bool(failed)
+        for test, tested, relevant, nonComplying, failing in stats.values():
+            test['exclusionStats'] = {'testedCount': tested, 'relevantCount': relevant, 'nonComplyingCount': nonComplying}
+            test['testPassed'] = not failing
+        if result.get('tests'):
+            result['assessmentPassed'] = all(test.get('testPassed', True) for test in result['tests'])
+        return result
+
+    def impact(self, result, bundleId=None):
+        """Entities whose exclusion status changes with these exclusions, compared to the result of the server
+
+        Args:
+            result (dict): Assessment result (see `Dome9.get_assessment`).
+            bundleId (int, optional): Ruleset of the assessment (see `match`).
+
+        Returns:
+            dict: JSON serializable report: {'counts': {'excluded', 'newlyExcluded', 'noLongerExcluded',
+                'failuresExcluded'}, 'exclusions': {exclusionId: matched entities},
+                'rules': {ruleKey: {'name', 'severity', 'newlyExcluded', 'noLongerExcluded'}},
+                'unsupported': [exclusionId]}
+        """
+        counts = Counter(excluded=0, newlyExcluded=0, noLongerExcluded=0, failuresExcluded=0)
+        matched = Counter()
+        rules = {}
+        for test, entityResult, exclusion in self.match(result, bundleId):
+            excluded = exclusion is not None
+            if excluded:
+                counts['excluded'] += 1
+                matched[exclusion.get('id')] += 1
+                counts['failuresExcluded'] += entityResult.get('isRelevant', True) and not entityResult.get('isValid', True)
+            if excluded == bool(entityResult.get('isExcluded')):
+                continue
+            category = 'newlyExcluded' if excluded else 'noLongerExcluded'
+            counts[category] += 1
+            rule = test.get('rule') or {}
+            key, entityId = entity_key(rule, entityResult)
+            if key not in rules:
+                rules[key] = {'name': rule.get('name'), 'severity': rule.get('severity'),
+                              'newlyExcluded': [], 'noLongerExcluded': []}
+            rules[key][category].append(entityId)
+        return {'counts': dict(counts), 'exclusions': dict(matched), 'rules': rules,
+                'unsupported': [exclusion.get('id') for exclusion, _ in self.unsupported]}
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import io
+import csv
+import gzip
+import json
+
+from .streaming import ENTITY_KEYS
+
+# Flattened schemas (see docs/source/schemas). Nested objects and lists are kept as JSON.
+ASSET_COLUMNS = ('id', 'entityId', 'externalCloudAccountId', 'cloudAccountId', 'srl', 'type', 'name', 'tags',
+                 'platform', 'typeByPlatform', 'network', 'region', 'resourceGroup', 'additionalFields',
+                 'externalAdditionalFields')
+RULE_COLUMNS = ('name', 'severity', 'logic', 'description', 'remediation', 'complianceTag', 'domain', 'priority',
+                'controlTitle', 'ruleId', 'logicHash', 'isDefault')
+ENTITY_RESULT_COLUMNS = (('assessmentId',) + tuple('rule.' + c for c in RULE_COLUMNS) +
+                         ('validationStatus', 'isRelevant', 'isValid', 'isExcluded', 'exclusionId', 'remediationId',
+                          'error') + tuple('testObj.' + k for k in ENTITY_KEYS))
+BOOLEAN_COLUMNS = ('rule.isDefault', 'isRelevant', 'isValid', 'isExcluded')
+
+FORMATS = ('ndjson', 'csv', 'parquet')
+EXTENSIONS = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson', '.csv': 'csv', '.parquet': 'parquet'}
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def flatten(record, columns):
+    """Row of `record` with the value of each (dotted) column, None when missing"""
+    row = []
+    for path in columns:
+        value = record
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        row.append(value)
+    return row
+
+
+def entity_result_record(assessmentId, rule, entityResult):
+    """Record of an entity result with its rule, for `ENTITY_RESULT_COLUMNS`"""
+    record = dict(entityResult)
+    record['rule'] = rule
+    record['assessmentId'] = assessmentId
+    return record
+
+
+def _cell(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return str(value)
+
+
+def open_text(path, compression=None):
+    """Text file for writing, compressed with gzip or zstd"""
+    if compression is None:
+        return open(path, 'w', encoding='utf-8', newline='')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstd compression requires the zstandard package: pip install dome9[zstd]')
+        stream = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    raise ValueError('Unknown compression %r, expected gzip or zstd' % compression)
+
+
+class NDJSONWriter(object):
+    def __init__(self, path, columns, compression=None):
+        self.columns = columns
+        self.file = open_text(path, compression)
+        self.encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def write_rows(self, rows):
+        encode = self.encoder.encode
+        self.file.write(''.join(encode(dict(zip(self.columns, row))) + '\n' for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class CSVWriter(object):
+    def __init__(self, path, columns, compression=None):
+        self.file = open_text(path, compression)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows([_cell(value) for value in row] for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(object):
+    def __init__(self, path, columns, compression=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Parquet export requires pyarrow: pip install dome9[parquet]')
+        self.pyarrow = pyarrow
+        self.columns = columns
+        self.schema = pyarrow.schema([(c, pyarrow.bool_() if c in BOOLEAN_COLUMNS else pyarrow.string()) for c in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression=compression or 'snappy')
+
+    def write_rows(self, rows):
+        values = list(zip(*rows))
+        arrays = [self.pyarrow.array(values[n] if column in BOOLEAN_COLUMNS else [_cell(v) for v in values[n]],
+                                     type=self.schema.field(column).type)
+                  for n, column in enumerate(self.columns)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'ndjson': NDJSONWriter, 'csv': CSVWriter, 'parquet': ParquetWriter}
+
+
+class Exporter(object):
+    """Streaming writer of flattened records to NDJSON, CSV or Parquet
+
+    Records are buffered and written in batches, so memory depends on `batchSize`, not
+    on the number of records. Parquet files get one row group per batch.
+
+    Usage:
+        with Exporter('assets.csv.gz', ASSET_COLUMNS) as exporter:
+            for page in dome9.iter_protected_assets(pages=True):
+                exporter.write_many(page['assets'])
+
+    Args:
+        path (str): Output file.
+        columns (tuple): Dotted paths of the fields to export (i.e.: `ASSET_COLUMNS`).
+        format (str, optional): ndjson, csv or parquet. Defaults to the extension of `path`.
+        compression (str, optional): gzip or zstd (Parquet: any codec supported by pyarrow).
+            Defaults to the extension of `path` (.gz, .zst).
+        batchSize (int, optional): Records per write. Defaults to 10000.
+    """
+
+    def __init__(self, path, columns, format=None, compression=None, batchSize=10000):
+        name = str(path).lower()
+        for extension, codec in COMPRESSIONS.items():
+            if name.endswith(extension):
+                name = name[:-len(extension)]
+                compression = compression or codec
+        for extension, detected in EXTENSIONS.items():
+            if name.endswith(extension):
+                format = format or detected
+        if format not in WRITERS:
+            raise ValueError('Unknown export format %r, expected one of %s' % (format, ', '.join(FORMATS)))
+        self.paths = [column.split('.') for column in columns]
+        self.batchSize = batchSize
+        self.batch = []
+        self.count = 0
+        self.writer = WRITERS[format](path, columns, compression)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, record):
+        self.batch.append(flatten(record, self.paths))
+        if len(self.batch) >= self.batchSize:
+            self.flush()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if self.batch:
+            self.writer.write_rows(self.batch)
+            self.count += len(self.batch)
+            self.batch = []
+
+    def close(self):
+        """Write the pending records and close the file
+
+        Returns:
+            int: Number of records written.
+        """
+        if self.writer is not None:
+            try:
+                self.flush()
+            finally:
+                self.writer.close()
+                self.writer = None
+        return self.count
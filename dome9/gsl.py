@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+import time
+from datetime import datetime, timezone
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<regex>/(?:[^/\\]|\\.)*/i?)
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op><=|>=|!=|<>|=|<|>)
+      | (?P<punct>[()\[\],.])
+      | (?P<name>[A-Za-z_$][\w$]*(?:-(?:all|any|none|single))?)
+    )""", re.VERBOSE)
+
+_COMPARE = {
+    '=': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b,
+}
+
+_CONTAIN = {
+    'contain': any,
+    'contain-any': any,
+    'contain-all': all,
+    'contain-none': lambda matches: not any(matches),
+    'contain-single': lambda matches: sum(1 for match in matches if match) == 1,
+}
+
+_UNITS = {'seconds': 1, 'minutes': 60, 'hours': 3600, 'days': 86400, 'weeks': 604800, 'months': 2592000,
+          'years': 31536000}
+
+# ISO 8601 date, time and offset. Parsed by hand: datetime.fromisoformat needs Python 3.7 and strptime
+# only takes offsets with a colon from 3.7 on. Digits of the fraction beyond microseconds are ignored.
+_ISO_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6})\d*)?)?)?'
+                       r'\s*(?:(Z)|([+-])(\d{2}):?(\d{2}))?$')
+
+_KEYWORDS = frozenset(('and', 'or', 'not', 'where', 'should', 'have'))
+
+
+class GSLError(ValueError):
+    """Invalid or unsupported GSL"""
+
+
+def tokenize(text):
+    """(kind, value) tokens of a GSL expression"""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise GSLError('Unexpected character at %d: %r' % (position, text[position:position + 20]))
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _unquote(token):
+    return re.sub(r'\\(.)', r'\1', token[1:-1])
+
+
+def _truthy(value):
+    if isinstance(value, (list, dict, str)):
+        return len(value) > 0
+    return value is not None and value is not False and value != 0
+
+
+def _size(value):
+    # None has no items; values without a length (numbers, booleans) None
+    if value is None:
+        return 0
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def _items(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _getter(path):
+    """Function resolving a dotted path on an object, mapping the lists it crosses"""
+    names = tuple(name for name in path if name != '$')
+    if not names:
+        return lambda obj: obj
+    if len(names) == 1:
+        name = names[0]
+        return lambda obj: obj.get(name) if isinstance(obj, dict) else None
+
+    def get(obj):
+        for name in names:
+            if isinstance(obj, list):
+                obj = [item.get(name) for item in obj if isinstance(item, dict)]
+                obj = [value for item in obj for value in (item if isinstance(item, list) else [item])]
+            elif isinstance(obj, dict):
+                obj = obj.get(name)
+            else:
+                return None
+        return obj
+    return get
+
+
+def _number(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _comparison(op, literal):
+    compare = _COMPARE[op]
+    numeric = isinstance(literal, (int, float)) and not isinstance(literal, bool)
+    lowered = literal.lower() if isinstance(literal, str) else None
+
+    def test(value):
+        if numeric:
+            value = _number(value)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return op in ('!=', '<>')
+        elif lowered is not None and isinstance(value, bool):
+            value = 'true' if value else 'false'
+            return compare(value, lowered)
+        if op not in ('=', '!=', '<>') and value is None:
+            return False
+        try:
+            return compare(value, literal)
+        except TypeError:
+            return False
+    return test
+
+
+def _any(getter, test, negative=False):
+    """Predicate applying `test` to a property; on lists, true if any item (or, negated, every item) passes"""
+    def predicate(obj):
+        value = getter(obj)
+        if isinstance(value, list):
+            return all(test(item) for item in value) if negative else any(test(item) for item in value)
+        return test(value)
+    return predicate
+
+
+def _timestamp(value):
+    """Epoch seconds of a date: epoch (milli)seconds or ISO 8601 text, UTC unless it has an offset"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value / 1000.0 if value > 1e11 else float(value)
+    if not isinstance(value, str):
+        return None
+    match = _ISO_DATE.match(value.strip())
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, utc, sign, offsetHours, offsetMinutes = match.groups()
+    try:
+        parsed = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                          int((fraction or '0').ljust(6, '0')), tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    offset = 0 if utc or not sign else int(sign + '1') * (int(offsetHours) * 3600 + int(offsetMinutes) * 60)
+    return parsed.timestamp() - offset
+
+
+def _like_pattern(pattern):
+    parts = (re.escape(part) for part in pattern.split('%'))
+    return re.compile('^%s$' % '.*'.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def _all_of(predicates):
+    first = predicates[0]
+    if len(predicates) == 1:
+        return first
+    rest = _all_of(predicates[1:])
+    return lambda obj: first(obj) and rest(obj)
+
+
+def _any_of(predicates):
+    first = predicates[0]
+    if len(predicates) == 1:
+        return first
+    rest = _any_of(predicates[1:])
+    return lambda obj: first(obj) or rest(obj)
+
+
+class _Parser(object):
+    """Recursive descent parser compiling GSL conditions into predicates"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def error(self, message):
+        return GSLError('%s in %r' % (message, self.text))
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def keyword(self, *words):
+        kind, value = self.peek()
+        if kind == 'name' and value.lower() in words:
+            self.position += 1
+            return value.lower()
+        return None
+
+    def expect(self, kind, value=None):
+        token = self.peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise self.error('Expected %s, found %r' % (value or kind, token[1]))
+        self.position += 1
+        return token[1]
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    # condition := conjunction ('or' conjunction)*
+    def condition(self):
+        predicates = [self.conjunction()]
+        while self.keyword('or'):
+            predicates.append(self.conjunction())
+        return _any_of(predicates)
+
+    def conjunction(self):
+        predicates = [self.unary()]
+        while self.keyword('and'):
+            predicates.append(self.unary())
+        return _all_of(predicates)
+
+    def unary(self):
+        self.keyword('have')
+        if self.keyword('not'):
+            predicate = self.unary()
+            return lambda obj: not predicate(obj)
+        if self.peek() == ('punct', '('):
+            self.position += 1
+            predicate = self.condition()
+            self.expect('punct', ')')
+            return predicate
+        return self.test()
+
+    def path(self):
+        path = [self.expect('name')]
+        if path[0].lower() in _KEYWORDS:
+            raise self.error('Expected a property, found %r' % path[0])
+        while self.peek() == ('punct', '.'):
+            self.position += 1
+            path.append(self.expect('name'))
+        return path
+
+    def literal(self):
+        kind, value = self.peek()
+        self.position += 1
+        if kind == 'string':
+            return _unquote(value)
+        if kind == 'number':
+            return float(value) if '.' in value else int(value)
+        if kind == 'name' and value.lower() in ('true', 'false', 'null'):
+            return {'true': True, 'false': False, 'null': None}[value.lower()]
+        raise self.error('Expected a literal, found %r' % value)
+
+    def test(self):
+        getter = _getter(self.path())
+        kind, value = self.peek()
+        if kind == 'op':
+            self.position += 1
+            op = '!=' if value == '<>' else value
+            return _any(getter, _comparison(op, self.literal()), negative=op == '!=')
+        operator = value.lower() if kind == 'name' else None
+        method = getattr(self, '_' + operator.replace('-', '_'), None) if operator else None
+        if method is None:
+            return lambda obj: _truthy(getter(obj))
+        self.position += 1
+        return method(getter, operator)
+
+    def _arguments(self):
+        self.expect('punct', '(')
+        arguments = []
+        while self.peek() != ('punct', ')'):
+            if arguments:
+                self.expect('punct', ',')
+            arguments.append(self.literal())
+        self.position += 1
+        return arguments
+
+    def _block(self):
+        self.expect('punct', '[')
+        predicate = self.condition()
+        self.expect('punct', ']')
+        return predicate
+
+    def _like(self, getter, operator):
+        pattern = _like_pattern(_unquote(self.expect('string')))
+        test = _any(getter, lambda value: isinstance(value, str) and pattern.match(value) is not None)
+        return test if operator == 'like' else lambda obj: not test(obj)
+
+    _unlike = _like
+
+    def _regexmatch(self, getter, operator):
+        regex = self.expect('regex')
+        flags = re.IGNORECASE if regex.endswith('i') else 0
+        pattern = re.compile(regex[1:regex.rindex('/')], flags)
+        return _any(getter, lambda value: isinstance(value, str) and pattern.search(value) is not None)
+
+    def _in(self, getter, operator):
+        values = self._arguments()
+        return _any(getter, lambda value: value in values)
+
+    def _isempty(self, getter, operator):
+        self._arguments()
+        return lambda obj: not _truthy(getter(obj))
+
+    def _length(self, getter, operator):
+        self._arguments()
+        op = self.expect('op')
+        test = _comparison('!=' if op == '<>' else op, self.literal())
+
+        def check(obj):
+            length = _size(getter(obj))
+            return length is not None and test(length)
+        return check
+
+    def _with(self, getter, operator):
+        predicate = self._block()
+        return lambda obj: any(predicate(item) for item in _items(getter(obj)))
+
+    def _contain(self, getter, operator):
+        predicate = self._block()
+        combine = _CONTAIN[operator]
+        return lambda obj: combine(predicate(item) for item in _items(getter(obj)))
+
+    _contain_any = _contain_all = _contain_none = _contain_single = _contain
+
+    def _before(self, getter, operator):
+        arguments = self._arguments()
+        if len(arguments) != 2 or arguments[1] not in _UNITS:
+            raise self.error('Expected %s(<amount>, <%s>)' % (operator, '|'.join(_UNITS)))
+        offset = arguments[0] * _UNITS[arguments[1]]
+
+        def test(value):
+            timestamp = _timestamp(value)
+            if timestamp is None:
+                return False
+            limit = time.time() + offset
+            return timestamp < limit if operator == 'before' else timestamp > limit
+        return _any(getter, test)
+
+    _after = _before
+
+
+def compile_condition(condition):
+    """Compile a GSL condition into a predicate
+
+    Args:
+        condition (str): GSL condition (i.e.: `isPublic=false and tags contain [key='owner']`).
+
+    Returns:
+        function: Predicate of an entity object.
+
+    Raises:
+        GSLError: Invalid or unsupported GSL.
+    """
+    parser = _Parser(condition)
+    predicate = parser.condition()
+    if not parser.done():
+        raise parser.error('Unexpected %r' % parser.peek()[1])
+    return predicate
+
+
+class GSLRule(object):
+    """Compiled GSL (Governance Specification Language) rule
+
+    Supported syntax::
+
+        <EntityType> [where <condition>] should [not] [have] <condition>
+
+        condition:  condition and condition | condition or condition | not condition | (condition)
+                    property                                  (truthy: not null, false, 0 nor empty)
+                    property = != < > <= >= literal           (literal: 'string', number, true, false, null)
+                    property like 'pattern%' | unlike 'pattern%'
+                    property regexMatch /expression/[i]
+                    property in('a', 'b', ...)
+                    property isEmpty() | property length() <op> number
+                    property before(-90, 'days') | property after(...)
+                    property with [condition]
+                    property contain [condition]              (also contain-any, contain-all, contain-none, contain-single)
+
+    Properties are dotted paths (`firstAccessKey.isActive`); `$` is the object being tested
+    (i.e.: the item of a `contain` list). A path crossing a list maps it, and comparisons
+    against a list are true when any of its items matches.
+
+    Exclusion logic (`<EntityType> where <condition>`, without `should`) is compiled too.
+
+    Attributes:
+        logic (str): GSL text.
+        entityType (str): Entity type of the rule (i.e.: `Instance`).
+        where (function): Predicate of the relevant entities (None when the rule has no `where` clause).
+        should (function): Predicate of the valid entities (None for exclusion logic).
+    """
+
+    def __init__(self, logic):
+        self.logic = logic
+        parser = _Parser(logic)
+        self.entityType = parser.expect('name')
+        if parser.peek()[0] != 'name' or parser.peek()[1].lower() not in ('where', 'should'):
+            raise parser.error('Expected "<EntityType> where" or "<EntityType> should"')
+        self.where = self.should = None
+        if parser.keyword('where'):
+            self.where = parser.condition()
+        if parser.keyword('should'):
+            negative = parser.keyword('not') is not None
+            parser.keyword('have')
+            should = parser.condition()
+            self.should = (lambda obj: not should(obj)) if negative else should
+        if not parser.done():
+            raise parser.error('Unexpected %r' % parser.peek()[1])
+        if self.where is None and self.should is None:
+            raise parser.error('Expected a condition')
+        self._type = self.entityType.lower()
+
+    def applies_to(self, entity):
+        """The type of the entity (`entityType` or `type`, when it has one) is the type of the rule"""
+        entityType = entity.get('entityType') or entity.get('type')
+        return entityType is None or entityType.lower() == self._type
+
+    def evaluate(self, entity):
+        """Evaluate the rule on an entity, regardless of its type
+
+        Returns:
+            tuple: (isRelevant, isValid)
+        """
+        if self.where is not None and not self.where(entity):
+            return False, True
+        return True, self.should is None or bool(self.should(entity))
+
+
+def compile_rule(logic):
+    """Compile the logic of a rule (or of an exclusion)
+
+    Args:
+        logic (str): GSL rule (i.e.: `IamUser where passwordEnabled=true should have mfaActive=true`).
+
+    Returns:
+        GSLRule
+
+    Raises:
+        GSLError: Invalid or unsupported GSL.
+    """
+    return GSLRule(logic)
+
+
+class RulesetEvaluator(object):
+    """Offline assessment of the rules of a ruleset over entity objects
+
+    Every rule is compiled once; entities are grouped by type once per batch so each
+    rule is only evaluated on the entities of its type. Rules whose logic can not be
+    compiled get an `error` and no entity results; entities whose evaluation fails are
+    non-complying, with the `error` in their entity result.
+
+    Usage:
+        evaluator = RulesetEvaluator(dome9.get_ruleset(rulesetId))
+        result = evaluator.evaluate(inventory.query(cloudAccountId=accountId))
+
+    Args:
+        ruleset (dict or list): Ruleset (see `Dome9.get_ruleset`) or list of its rules.
+    """
+
+    def __init__(self, ruleset):
+        self.rules = (ruleset.get('rules') or []) if isinstance(ruleset, dict) else list(ruleset)
+        self.compiled = []
+        for rule in self.rules:
+            try:
+                self.compiled.append((rule, compile_rule(rule.get('logic') or ''), None))
+            except GSLError as error:
+                self.compiled.append((rule, None, str(error)))
+
+    def evaluate(self, entities):
+        """Assess the entities
+
+        Args:
+            entities (iterable): Entity objects. Those with an `entityType` (or `type`, as protected assets)
+                are only tested by the rules of that type; the others by every rule.
+
+        Returns:
+            dict: Assessment result ({'tests': [{'rule', 'error', 'testedCount', 'relevantCount',
+                'nonComplyingCount', 'exclusionStats', 'testPassed', 'entityResults'}], 'assessmentPassed'}),
+                with the entity objects as `testObj`. It can be used with `dome9.table.AssessmentTable`,
+                `dome9.diff` and `dome9.exclusions.ExclusionMatcher`.
+        """
+        byType = {}
+        untyped = []
+        for entity in entities:
+            entityType = entity.get('entityType') or entity.get('type')
+            if entityType is None:
+                untyped.append(entity)
+            else:
+                byType.setdefault(entityType.lower(), []).append(entity)
+        tests = [self._test(rule, compiled, error, byType.get(compiled._type, []) + untyped if compiled else [])
+                 for rule, compiled, error in self.compiled]
+        return {'tests': tests, 'assessmentPassed': all(test['testPassed'] for test in tests)}
+
+    @staticmethod
+    def _test(rule, compiled, error, entities):
+        entityResults = []
+        relevantCount = nonComplyingCount = 0
+        for entity in entities:
+            entityResult = {'isRelevant': True, 'isValid': False, 'isExcluded': False, 'testObj': entity}
+            try:
+                entityResult['isRelevant'], entityResult['isValid'] = compiled.evaluate(entity)
+            except Exception as ex:
+                # Only this entity fails the rule
+                entityResult['error'] = '%s: %s' % (type(ex).__name__, ex)
+            relevantCount += entityResult['isRelevant']
+            nonComplyingCount += entityResult['isRelevant'] and not entityResult['isValid']
+            entityResults.append(entityResult)
+        return {'rule': rule, 'error': error, 'testedCount': len(entities), 'relevantCount': relevantCount,
+                'nonComplyingCount': nonComplyingCount, 'entityResults': entityResults, 'testPassed': not nonComplyingCount,
+                'exclusionStats': {'testedCount': 0, 'relevantCount': 0, 'nonComplyingCount': 0}}
+
+
+def evaluate_ruleset(ruleset, entities):
+    """Assess entities with the rules of a ruleset, locally (see :class:`RulesetEvaluator`)
+
+    Args:
+        ruleset (dict or list): Ruleset (see `Dome9.get_ruleset`) or list of its rules.
+        entities (iterable): Entity objects.
+
+    Returns:
+        dict: Assessment result.
+    """
+    return RulesetEvaluator(ruleset).evaluate(entities)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import threading
+
+
+class ResourceIndex(object):
+    """Hash maps over the items of a list endpoint (rulesets, remediations...)
+
+    The index is loaded with the full list once and then kept up to date with
+    the objects created, updated and deleted through the client. A full reload
+    happens when it is older than `maxAge`, or on a lookup miss (the item may
+    have been created elsewhere) at most once every `minRefreshInterval`.
+
+    Args:
+        fields (tuple): Fields to index. The first one is the unique id.
+        maxAge (float): Seconds before a full reload.
+        minRefreshInterval (float): Min. seconds between reloads caused by lookup misses.
+    """
+
+    def __init__(self, fields=('id', 'name'), maxAge=60, minRefreshInterval=5):
+        self.fields = fields
+        self.maxAge = maxAge
+        self.minRefreshInterval = minRefreshInterval
+        self.maps = None
+        self.loaded = 0
+        self.lock = threading.Lock()
+
+    def stale(self):
+        return self.maps is None or time.time() - self.loaded > self.maxAge
+
+    def refreshable(self):
+        return time.time() - self.loaded > self.minRefreshInterval
+
+    def load(self, items):
+        maps = dict((field, {}) for field in self.fields)
+        for item in items or []:
+            for field in self.fields:
+                if item.get(field) is not None:
+                    maps[field].setdefault(self._key(item[field]), item)
+        with self.lock:
+            self.maps = maps
+            self.loaded = time.time()
+
+    def lookup(self, field, value):
+        """Item with `field` == `value`, or None"""
+        with self.lock:
+            return self.maps[field].get(self._key(value)) if self.maps else None
+
+    def upsert(self, item):
+        """Add or replace an item (by id) of a loaded index"""
+        with self.lock:
+            if not self.maps or not isinstance(item, dict) or item.get(self.fields[0]) is None:
+                return
+            self._remove(self._key(item[self.fields[0]]))
+            for field in self.fields:
+                if item.get(field) is not None:
+                    self.maps[field].setdefault(self._key(item[field]), item)
+
+    def discard(self, itemId):
+        """Remove an item (by id) from a loaded index"""
+        with self.lock:
+            if self.maps:
+                self._remove(self._key(itemId))
+
+    def _remove(self, itemId):
+        old = self.maps[self.fields[0]].pop(itemId, None)
+        if old is None:
+            return
+        for field in self.fields[1:]:
+            key = self._key(old.get(field))
+            if self.maps[field].get(key) is old:
+                del self.maps[field][key]
+
+    def _key(self, value):
+        # Ids come as int from the API and as str from routes
+        return str(value)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Asset fields stored in their own column, usable in queries
+COLUMNS = ('entityId', 'externalCloudAccountId', 'cloudAccountId', 'type', 'name', 'platform', 'region',
+           'network', 'resourceGroup')
+INDEXED = ('cloudAccountId', 'type', 'region', 'externalCloudAccountId')
+
+
+class AssetInventory(object):
+    """Local SQLite copy of the protected assets, kept up to date by `Dome9.sync_inventory`
+
+    A sync only writes the assets that changed since the previous one, in one transaction
+    per page, and marks as deleted the stored assets it did not see. Queries are answered
+    from the local database instead of `protected-asset/search`.
+
+    Usage:
+        inventory = AssetInventory('assets.db')
+        dome9.sync_inventory(inventory, filters=[{'name': 'platform', 'value': 'aws'}])
+        inventory.query(region='us_east_1', type=['Instance', 'Lambda'])
+        inventory.count_by('cloudAccountId')
+
+    Args:
+        path (str): SQLite database file. Defaults to an in-memory database.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('CREATE TABLE IF NOT EXISTS assets (id TEXT PRIMARY KEY, %s, data TEXT, hash TEXT, '
+                        'sync INTEGER, updated REAL, deleted REAL)' % ', '.join('%s TEXT' % c for c in COLUMNS))
+        for column in INDEXED:
+            self.db.execute('CREATE INDEX IF NOT EXISTS assets_%s ON assets (%s)' % (column, column))
+        self.db.execute('CREATE TABLE IF NOT EXISTS syncs (id INTEGER PRIMARY KEY, started REAL, finished REAL)')
+
+    def close(self):
+        self.db.close()
+
+    # ------ Sync ------
+
+    def start_sync(self):
+        """Start a sync
+
+        Returns:
+            int: Sync id, to pass to `upsert` and `finish_sync`.
+        """
+        with self.lock:
+            return self.db.execute('INSERT INTO syncs (started) VALUES (?)', (time.time(),)).lastrowid
+
+    def upsert(self, syncId, assets):
+        """Store a batch of assets seen by a sync, in a single transaction
+
+        Returns:
+            dict: Number of assets added, updated and unchanged.
+        """
+        rows = dict((asset['id'], asset) for asset in assets)
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0}
+        if not rows:
+            return stats
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN')
+            try:
+                stored = self._stored_hashes(list(rows))
+                changed, unchanged = [], []
+                for assetId, asset in rows.items():
+                    data = json.dumps(asset, sort_keys=True)
+                    digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+                    if stored.get(assetId) == digest:
+                        unchanged.append((syncId, assetId))
+                        continue
+                    stats['updated' if assetId in stored else 'added'] += 1
+                    changed.append((assetId,) + tuple(_text(asset.get(c)) for c in COLUMNS) + (data, digest, syncId, now))
+                stats['unchanged'] = len(unchanged)
+                self.db.executemany('INSERT OR REPLACE INTO assets VALUES (?, %s, ?, ?, ?, ?, NULL)'
+                                    % ', '.join('?' * len(COLUMNS)), changed)
+                self.db.executemany('UPDATE assets SET sync = ?, deleted = NULL WHERE id = ?', unchanged)
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        return stats
+
+    def _stored_hashes(self, ids):
+        hashes = {}
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            query = 'SELECT id, hash FROM assets WHERE deleted IS NULL AND id IN (%s)' % ', '.join('?' * len(batch))
+            hashes.update(self.db.execute(query, batch))
+        return hashes
+
+    def finish_sync(self, syncId, scope=None, deletions=True):
+        """Mark as deleted the stored assets of the sync scope that the sync did not see
+
+        Args:
+            syncId (int): Sync id returned by `start_sync`.
+            scope (dict, optional): Column values the synced assets were filtered by (i.e.: `{'platform': 'aws'}`).
+                Defaults to every asset.
+            deletions (bool, optional): Track deletions. Disable it when the sync did not list every
+                asset of its scope (i.e.: text searches). Defaults to True.
+
+        Returns:
+            int: Number of assets deleted.
+        """
+        where, params = self._where(scope or {})
+        deleted = 0
+        with self.lock:
+            now = time.time()
+            if deletions:
+                deleted = self.db.execute('UPDATE assets SET deleted = ?, updated = ? WHERE %s AND sync != ?' % where,
+                                          [now, now] + params + [syncId]).rowcount
+            self.db.execute('UPDATE syncs SET finished = ? WHERE id = ?', (now, syncId))
+        return deleted
+
+    def sync(self, pages, scope=None, deletions=True):
+        """Store the assets of a full listing and track deletions
+
+        Args:
+            pages (iterable): Lists of assets (i.e.: `dome9.iter_protected_assets(pages=True)`).
+            scope, deletions (optional): See `finish_sync`.
+
+        Returns:
+            dict: Number of assets added, updated, unchanged and deleted.
+        """
+        syncId = self.start_sync()
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0}
+        for page in pages:
+            for name, count in self.upsert(syncId, page).items():
+                stats[name] += count
+        stats['deleted'] = self.finish_sync(syncId, scope, deletions)
+        return stats
+
+    # ------ Queries ------
+
+    def _where(self, filters, includeDeleted=False):
+        clauses, params = ['1'] if includeDeleted else ['deleted IS NULL'], []
+        for column, value in filters.items():
+            if column not in COLUMNS and column != 'id':
+                raise ValueError('Unknown asset column %r' % column)
+            if isinstance(value, (list, tuple, set)):
+                clauses.append('%s IN (%s)' % (column, ', '.join('?' * len(value))))
+                params.extend(_text(v) for v in value)
+            else:
+                clauses.append('%s = ?' % column)
+                params.append(_text(value))
+        return ' AND '.join(clauses), params
+
+    def query(self, limit=None, includeDeleted=False, **filters):
+        """Assets matching every `column=value` filter. A list of values matches any of them.
+
+        Args:
+            limit (int, optional): Max. number of assets.
+            includeDeleted (bool, optional): Also return the assets deleted since they were synced.
+            filters: Columns: id, entityId, externalCloudAccountId, cloudAccountId, type, name, platform,
+                region, network, resourceGroup.
+
+        Returns:
+            list: Assets, as returned by `list_protected_assets`.
+        """
+        where, params = self._where(filters, includeDeleted)
+        query = 'SELECT data FROM assets WHERE %s ORDER BY id' % where
+        if limit is not None:
+            query += ' LIMIT %d' % limit
+        with self.lock:
+            return [json.loads(data) for data, in self.db.execute(query, params)]
+
+    def get(self, assetId):
+        """Stored asset by id, or None"""
+        assets = self.query(id=assetId, limit=1)
+        return assets[0] if assets else None
+
+    def count(self, **filters):
+        """Number of assets matching the filters (see `query`)"""
+        where, params = self._where(filters)
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM assets WHERE %s' % where, params).fetchone()[0]
+
+    def count_by(self, column, **filters):
+        """Number of assets per value of `column`, for the assets matching the filters (see `query`)
+
+        Returns:
+            dict: {value: count}
+        """
+        if column not in COLUMNS:
+            raise ValueError('Unknown asset column %r' % column)
+        where, params = self._where(filters)
+        with self.lock:
+            return dict(self.db.execute('SELECT %s, COUNT(*) FROM assets WHERE %s GROUP BY %s' % (column, where, column),
+                                        params))
+
+    def deleted(self, since=0):
+        """Assets deleted after `since` (timestamp)"""
+        with self.lock:
+            rows = self.db.execute('SELECT data FROM assets WHERE deleted > ? ORDER BY deleted', (since,))
+            return [json.loads(data) for data, in rows]
+
+
+def sync_scope(textSearch, filters):
+    """Scope of a sync listing the assets of a search, or None when deletions cannot be tracked"""
+    if textSearch:
+        return None
+    scope = {}
+    for f in filters:
+        if f['name'] not in COLUMNS:
+            return None
+        scope.setdefault(f['name'], []).append(f['value'])
+    return scope
+
+
+def _text(value):
+    return value if value is None or isinstance(value, str) else json.dumps(value)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import bisect
+import threading
+
+from .routes import route_family, route_template
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TIMINGS = ('wait', 'ttfb', 'download', 'decode')
+
+
+class RequestInfo(object):
+    """Request seen by the `before` and `after` hooks of a client
+
+    Attributes:
+        method (str): HTTP method
+        route (str): API route (i.e.: `CompliancePolicy/123`)
+        template (str): Route template (i.e.: `CompliancePolicy/{id}`)
+        family (str): Route family (i.e.: `CompliancePolicy`)
+        status (int): HTTP status of the last attempt. None before it or on connection errors.
+        attempts (int): Number of attempts (1 + retries).
+        bytesOut (int): Size of the encoded payload.
+        bytesIn (int): Size of the response body.
+        cached (bool): Served from the response cache.
+        coalesced (bool): Served by an identical GET in flight (see `dome9.singleflight.SingleFlight`).
+        error (Exception): Raised exception, if any.
+        timings (dict): Seconds spent in each phase: `wait` (rate limiting, concurrency limit, failed
+            attempts and backoff), `ttfb` (from sending the last attempt to its response headers, connection
+            included), `download` (body; for streamed assessments it includes parsing), `decode`
+            and `total`.
+    """
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.template = route_template(route)
+        self.family = route_family(route)
+        self.status = None
+        self.attempts = 0
+        self.bytesOut = 0
+        self.bytesIn = 0
+        self.cached = False
+        self.coalesced = False
+        self.error = None
+        self.timings = {}
+        self.started = time.perf_counter()
+
+    @property
+    def retries(self):
+        return max(0, self.attempts - 1)
+
+
+class Histogram(object):
+    """Bucketed distribution of values, with approximate quantiles"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Value below which a `q` fraction of the observations fall, interpolated within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for n, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[n - 1] if n else 0.0
+                upper = self.buckets[n] if n < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+
+class RouteStats(object):
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.timings = dict((name, 0.0) for name in TIMINGS)
+        self.errors = 0
+        self.retries = 0
+        self.cached = 0
+        self.coalesced = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+
+    def add(self, info):
+        self.latency.observe(info.timings.get('total', 0.0))
+        for name in TIMINGS:
+            self.timings[name] += info.timings.get(name) or 0.0
+        self.errors += info.error is not None
+        self.retries += info.retries
+        self.cached += info.cached
+        self.coalesced += info.coalesced
+        self.bytesIn += info.bytesIn
+        self.bytesOut += info.bytesOut
+
+    def summary(self):
+        count = self.latency.count
+        return {
+            'count': count, 'errors': self.errors, 'retries': self.retries, 'cached': self.cached,
+            'coalesced': self.coalesced,
+            'bytesIn': self.bytesIn, 'bytesOut': self.bytesOut,
+            'mean': self.latency.sum / count if count else None, 'max': self.latency.max,
+            'p50': self.latency.quantile(0.5), 'p90': self.latency.quantile(0.9), 'p99': self.latency.quantile(0.99),
+            'timings': dict((name, total / count if count else None) for name, total in self.timings.items()),
+        }
+
+
+class MetricsCollector(object):
+    """In-memory latency histograms per method and route template
+
+    Usage:
+        metrics = MetricsCollector()
+        dome9 = Dome9(key, secret, hooks={'after': metrics})
+        ...
+        metrics.slowest(5)
+
+    Args:
+        buckets (tuple, optional): Upper bounds of the histogram buckets, in seconds.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, info):
+        key = '%s %s' % (info.method.upper(), info.template)
+        with self.lock:
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats(self.buckets)
+            stats.add(info)
+
+    def snapshot(self):
+        """Statistics of every route
+
+        Returns:
+            dict: {'GET CompliancePolicy/{id}': {count, errors, retries, cached, coalesced, bytesIn, bytesOut,
+                mean, max, p50, p90, p99, timings: {wait, ttfb, download, decode}}}. Seconds.
+        """
+        with self.lock:
+            return dict((key, stats.summary()) for key, stats in self.routes.items())
+
+    def slowest(self, n=10, quantile='p99'):
+        """The `n` routes with the highest latency quantile (p50, p90, p99, mean or max)
+
+        Returns:
+            list: (route, statistics) tuples
+        """
+        routes = sorted(self.snapshot().items(), key=lambda item: item[1][quantile] or 0.0, reverse=True)
+        return routes[:n]
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+
+class PrometheusExporter(object):
+    """Hook publishing request metrics with `prometheus_client` (``pip install dome9[prometheus]``)
+
+    Metrics (labelled by method, route template and status, which may be `cached` or `coalesced`):
+    `dome9_request_duration_seconds` (histogram), `dome9_request_retries_total`,
+    `dome9_request_bytes_in_total` and `dome9_request_bytes_out_total`.
+
+    Usage:
+        Dome9(key, secret, hooks={'after': PrometheusExporter()})
+
+    Args:
+        registry (optional): prometheus_client registry. Defaults to the global one.
+        namespace (str, optional): Metric name prefix.
+        buckets (tuple, optional): Latency histogram buckets, in seconds.
+    """
+
+    def __init__(self, registry=None, namespace='dome9', buckets=BUCKETS):
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError('PrometheusExporter requires prometheus_client: pip install dome9[prometheus]')
+        labels = ('method', 'route', 'status')
+        options = {'namespace': namespace, 'labelnames': labels}
+        if registry is not None:
+            options['registry'] = registry
+        self.duration = prometheus_client.Histogram('request_duration_seconds', 'Dome9 API request latency',
+                                                    buckets=buckets, **options)
+        self.retries = prometheus_client.Counter('request_retries', 'Dome9 API request retries', **options)
+        self.bytesIn = prometheus_client.Counter('request_bytes_in', 'Dome9 API response bytes', **options)
+        self.bytesOut = prometheus_client.Counter('request_bytes_out', 'Dome9 API request bytes', **options)
+
+    def __call__(self, info):
+        status = 'cached' if info.cached else 'coalesced' if info.coalesced else str(info.status or 'error')
+        labels = (info.method.upper(), info.template, status)
+        self.duration.labels(*labels).observe(info.timings.get('total', 0.0))
+        self.retries.labels(*labels).inc(info.retries)
+        self.bytesIn.labels(*labels).inc(info.bytesIn)
+        self.bytesOut.labels(*labels).inc(info.bytesOut)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+from .bulk import run_bulk
+from .dome9 import Dome9
+from .exceptions import PartialResultError
+from .transport import Transport
+
+
+class _SharedTransport(object):
+    # Transport of the pool as given to its clients: closing a client leaves the connections to the pool
+    def __init__(self, transport):
+        self.transport = transport
+
+    def request(self, method, url, **kwargs):
+        return self.transport.request(method, url, **kwargs)
+
+    def close(self):
+        pass
+
+
+class Tenant(namedtuple('Tenant', ['name', 'key', 'secret', 'endpoint'])):
+    """Dome9 account of a pool: credentials and endpoint, by name"""
+
+
+class Dome9Pool(object):
+    """Clients of many Dome9 accounts, one per credentials and endpoint, sharing a connection pool
+
+    Clients are created on first use and reused afterwards, keeping their response
+    cache, indexes and rate limiter. They all send requests through a single
+    transport, so `maxConnections` caps the connections of every tenant together to
+    each API host (requests wait for a free one). Tenants on different endpoints use
+    a pool of up to `maxConnections` per host. Clients not used for `maxIdle` seconds, or the
+    least recently used beyond `maxClients`, are dropped and closed. Closing a client of the
+    pool leaves the shared connections open: they are closed with the pool.
+
+    Usage:
+        with Dome9Pool(maxConnections=50) as pool:
+            pool.add_tenant('prod', key, secret)
+            pool.add_tenant('dev', otherKey, otherSecret)
+            accounts = pool.gather('list_cloud_accounts')
+
+    Args:
+        maxConnections (int, optional): Max. connections to each API host, for all tenants. Defaults to 50.
+        maxIdle (float, optional): Seconds after which an unused client is dropped. Defaults to 600.
+        maxClients (int, optional): Max. clients kept. Unlimited if None.
+        factory (callable, optional): `factory(key, secret, endpoint, transport)` building the client of a
+            tenant, i.e. to give each one its own RateLimiter or cache. Must use `transport`. Its `close`
+            is called when the client is dropped.
+        **options: Arguments of every client built by the default factory (retry, cache, hooks...).
+            Objects given here (i.e. a RateLimiter) are shared by all tenants.
+    """
+
+    def __init__(self, maxConnections=50, maxIdle=600, maxClients=None, factory=None, **options):
+        self.transport = Transport(poolSize=maxConnections, poolBlock=True)
+        self.shared = _SharedTransport(self.transport)
+        self.maxIdle = maxIdle
+        self.maxClients = maxClients
+        self.factory = factory or self._default_factory
+        self.options = options
+        self.tenants = OrderedDict()
+        # (endpoint, key, secret) -> [client, last use]
+        self.clients = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _default_factory(self, key, secret, endpoint, transport):
+        return Dome9(key, secret, endpoint=endpoint, transport=transport, **self.options)
+
+    def add_tenant(self, name, key, secret, endpoint='https://api.dome9.com'):
+        """Register the credentials of an account under a name, for `get`, `map` and `gather`"""
+        with self.lock:
+            self.tenants[name] = Tenant(name, key, secret, endpoint)
+
+    def remove_tenant(self, name):
+        """Unregister a tenant and drop its client"""
+        with self.lock:
+            tenant = self.tenants.pop(name)
+            entry = self.clients.pop((tenant.endpoint, tenant.key, tenant.secret), None)
+        if entry is not None:
+            entry[0].close()
+
+    def client(self, key, secret, endpoint='https://api.dome9.com'):
+        """Client of some credentials, created on first use
+
+        Returns:
+            Dome9
+        """
+        identity = (endpoint, key, secret)
+        now = time.monotonic()
+        with self.lock:
+            evicted = self._evict(now)
+            entry = self.clients.get(identity)
+            if entry is None:
+                entry = self.clients[identity] = [self.factory(key, secret, endpoint, self.shared), now]
+                if self.maxClients is not None and len(self.clients) > self.maxClients:
+                    evicted.append(self.clients.popitem(last=False)[1][0])
+            else:
+                entry[1] = now
+                self.clients.move_to_end(identity)
+        self._close(evicted)
+        return entry[0]
+
+    def get(self, name):
+        """Client of a registered tenant
+
+        Returns:
+            Dome9
+        """
+        tenant = self.tenants[name]
+        return self.client(tenant.key, tenant.secret, tenant.endpoint)
+
+    def _evict(self, now):
+        # Clients are kept by last use: the idle ones are at the start
+        evicted = []
+        while self.clients:
+            identity, (client, used) = next(iter(self.clients.items()))
+            if now - used < self.maxIdle:
+                break
+            del self.clients[identity]
+            evicted.append(client)
+        return evicted
+
+    @staticmethod
+    def _close(clients):
+        for client in clients:
+            client.close()
+
+    def evict_idle(self):
+        """Drop the clients not used for `maxIdle` seconds
+
+        Returns:
+            int: Number of clients dropped.
+        """
+        with self.lock:
+            evicted = self._evict(time.monotonic())
+        self._close(evicted)
+        return len(evicted)
+
+    def map(self, operation, tenants=None, workers=8, args=(), kwargs=None):
+        """Run an operation on several tenants concurrently
+
+        Args:
+            operation (str or callable): Client method name (i.e.: `list_cloud_accounts`), or a function
+                called with (tenant name, client).
+            tenants (list, optional): Names of the tenants. Defaults to all of them.
+            workers (int, optional): Max. tenants processed at the same time. Defaults to 8.
+            args (tuple, optional): Positional arguments of the method.
+            kwargs (dict, optional): Keyword arguments of the method.
+
+        Returns:
+            OrderedDict: dome9.bulk.BulkResult (item: tenant name, result, error) of every tenant.
+        """
+        names = list(self.tenants) if tenants is None else list(tenants)
+
+        def call(name):
+            client = self.get(name)
+            if callable(operation):
+                return operation(name, client)
+            return getattr(client, operation)(*args, **(kwargs or {}))
+        return OrderedDict((outcome.item, outcome) for outcome in run_bulk(call, names, workers))
+
+    def gather(self, operation, tenants=None, workers=8, args=(), kwargs=None, strict=True):
+        """Run an operation on several tenants concurrently and merge their results
+
+        List results are concatenated, and every dict in them gets a `tenant` key with the name of its
+        tenant (on a copy). Other results are added as one item.
+
+        Args:
+            operation (str or callable): See `map`.
+            tenants (list, optional): Names of the tenants. Defaults to all of them.
+            workers (int, optional): Max. tenants processed at the same time. Defaults to 8.
+            args (tuple, optional): Positional arguments of the method.
+            kwargs (dict, optional): Keyword arguments of the method.
+            strict (bool, optional): Raise if the operation fails on any tenant. When False, the results
+                of the tenants that succeeded are returned. Defaults to True.
+
+        Returns:
+            list: Merged results.
+
+        Raises:
+            PartialResultError: The operation failed on some tenants. Merged results of the others are
+                available in `results` and the error of each failed tenant in `errors`.
+        """
+        merged = []
+        errors = OrderedDict()
+        for name, outcome in self.map(operation, tenants, workers, args, kwargs).items():
+            if not outcome.ok:
+                errors[name] = outcome.error
+                continue
+            for item in outcome.result if isinstance(outcome.result, list) else [outcome.result]:
+                merged.append(dict(item, tenant=name) if isinstance(item, dict) else item)
+        if errors and strict:
+            raise PartialResultError(merged, errors)
+        return merged
+
+    def close(self):
+        """Close every client and the shared connections"""
+        with self.lock:
+            clients = [client for client, _ in self.clients.values()]
+            self.clients.clear()
+        self._close(clients)
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import re
+import time
+import threading
+
+from .routes import route_family
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket
+
+    Tokens are reserved in advance: a caller that finds the bucket empty takes a
+    token anyway and is told how long to wait for it, so concurrent callers queue
+    up at exactly `rate` calls per second instead of polling.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float, optional): Max. burst size. Defaults to `rate`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def _take(self, tokens, level, updated, now):
+        level = min(self.capacity, level + (now - updated) * self.rate) - tokens
+        return level, max(0.0, -level / self.rate)
+
+    def reserve(self, tokens=1):
+        """Take tokens from the bucket
+
+        Returns:
+            float: Seconds to wait before using them.
+        """
+        with self.lock:
+            now = time.time()
+            self.tokens, delay = self._take(tokens, self.tokens, self.updated, now)
+            self.updated = now
+            return delay
+
+    def acquire(self, tokens=1):
+        """Take tokens from the bucket, sleeping until they are available"""
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket shared by every process of the host through a state file
+
+    The state (tokens and last update) is stored in `path` and updated under an
+    exclusive ``flock``. Only available on POSIX systems.
+
+    Args:
+        path (str): State file. Processes using the same file share the bucket.
+        rate (float): Tokens added per second.
+        capacity (float, optional): Max. burst size. Defaults to `rate`.
+    """
+
+    def __init__(self, path, rate, capacity=None):
+        try:
+            import fcntl
+        except ImportError:
+            raise ImportError('FileTokenBucket requires a POSIX system (fcntl)')
+        super(FileTokenBucket, self).__init__(rate, capacity)
+        self._fcntl = fcntl
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def reserve(self, tokens=1):
+        with self.lock:
+            self._fcntl.flock(self.fd, self._fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                state = os.pread(self.fd, 64, 0).split()
+                level, updated = (float(state[0]), float(state[1])) if len(state) == 2 else (self.capacity, now)
+                level, delay = self._take(tokens, level, updated, now)
+                data = '{!r} {!r}'.format(level, now).encode().ljust(64)
+                os.pwrite(self.fd, data, 0)
+                return delay
+            finally:
+                self._fcntl.flock(self.fd, self._fcntl.LOCK_UN)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class RateLimiter(object):
+    """Client-side rate limiter with one token bucket per route family
+
+    A limiter can be given to several clients (or threads) to enforce an aggregate
+    limit. With `path`, buckets are stored in that directory and shared by every
+    process of the host using it.
+
+    Usage:
+        limiter = RateLimiter(limits={'protected-asset/search': 5, 'assessment/bundleV2': (1, 3)}, default=20)
+        Dome9(key, secret, rateLimiter=limiter)
+
+    Args:
+        limits (dict, optional): Rate per route family (`protected-asset/search`, `assessment/bundleV2`,
+            `CloudAccounts`...). Either calls per second or a (rate, burst) tuple.
+        default (float|tuple, optional): Limit of the families not in `limits`. Unlimited if None.
+        path (str, optional): Directory where buckets are shared across processes.
+    """
+
+    def __init__(self, limits=None, default=None, path=None):
+        self.limits = limits or {}
+        self.default = default
+        self.path = path
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, family):
+        with self.lock:
+            if family not in self.buckets:
+                limit = self.limits.get(family, self.default)
+                self.buckets[family] = self._new_bucket(family, limit) if limit else None
+            return self.buckets[family]
+
+    def _new_bucket(self, family, limit):
+        rate, capacity = limit if isinstance(limit, (tuple, list)) else (limit, None)
+        if self.path:
+            name = re.sub(r'[^A-Za-z0-9_.-]', '_', family or 'default') + '.bucket'
+            return FileTokenBucket(os.path.join(self.path, name), rate, capacity)
+        return TokenBucket(rate, capacity)
+
+    def reserve(self, route):
+        """Reserve a call to `route`
+
+        Returns:
+            float: Seconds to wait before sending it.
+        """
+        bucket = self._bucket(route_family(route))
+        return bucket.reserve() if bucket else 0.0
+
+    def acquire(self, route):
+        """Wait until a call to `route` is allowed"""
+        delay = self.reserve(route)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def close(self):
+        """Release the state files of the shared buckets"""
+        with self.lock:
+            for bucket in self.buckets.values():
+                if isinstance(bucket, FileTokenBucket):
+                    bucket.close()
+            self.buckets = {}
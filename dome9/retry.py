@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import random
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy(object):
+    """When and how long to wait before retrying a failed request.
+
+    Throttled requests (HTTP 429) are rejected before being processed, so they are
+    retried whatever the method. Server errors and connection errors are only retried
+    for idempotent methods and for the routes listed in `routes` (POST searches).
+
+    Args:
+        maxAttempts (int): Max. number of attempts per request, including the first one.
+        backoffFactor (float): Delay of the first retry, in seconds. It doubles on each attempt.
+        maxBackoff (float): Upper bound of a single delay, in seconds, also applied to `Retry-After`.
+        jitter (bool): Pick a random delay between 0 and the backoff to spread retries of parallel clients.
+        statusCodes (tuple): HTTP status codes that can be retried.
+        methods (tuple): Idempotent methods, retried on server or connection errors.
+        routes (tuple): Route prefixes that are safe to retry whatever the method.
+    """
+
+    def __init__(self, maxAttempts=3, backoffFactor=0.5, maxBackoff=30, jitter=True,
+                 statusCodes=(429, 500, 502, 503, 504), methods=('get', 'put', 'delete'),
+                 routes=('protected-asset/search',)):
+        self.maxAttempts = maxAttempts
+        self.backoffFactor = backoffFactor
+        self.maxBackoff = maxBackoff
+        self.jitter = jitter
+        self.statusCodes = statusCodes
+        self.methods = methods
+        self.routes = routes
+
+    def is_idempotent(self, method, route):
+        return method in self.methods or any(route.startswith(r) for r in self.routes)
+
+    def should_retry(self, attempt, method, route, status=None):
+        """Whether a failed attempt must be retried
+
+        Args:
+            attempt (int): Number of the attempt that failed, starting at 1
+            method (str): HTTP method
+            route (str): API route
+            status (int, optional): HTTP status code. None on connection errors.
+
+        Returns:
+            bool
+        """
+        if attempt >= self.maxAttempts:
+            return False
+        if status is None:
+            return self.is_idempotent(method, route)
+        if status not in self.statusCodes:
+            return False
+        return status == 429 or self.is_idempotent(method, route)
+
+    def delay(self, attempt, retryAfter=None):
+        """Seconds to wait before the next attempt
+
+        Args:
+            attempt (int): Number of the attempt that failed, starting at 1
+            retryAfter (str, optional): Value of the `Retry-After` header. It has precedence over the backoff,
+                up to `maxBackoff`.
+
+        Returns:
+            float
+        """
+        seconds = parse_retry_after(retryAfter)
+        if seconds is not None:
+            return min(self.maxBackoff, seconds)
+        backoff = min(self.maxBackoff, self.backoffFactor * (2 ** (attempt - 1)))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a `Retry-After` header (delay-seconds or HTTP-date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Routes whose family spans two path segments. Any other route belongs to the
+# family named after its first segment (i.e.: `CompliancePolicy/123` -> `CompliancePolicy`).
+FAMILIES = ('protected-asset/search', 'assessment/bundleV2', 'Compliance/Remediation')
+
+
+def route_family(route):
+    """Group of routes sharing quotas, caches and statistics
+
+    Args:
+        route (str): API route (i.e.: `CompliancePolicy/123`)
+
+    Returns:
+        str: Route family (i.e.: `CompliancePolicy`)
+    """
+    path = route.split('?', 1)[0].strip('/')
+    for family in FAMILIES:
+        if path == family or path.startswith(family + '/'):
+            return family
+    return path.split('/', 1)[0]
+
+
+def route_id(route):
+    """Id of the resource addressed by a route, if any
+
+    Args:
+        route (str): API route (i.e.: `CompliancePolicy/123` or `Compliance/Remediation?id=123`)
+
+    Returns:
+        str: Resource id (i.e.: `123`) or None
+    """
+    path, _, query = route.partition('?')
+    for param in query.split('&'):
+        name, _, value = param.partition('=')
+        if name == 'id' and value:
+            return value
+    rest = path.strip('/')[len(route_family(route)):].strip('/')
+    return rest.split('/', 1)[0] or None
+
+
+def route_template(route):
+    """Route with its resource id and query values replaced by placeholders, to group statistics
+
+    Args:
+        route (str): API route (i.e.: `CompliancePolicy/123` or `Compliance/Remediation?id=123`)
+
+    Returns:
+        str: Route template (i.e.: `CompliancePolicy/{id}` or `Compliance/Remediation?id={id}`)
+    """
+    path, _, query = route.partition('?')
+    family = route_family(route)
+    rest = path.strip('/')[len(family):].strip('/').split('/')
+    template = '/'.join([family, '{id}'] + rest[1:]) if rest[0] else family
+    if query:
+        names = [param.partition('=')[0] for param in query.split('&')]
+        template += '?' + '&'.join('%s={%s}' % (name, name) for name in names)
+    return template
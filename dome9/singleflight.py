@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import threading
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Share one in-flight call among the concurrent callers of the same key
+
+    The first caller of a key runs the call; callers of that key arriving before it
+    finishes wait for it and get its result, or its exception. Nothing is kept once
+    the call finishes: later callers run it again. Once a group of keys is detached,
+    its calls in flight are no longer joined, so callers after a write never get a
+    result read before it.
+
+    Attributes:
+        calls (int): Calls made through `do`.
+        coalesced (int): Calls served by the in-flight call of another caller.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key, group, flight):
+        # Flight of the key (a new one when the caller leads it) and whether the caller waits for it
+        with self.lock:
+            self.calls += 1
+            current = self.flights.get(key)
+            if current is not None:
+                self.coalesced += 1
+                return current[1], True
+            self.flights[key] = (group, flight)
+            return flight, False
+
+    def _land(self, key, flight):
+        with self.lock:
+            # A detached flight may have been replaced by a newer one of the same key
+            if self.flights.get(key, (None, None))[1] is flight:
+                del self.flights[key]
+
+    def detach(self, group):
+        """Stop joining the calls in flight of `group`: the next callers of their keys run them again"""
+        with self.lock:
+            for key in [k for k, (g, _) in self.flights.items() if g == group]:
+                del self.flights[key]
+
+    def do(self, key, func, group=None):
+        """Run `func`, unless a call of `key` is already in flight
+
+        Args:
+            key (hashable): Identity of the call.
+            func (callable): The call.
+            group (hashable, optional): Group of the key, for :meth:`detach`. Defaults to None.
+
+        Returns:
+            tuple: (result, shared). `shared` is True when the result comes from another caller.
+        """
+        flight, shared = self._join(key, group, _Flight())
+        if shared:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = func()
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            self._land(key, flight)
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        """Counters of the calls
+
+        Returns:
+            dict: {'calls', 'coalesced', 'inFlight'}
+        """
+        with self.lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'inFlight': len(self.flights)}
+
+
+class _AsyncFlight(object):
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+
+
+class AsyncSingleFlight(SingleFlight):
+    """:class:`SingleFlight` of coroutines, for one event loop
+
+    The call runs in its own task, awaited by every caller: a cancelled caller, the
+    first one included, leaves it running for the others. It is only cancelled when
+    none is left waiting for it.
+    """
+
+    async def do(self, key, func, group=None):
+        """Await `func()`, unless a call of `key` is already in flight
+
+        Returns:
+            tuple: (result, shared). `shared` is True when the result comes from another caller.
+        """
+        flight, shared = self._join(key, group, _AsyncFlight())
+        if not shared:
+            flight.task = asyncio.ensure_future(self._run(key, flight, func))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if not flight.waiters:
+                flight.task.cancel()
+            raise
+
+    async def _run(self, key, flight, func):
+        try:
+            return await func()
+        finally:
+            self._land(key, flight)
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+import json
+import codecs
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRUCTURE = re.compile(r'["\[\]{}]')
+STRING_END = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+
+# Keys of `testObj` kept when the whole object is dropped: enough to identify the entity
+ENTITY_KEYS = ('id', 'dome9Id', 'entityType', 'entityIndex', 'region', 'name')
+
+# Top-level keys of an AssessmentResult never kept in `meta` (they can be as large as the results)
+SKIPPED_KEYS = ('testEntities',)
+
+
+class EntityResultParser(object):
+    """Incremental (push) parser of AssessmentResult payloads
+
+    Bytes are fed as they arrive and `(rule, entityResult)` records are returned as
+    soon as they are complete, so memory depends on the size of one entity result,
+    not on the size of the assessment. When a test lists its `entityResults` before
+    its `rule`, the (projected) entity results of that test are held until the
+    rule is read.
+
+    Args:
+        fields (tuple, optional): Entity result fields to keep. Dotted paths select
+            keys of nested objects (i.e.: `testObj.id`). All fields if None.
+        includeTestObj (bool, optional): Keep the whole `testObj`. When False only its
+            identity keys (id, dome9Id, entityType, entityIndex, region, name) are kept.
+        meta (dict, optional): Filled with the top-level fields of the result
+            (id, request, assessmentPassed...) as they are parsed.
+    """
+
+    def __init__(self, fields=None, includeTestObj=False, meta=None):
+        self.fields = [f.split('.', 1) for f in fields] if fields else None
+        self.includeTestObj = includeTestObj
+        self.meta = meta
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.done = False
+        self.records = []
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self._parser = self._parse()
+        self._resume()
+
+    def feed(self, data):
+        """Parse a chunk of the payload
+
+        Returns:
+            list: (rule, entityResult) records completed by this chunk.
+        """
+        self.buf += self.text.decode(data)
+        self._resume()
+        records, self.records = self.records, []
+        return records
+
+    def close(self):
+        """Signal the end of the payload
+
+        Returns:
+            list: Last records.
+
+        Raises:
+            ValueError: The payload is truncated or is not an assessment result.
+        """
+        self.buf += self.text.decode(b'', final=True)
+        self.eof = True
+        self._resume()
+        if not self.done:
+            raise ValueError('Truncated assessment result')
+        records, self.records = self.records, []
+        return records
+
+    def _resume(self):
+        if self.done:
+            return
+        try:
+            self._parser.send(None)
+        except StopIteration:
+            self.done = True
+
+    def _project(self, entityResult):
+        if self.fields:
+            projected = {}
+            for path in self.fields:
+                if len(path) == 1:
+                    if path[0] in entityResult:
+                        projected[path[0]] = entityResult[path[0]]
+                elif isinstance(entityResult.get(path[0]), dict) and path[1] in entityResult[path[0]]:
+                    projected.setdefault(path[0], {})[path[1]] = entityResult[path[0]][path[1]]
+            entityResult = projected
+        testObj = entityResult.get('testObj')
+        if not self.includeTestObj and isinstance(testObj, dict):
+            entityResult['testObj'] = dict((k, testObj[k]) for k in ENTITY_KEYS if k in testObj)
+        return entityResult
+
+    # ------ Scanner (generators yield when they need more data) ------
+
+    def _more(self):
+        if self.eof:
+            raise ValueError('Truncated assessment result')
+        if self.pos > 65536:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        yield
+
+    def _peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            yield from self._more()
+
+    def _expect(self, char):
+        found = yield from self._peek()
+        if found != char:
+            raise ValueError('Expected %r at position %d, found %r' % (char, self.pos, found))
+        self.pos += 1
+
+    def _value(self):
+        yield from self._peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+                need = len(self.buf) - self.pos + 1
+            except ValueError:
+                if self.eof:
+                    raise
+                # Wait for the unparsed data to double, so big values are not decoded over and over
+                need = 2 * (len(self.buf) - self.pos) + 1
+            while len(self.buf) - self.pos < need and not self.eof:
+                yield from self._more()
+
+    def _skip(self):
+        char = yield from self._peek()
+        if char not in '[{':
+            yield from self._value()
+            return
+        depth = 0
+        while True:
+            match = STRUCTURE.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+                yield from self._more()
+                continue
+            self.pos = match.start()
+            char = match.group()
+            if char == '"':
+                end = STRING_END.match(self.buf, self.pos + 1)
+                if end is None:
+                    yield from self._more()
+                    continue
+                self.pos = end.end()
+                continue
+            self.pos += 1
+            depth += 1 if char in '[{' else -1
+            if depth == 0:
+                return
+
+    def _key(self):
+        """Next key of the current object, or None at its end"""
+        char = yield from self._peek()
+        if char == ',':
+            self.pos += 1
+            char = yield from self._peek()
+        if char == '}':
+            self.pos += 1
+            return None
+        key = yield from self._value()
+        yield from self._expect(':')
+        return key
+
+    def _next_item(self):
+        """Whether the current array has more items"""
+        char = yield from self._peek()
+        if char == ',':
+            self.pos += 1
+            char = yield from self._peek()
+        if char == ']':
+            self.pos += 1
+            return False
+        return True
+
+    # ------ AssessmentResult structure ------
+
+    def _parse(self):
+        yield from self._expect('{')
+        while True:
+            key = yield from self._key()
+            if key is None:
+                break
+            elif key == 'tests':
+                yield from self._tests()
+            elif self.meta is None or key in SKIPPED_KEYS:
+                yield from self._skip()
+            else:
+                self.meta[key] = yield from self._value()
+
+    def _tests(self):
+        yield from self._expect('[')
+        while (yield from self._next_item()):
+            yield from self._test()
+
+    def _test(self):
+        yield from self._expect('{')
+        rule = None
+        pending = []
+        while True:
+            key = yield from self._key()
+            if key is None:
+                break
+            elif key == 'rule':
+                rule = yield from self._value()
+                self.records.extend((rule, entityResult) for entityResult in pending)
+                pending = []
+            elif key == 'entityResults':
+                yield from self._expect('[')
+                while (yield from self._next_item()):
+                    entityResult = self._project((yield from self._value()))
+                    if rule is None:
+                        pending.append(entityResult)
+                    else:
+                        self.records.append((rule, entityResult))
+            else:
+                yield from self._skip()
+        self.records.extend((rule, entityResult) for entityResult in pending)
+
+
+def iter_entity_results(chunks, fields=None, includeTestObj=False, meta=None):
+    """Parse an AssessmentResult payload incrementally
+
+    Args:
+        chunks (iterable): Bytes of the payload (i.e.: `response.iter_content()` or a file).
+        fields, includeTestObj, meta: See :class:`EntityResultParser`.
+
+    Yields:
+        tuple: (rule, entityResult)
+    """
+    parser = EntityResultParser(fields, includeTestObj, meta)
+    for chunk in chunks:
+        for record in parser.feed(chunk):
+            yield record
+    for record in parser.close():
+        yield record
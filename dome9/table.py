@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import sys
+import operator
+from array import array
+from itertools import compress, repeat
+from collections import Counter
+
+# Optional: group-by and filters fall back to pure Python. Imported on first use (see `_numpy`).
+numpy = False
+
+SEVERITIES = ('Informational', 'Low', 'Medium', 'High', 'Critical')
+STATUSES = ('passed', 'failed', 'excluded', 'irrelevant')
+
+
+def _numpy():
+    # numpy takes longer to import than the rest of the package: only tables pay for it
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+    return numpy
+
+
+# Columns stored as codes of an interned list of values
+CODED = ('rule', 'severity', 'region', 'entityType', 'status')
+FLAGS = ('isRelevant', 'isValid', 'isExcluded')
+
+
+def rule_key(rule):
+    """Identity of a rule across assessments: its id, logic hash or name"""
+    return rule.get('ruleId') or rule.get('logicHash') or rule.get('name')
+
+
+def entity_status(entityResult):
+    """Outcome of an entity result: passed, failed, excluded or irrelevant"""
+    if entityResult.get('isExcluded'):
+        return 'excluded'
+    if not entityResult.get('isRelevant'):
+        return 'irrelevant'
+    return 'passed' if entityResult.get('isValid') else 'failed'
+
+
+class AssessmentTable(object):
+    """Columnar view of the entity results of an assessment
+
+    Every entity result is a row. Strings are interned and stored as integer codes
+    in typed arrays, flags as byte arrays, so the table takes a fraction of the
+    memory of the nested dicts and group-by/filter operations run over flat arrays.
+    When numpy is installed (``pip install dome9[table]``) those operations are
+    vectorized over the same buffers, without copying them.
+
+    Columns: rule, severity, region, entityType, status, entityId, isRelevant, isValid, isExcluded.
+    `rule` values are the rule names; the rule dicts are available in `rules`.
+
+    Usage:
+        table = AssessmentTable.from_records(dome9.iter_assessment(assessmentId))
+        table.count_by('severity', status='failed')
+        table.filter(region='us_east_1', isExcluded=False).summary()
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.values = {'rule': [], 'severity': list(SEVERITIES), 'region': [], 'entityType': [],
+                       'status': list(STATUSES)}
+        self.codes = dict((column, dict((v, n) for n, v in enumerate(values))) for column, values in self.values.items())
+        self.columns = dict((column, array('i')) for column in CODED)
+        self.columns.update((flag, array('b')) for flag in FLAGS)
+        self.columns['entityId'] = []
+
+    @classmethod
+    def from_records(cls, records, region=None):
+        """Build a table from (rule, entityResult) records (see `Dome9.iter_assessment`)
+
+        Args:
+            records (iterable): (rule, entityResult) tuples.
+            region (str, optional): Region of the entities whose `testObj` has none.
+        """
+        table = cls()
+        for rule, entityResult in records:
+            table.append(rule, entityResult, region)
+        return table
+
+    @classmethod
+    def from_result(cls, result):
+        """Build a table from an AssessmentResult dict (see `Dome9.get_assessment`)"""
+        region = (result.get('request') or {}).get('region')
+        return cls.from_records(((test.get('rule') or {}, entityResult)
+                                 for test in result.get('tests') or []
+                                 for entityResult in test.get('entityResults') or []), region)
+
+    def _code(self, column, value):
+        code = self.codes[column].get(value)
+        if code is None:
+            code = self.codes[column][value] = len(self.values[column])
+            self.values[column].append(value)
+            if column == 'rule':
+                self.rules.append(None)
+        return code
+
+    def append(self, rule, entityResult, region=None):
+        """Add the row of an entity result"""
+        testObj = entityResult.get('testObj') or {}
+        ruleCode = self._code('rule', rule_key(rule))
+        if self.rules[ruleCode] is None:
+            self.rules[ruleCode] = rule
+        self.columns['rule'].append(ruleCode)
+        self.columns['severity'].append(self._code('severity', rule.get('severity')))
+        self.columns['region'].append(self._code('region', testObj.get('region') or region))
+        self.columns['entityType'].append(self._code('entityType', testObj.get('entityType')))
+        self.columns['status'].append(self.codes['status'][entity_status(entityResult)])
+        self.columns['entityId'].append(sys.intern(str(testObj.get('id'))) if testObj.get('id') is not None else None)
+        for flag in FLAGS:
+            self.columns[flag].append(1 if entityResult.get(flag) else 0)
+
+    def __len__(self):
+        return len(self.columns['entityId'])
+
+    def column(self, name):
+        """Values of a column, decoded"""
+        if name in CODED:
+            values = self.values[name]
+            return [values[code] for code in self.columns[name]]
+        if name in FLAGS:
+            return [bool(flag) for flag in self.columns[name]]
+        return list(self.columns[name])
+
+    def _condition(self, name, value):
+        if name in CODED:
+            return self.codes[name].get(value, -1)
+        if name in FLAGS:
+            return 1 if value else 0
+        return value
+
+    def _ndarray(self, name):
+        column = self.columns[name]
+        if isinstance(column, array):
+            return numpy.frombuffer(column, dtype=numpy.dtype(column.typecode)) if column else numpy.zeros(0, 'i')
+        return numpy.array(column, dtype=object)
+
+    def mask(self, **conditions):
+        """Rows matching every `column=value` condition, as a bytes mask"""
+        if _numpy() is not None:
+            return self._numpy_mask(conditions).view(numpy.uint8).tobytes()
+        mask = None
+        for name, value in conditions.items():
+            matches = bytes(map(operator.eq, self.columns[name], repeat(self._condition(name, value))))
+            mask = matches if mask is None else bytes(map(operator.and_, mask, matches))
+        return mask if mask is not None else b'\x01' * len(self)
+
+    def _numpy_mask(self, conditions):
+        mask = numpy.ones(len(self), dtype=bool)
+        for name, value in conditions.items():
+            mask &= self._ndarray(name) == self._condition(name, value)
+        return mask
+
+    def filter(self, **conditions):
+        """New table with the rows matching every `column=value` condition"""
+        mask = self.mask(**conditions)
+        table = AssessmentTable()
+        table.rules = self.rules
+        table.values = self.values
+        table.codes = self.codes
+        for name, column in self.columns.items():
+            if _numpy() is not None and isinstance(column, array) and column:
+                table.columns[name] = array(column.typecode, self._ndarray(name)[numpy.frombuffer(mask, bool)].tobytes())
+            else:
+                selected = compress(column, mask)
+                table.columns[name] = array(column.typecode, selected) if isinstance(column, array) else list(selected)
+        return table
+
+    def count_by(self, *columns, **conditions):
+        """Number of rows per value (or tuple of values) of `columns`, for the rows matching `conditions`
+
+        Returns:
+            collections.Counter
+        """
+        if _numpy() is not None and 'entityId' not in columns:
+            counts = self._numpy_counts(columns, conditions)
+        else:
+            mask = self.mask(**conditions) if conditions else None
+            keys = zip(*[self.columns[name] for name in columns]) if len(columns) > 1 else self.columns[columns[0]]
+            counts = Counter(compress(keys, mask) if mask is not None else keys)
+        decoders = [self._decoder(name) for name in columns]
+        if len(columns) == 1:
+            return Counter(dict((decoders[0](key), count) for key, count in counts.items()))
+        return Counter(dict((tuple(d(k) for d, k in zip(decoders, key)), count) for key, count in counts.items()))
+
+    def _numpy_counts(self, columns, conditions):
+        # Combine the codes of every column in a single integer and count them at once
+        radixes = [len(self.values[name]) if name in CODED else 2 for name in columns]
+        keys = numpy.zeros(len(self), dtype=numpy.int64)
+        for name, radix in zip(columns, radixes):
+            keys = keys * radix + self._ndarray(name)
+        if conditions:
+            keys = keys[self._numpy_mask(conditions)]
+        bins = numpy.bincount(keys, minlength=1)
+        counts = {}
+        for key in numpy.flatnonzero(bins).tolist():
+            count, codes = int(bins[key]), []
+            for radix in reversed(radixes):
+                key, code = divmod(key, radix)
+                codes.append(code)
+            counts[codes[0] if len(codes) == 1 else tuple(reversed(codes))] = count
+        return counts
+
+    def _decoder(self, name):
+        if name in CODED:
+            return self.values[name].__getitem__
+        if name in FLAGS:
+            return bool
+        return lambda value: value
+
+    def summary(self):
+        """Number of passed, failed, excluded and irrelevant entities per severity
+
+        Returns:
+            dict: {severity: {status: count}}
+        """
+        summary = {}
+        for (severity, status), count in self.count_by('severity', 'status').items():
+            summary.setdefault(severity, dict.fromkeys(STATUSES, 0))[status] = count
+        return summary
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2022 David Amrani Hernandez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import time
+import asyncio
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class Transport(object):
+    """Pooled keep-alive HTTP transport used by :class:`dome9.Dome9`.
+
+    A single ``requests.Session`` is kept for the lifetime of the client, so
+    consecutive calls reuse the same TCP+TLS connections instead of opening
+    a new one per request. The session can be shared by several threads.
+
+    Args:
+        poolSize (int): Max. number of connections kept alive per host.
+        poolConnections (int): Number of hosts (connection pools) to cache.
+        session (requests.Session, optional): Bring your own session.
+        poolBlock (bool): Wait for a free connection instead of opening one beyond `poolSize`,
+            making it a hard cap. Defaults to False.
+    """
+
+    def __init__(self, poolSize=10, poolConnections=10, session=None, poolBlock=False):
+        self.poolSize = poolSize
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolConnections, pool_maxsize=poolSize, pool_block=poolBlock)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session
+
+        Args:
+            method (str): HTTP method in lowercase (get, post, put, patch, delete)
+            url (str): Absolute URL
+
+        Returns:
+            requests.Response
+        """
+        return getattr(self.session, method)(url=url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RawResponse(object):
+    """Fully read HTTP response returned by :class:`AsyncTransport`"""
+
+    def __init__(self, status_code, reason, headers, content, elapsed=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class StreamResponse(object):
+    """HTTP response returned by :class:`AsyncTransport` when `stream` is set. The body is read on demand."""
+
+    def __init__(self, res, release):
+        self.status_code = res.status
+        self.reason = res.reason
+        self.headers = res.headers
+        self._res = res
+        self._release = release
+
+    async def read(self):
+        return await self._res.read()
+
+    async def iter_content(self, chunkSize=65536):
+        async for chunk in self._res.content.iter_chunked(chunkSize):
+            yield chunk
+
+    def close(self):
+        if self._release:
+            self._res.release()
+            self._release()
+            self._release = None
+
+
+class AsyncTransport(object):
+    """Pooled asyncio HTTP transport used by :class:`dome9.AsyncDome9`.
+
+    Built on ``aiohttp`` (``pip install dome9[async]``). The connection pool
+    and the concurrency semaphore are created lazily inside the running event
+    loop and shared by every coroutine using the client.
+
+    Args:
+        poolSize (int): Max. number of open connections.
+        maxConcurrency (int): Max. number of requests in flight.
+    """
+
+    def __init__(self, poolSize=100, maxConcurrency=100):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('AsyncDome9 requires aiohttp. Install it with: pip install dome9[async]')
+        self._aiohttp = aiohttp
+        self.poolSize = poolSize
+        self.maxConcurrency = maxConcurrency
+        self.session = None
+        self.semaphore = None
+
+    def _session(self):
+        if self.session is None or self.session.closed:
+            connector = self._aiohttp.TCPConnector(limit=self.poolSize, limit_per_host=self.poolSize)
+            self.session = self._aiohttp.ClientSession(connector=connector)
+            self.semaphore = asyncio.Semaphore(self.maxConcurrency)
+        return self.session
+
+    async def request(self, method, url, auth=None, stream=False, **kwargs):
+        """Send a request through the pooled session
+
+        Args:
+            method (str): HTTP method in lowercase (get, post, put, patch, delete)
+            url (str): Absolute URL
+            auth (tuple, optional): Basic auth credentials (key, secret)
+            stream (bool, optional): Do not read the body. The response must be closed.
+            timeout (tuple, optional): (connect, read) timeouts in seconds, or an aiohttp.ClientTimeout.
+
+        Returns:
+            RawResponse (StreamResponse if `stream` is set)
+
+        Raises:
+            ConnectionError: The API could not be reached.
+        """
+        session = self._session()
+        if auth:
+            kwargs['auth'] = self._aiohttp.BasicAuth(*auth)
+        if isinstance(kwargs.get('timeout'), tuple):
+            connect, read = kwargs['timeout']
+            kwargs['timeout'] = self._aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+        await self.semaphore.acquire()
+        start = time.perf_counter()
+        try:
+            res = await session.request(method.upper(), url, **kwargs)
+        except self._aiohttp.ClientConnectionError as ex:
+            self.semaphore.release()
+            raise ConnectionError(url, str(ex))
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+        if stream:
+            return StreamResponse(res, self.semaphore.release)
+        elapsed = timedelta(seconds=time.perf_counter() - start)
+        try:
+            content = await res.read()
+            return RawResponse(res.status, res.reason, res.headers, content, elapsed)
+        finally:
+            res.release()
+            self.semaphore.release()
+
+    async def close(self):
+        """Close every pooled connection"""
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
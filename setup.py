@@ -27,7 +27,18 @@ setup(
     name='dome9',
     version=read_file('VERSION').strip(),
     install_requires=read_file('requirements.txt').splitlines(),
+    extras_require={
+        'async': ['aiohttp'],
+        'table': ['numpy'],
+        'parquet': ['pyarrow'],
+        'zstd': ['zstandard'],
+        'fast': ['orjson'],
+        'prometheus': ['prometheus_client'],
+    },
     packages=find_packages(exclude=['tests*', 'docs*']),
+    entry_points={
+        'console_scripts': ['dome9=dome9.cli:main'],
+    },
     author='David Amrani Hernandez',
     author_email='davidmorenomad@gmail.com',
     url='https://github.com/davidmoremad',
@@ -9,5 +9,5 @@ def dome9():
 
 def mymock(mocker, function, mockFile, status_code):
     mock = json.loads(open(f'tests/mocks/{mockFile}', 'r').read())
-    mocker.patch(function, return_value=mocker.Mock(status_code=status_code, json=lambda: mock))
+    mocker.patch(function, return_value=mocker.Mock(status_code=status_code, content=json.dumps(mock).encode()))
     return mock
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import pytest
+from dome9 import AsyncDome9, PartialResultError
+from dome9.transport import RawResponse
+
+
+def asyncmock(mocker, mockFile=None, status_code=200, body=None):
+    if mockFile:
+        body = json.loads(open(f'tests/mocks/{mockFile}', 'r').read())
+    content = json.dumps(body).encode() if body is not None else b''
+
+    async def request(self, method, url, **kwargs):
+        return RawResponse(status_code, 'OK', {}, content)
+    return mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def adome9():
+    return AsyncDome9('U53RN4M3', 'P455W0RD')
+
+
+def test_async_get_cloud_account(mocker, adome9):
+    asyncmock(mocker, 'CloudAccount.json')
+    x = run(adome9.get_cloud_account('1234567890'))
+    assert x['id'] == '00000000-0000-0000-0000-000000000000'
+
+
+def test_async_list_cloud_accounts(mocker, adome9):
+    mock = asyncmock(mocker, 'CloudAccounts.json')
+    x = run(adome9.list_cloud_accounts())
+    assert mock.call_count == 4
+    assert len(x) == 16
+
+
+def test_async_run_assessment(mocker, adome9):
+    asyncmock(mocker, 'AssessmentResult.json')
+    x = run(adome9.run_assessment('1234', '00000000-0000-0000-0000-000000000000', 'Aws'))
+    assert x['tests']
+
+
+def test_async_delete(mocker, adome9):
+    asyncmock(mocker, status_code=204)
+    assert run(adome9.delete_user('1234')) is True
+
+
+def test_async_error(mocker, adome9):
+    asyncmock(mocker, status_code=400, body={'message': 'boom'})
+    with pytest.raises(Exception):
+        run(adome9.list_rulesets())
+
+
+def test_async_context_manager():
+    async def main():
+        async with AsyncDome9('U53RN4M3', 'P455W0RD', maxConcurrency=5) as d9:
+            assert d9.transport.maxConcurrency == 5
+    run(main())
+
+
+def test_async_list_cloud_accounts_partial_failure(mocker, adome9):
+    async def request(self, method, url, **kwargs):
+        if url.endswith('KubernetesAccount'):
+            return RawResponse(400, 'Bad Request', {}, b'')
+        return RawResponse(200, 'OK', {}, b'[{"id": "1"}]')
+    mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+    with pytest.raises(PartialResultError) as ex:
+        run(adome9.list_cloud_accounts())
+    assert list(ex.value.errors) == ['kubernetes']
+    assert len(ex.value.results) == 3
+
+
+def test_async_iter_protected_assets(mocker, adome9):
+    async def request(self, method, url, data=None, **kwargs):
+        payload = json.loads(data)
+        after = payload.get('searchAfter')
+        page = {'assets': [{'id': after[0] if after else 'first'}], 'searchAfter': None if after else ['second']}
+        return RawResponse(200, 'OK', {}, json.dumps(page).encode())
+    mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+
+    async def collect(prefetch):
+        return [a['id'] async for a in adome9.iter_protected_assets(prefetch=prefetch)]
+    assert run(collect(False)) == ['first', 'second']
+    assert run(collect(True)) == ['first', 'second']
+    assert len(run(adome9.list_protected_assets())['assets']) == 2
+
+
+def test_async_list_protected_assets_partitioned(mocker, adome9):
+    async def request(self, method, url, data=None, **kwargs):
+        payload = json.loads(data)
+        if payload['pageSize'] == 1:
+            page = {'assets': [], 'totalCount': 2, 'searchAfter': None,
+                    'aggregations': {'region': [{'value': 'eu', 'count': 1}, {'value': 'us', 'count': 1}]}}
+        else:
+            page = {'assets': [{'id': payload['filter']['fields'][0]['value']}, {'id': 'dup'}], 'searchAfter': None}
+        return RawResponse(200, 'OK', {}, json.dumps(page).encode())
+    mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+    x = run(adome9.list_protected_assets(partitionBy='region', workers=2))
+    assert [a['id'] for a in x['assets']] == ['eu', 'dup', 'us']
+
+    async def collect():
+        return sorted([a['id'] async for a in adome9.iter_protected_assets(partitionBy='region')])
+    assert run(collect()) == ['dup', 'eu', 'us']
+
+
+def test_async_run_assessments_bulk(mocker, adome9, tmp_path):
+    async def request(self, method, url, data=None, **kwargs):
+        return RawResponse(200, 'OK', {}, data)
+    mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+    jobs = [{'rulesetId': n, 'cloudAccountId': 'a1', 'cloudAccountType': 'Aws'} for n in range(4)]
+    received = []
+    progress = str(tmp_path / 'progress')
+    summary = run(adome9.run_assessments_bulk(jobs[:2], callback=lambda job, res: received.append(res['id']),
+                                              progressFile=progress))
+    assert summary['completed'] == 2
+    summary = run(adome9.run_assessments_bulk(jobs, workers=2, progressFile=progress))
+    assert summary['skipped'] == 2 and summary['completed'] == 2
+    assert sorted(received) == [0, 1]
+
+
+def test_async_delete_users_bulk(mocker, adome9):
+    async def request(self, method, url, **kwargs):
+        return RawResponse(204 if url.endswith('/1') else 404, 'Not Found', {}, b'')
+    mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+    results = run(adome9.delete_users_bulk([1, 2]))
+    assert [r.result for r in results] == [True, False]
+    assert run(adome9.delete_users_bulk([3], dryRun=True))[0].result['route'] == 'user/3'
+
+
+def test_async_single_flight(mocker, adome9):
+    async def request(self, method, url, **kwargs):
+        await asyncio.sleep(0.01)
+        return RawResponse(200, 'OK', {}, json.dumps({'id': url.rsplit('/', 1)[1]}).encode())
+    mock = mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+
+    async def main():
+        return await asyncio.gather(*[adome9.get_cloud_account('1234567890') for _ in range(5)])
+    assert run(main()) == [{'id': '1234567890'}] * 5
+    assert mock.call_count == 1
+    assert adome9.singleFlight.stats()['coalesced'] == 4
+
+
+def test_async_writes_detach_gets_in_flight(mocker, adome9):
+    bodies = iter([b'{"id": "1", "name": "old"}', b'{"id": "1", "name": "new"}'])
+
+    async def request(self, method, url, **kwargs):
+        if method.upper() == 'PUT':
+            return RawResponse(200, 'OK', {}, b'{"id": "1", "name": "new"}')
+        content = next(bodies)
+        if content.endswith(b'"old"}'):
+            await asyncio.sleep(0.05)
+        return RawResponse(200, 'OK', {}, content)
+    mock = mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+
+    async def main():
+        before = asyncio.ensure_future(adome9.get_ruleset(1))
+        await asyncio.sleep(0.01)
+        await adome9.update_ruleset({'id': '1', 'name': 'new'})
+        return await adome9.get_ruleset(1), await before
+    assert run(main()) == ({'id': '1', 'name': 'new'}, {'id': '1', 'name': 'old'})
+    assert mock.call_count == 3
+    assert adome9.singleFlight.stats()['coalesced'] == 0
+
+
+def test_async_single_flight_survives_cancelled_leader(mocker, adome9):
+    async def request(self, method, url, **kwargs):
+        await asyncio.sleep(0.05)
+        return RawResponse(200, 'OK', {}, b'{"id": "1"}')
+    mock = mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+
+    async def main():
+        leader = asyncio.ensure_future(adome9.get_ruleset(1))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(adome9.get_ruleset(1))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+    assert run(main()) == {'id': '1'}
+    assert mock.call_count == 1
+    assert adome9.singleFlight.stats() == {'calls': 2, 'coalesced': 1, 'inFlight': 0}
@@ -0,0 +1,96 @@
+import json
+import pytest
+from . import dome9
+
+
+def _pages(mocker, count=3, size=2):
+    pages = []
+    for n in range(count):
+        pages.append({
+            'assets': [{'id': '%d-%d' % (n, i)} for i in range(size)],
+            'totalCount': count * size,
+            'searchAfter': ['cursor-%d' % n] if n < count - 1 else None,
+        })
+    payloads = []
+
+    def post(url, data=None, **kwargs):
+        payload = json.loads(data)
+        payloads.append(payload)
+        page = pages[int(payload['searchAfter'][0].split('-')[1]) + 1] if 'searchAfter' in payload else pages[0]
+        return mocker.Mock(status_code=200, content=json.dumps(page).encode())
+    mocker.patch('requests.Session.post', side_effect=post)
+    return payloads
+
+
+def test_list_protected_assets(mocker, dome9):
+    _pages(mocker)
+    x = dome9.list_protected_assets()
+    assert [a['id'] for a in x['assets']] == ['0-0', '0-1', '1-0', '1-1', '2-0', '2-1']
+    assert x['totalCount'] == 6
+
+
+def test_iter_protected_assets(mocker, dome9):
+    payloads = _pages(mocker)
+    x = dome9.iter_protected_assets(pageSize=2)
+    assert next(x)['id'] == '0-0'
+    assert len(payloads) == 1
+    assert [a['id'] for a in x] == ['0-1', '1-0', '1-1', '2-0', '2-1']
+    assert payloads[-1]['searchAfter'] == ['cursor-1']
+
+
+def test_iter_protected_assets_pages(mocker, dome9):
+    _pages(mocker, count=4)
+    x = list(dome9.iter_protected_assets(pages=True))
+    assert len(x) == 4
+    assert x[-1]['searchAfter'] is None
+
+
+def test_iter_protected_assets_prefetch(mocker, dome9):
+    _pages(mocker, count=5)
+    x = [a['id'] for a in dome9.iter_protected_assets(prefetch=True)]
+    assert len(x) == 10
+    assert x[-1] == '4-1'
+
+
+def _partitioned(mocker, buckets, totalCount):
+    calls = []
+
+    def post(url, data=None, **kwargs):
+        payload = json.loads(data)
+        calls.append(payload)
+        fields = payload['filter']['fields']
+        if payload['pageSize'] == 1:
+            page = {'assets': [], 'totalCount': totalCount, 'searchAfter': ['x'],
+                    'aggregations': {'cloudAccountId': [{'value': v, 'count': c} for v, c in buckets]}}
+        elif not fields:
+            page = {'assets': [{'id': 'all'}], 'totalCount': 1, 'searchAfter': None}
+        else:
+            account = fields[-1]['value']
+            if 'searchAfter' not in payload:
+                page = {'assets': [{'id': account + '-0'}, {'id': 'shared'}], 'searchAfter': [account]}
+            else:
+                page = {'assets': [{'id': account + '-1'}], 'searchAfter': None}
+        return mocker.Mock(status_code=200, content=json.dumps(page).encode())
+    mocker.patch('requests.Session.post', side_effect=post)
+    return calls
+
+
+def test_list_protected_assets_partitioned(mocker, dome9):
+    calls = _partitioned(mocker, [('a', 3), ('b', 3)], 6)
+    x = dome9.list_protected_assets(filters=[{'name': 'cloudAccountId', 'value': 'a'}],
+                                    partitionBy='cloudAccountId', workers=2)
+    assert [a['id'] for a in x['assets']] == ['a-0', 'shared', 'a-1', 'b-0', 'b-1']
+    assert x['searchAfter'] is None
+    assert all(len(c['filter']['fields']) == 1 for c in calls[1:])
+
+
+def test_iter_protected_assets_partitioned(mocker, dome9):
+    _partitioned(mocker, [('a', 3), ('b', 3), ('c', 3)], 9)
+    x = [a['id'] for a in dome9.iter_protected_assets(partitionBy='cloudAccountId', workers=3)]
+    assert sorted(x) == ['a-0', 'a-1', 'b-0', 'b-1', 'c-0', 'c-1', 'shared']
+
+
+def test_partitioned_fallback_when_buckets_incomplete(mocker, dome9):
+    _partitioned(mocker, [('a', 3)], 10)
+    x = dome9.list_protected_assets(partitionBy='cloudAccountId')
+    assert [a['id'] for a in x['assets']] == ['all']
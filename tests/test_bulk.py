@@ -0,0 +1,120 @@
+import json
+import time
+import threading
+import pytest
+from dome9.bulk import ProgressLog, assessment_jobs, iter_bulk, run_bulk
+from . import dome9
+
+
+def test_run_bulk_keeps_input_order():
+    def slow(x):
+        time.sleep(0.01 * (5 - x))
+        if x == 3:
+            raise ValueError(x)
+        return x * 10
+    results = run_bulk(slow, range(5), workers=5)
+    assert [r.result for r in results] == [0, 10, 20, None, 40]
+    assert isinstance(results[3].error, ValueError)
+    assert not results[3].ok
+
+
+def test_iter_bulk_bounds_concurrency():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def task(x):
+        with lock:
+            running.append(x)
+            peak.append(len(running))
+        time.sleep(0.005)
+        with lock:
+            running.remove(x)
+    assert len(list(iter_bulk(task, range(40), workers=3))) == 40
+    assert max(peak) <= 3
+
+
+def test_assessment_jobs():
+    accounts = [{'id': 'a1', 'vendor': 'aws'}, ('g1', 'Google')]
+    jobs = assessment_jobs([10, 20], accounts, regions=['eu', 'us'])
+    assert len(jobs) == 8
+    assert jobs[0] == {'rulesetId': 10, 'cloudAccountId': 'a1', 'cloudAccountType': 'Aws', 'region': 'eu'}
+    assert jobs[-1]['cloudAccountType'] == 'Google'
+
+
+def _assessments(mocker, failing=()):
+    def post(url, data=None, **kwargs):
+        bundle = json.loads(data)
+        if bundle['CloudAccountId'] in failing:
+            return mocker.Mock(status_code=400, reason='Bad Request', content=b'')
+        return mocker.Mock(status_code=200, content=json.dumps({'request': bundle}).encode())
+    return mocker.patch('requests.Session.post', side_effect=post)
+
+
+def test_run_assessments_bulk_streams_results(mocker, dome9):
+    _assessments(mocker, failing=('a2',))
+    received = []
+    jobs = assessment_jobs([1, 2], [('a1', 'Aws'), ('a2', 'Aws')])
+    summary = dome9.run_assessments_bulk(jobs, workers=2, callback=lambda job, res: received.append(res))
+    assert summary['completed'] == 2
+    assert [job['cloudAccountId'] for job, _ in summary['failed']] == ['a2', 'a2']
+    assert sorted(r['request']['id'] for r in received) == [1, 2]
+
+
+def test_run_assessments_bulk_resumes(mocker, dome9, tmp_path):
+    progress = str(tmp_path / 'progress')
+    jobs = assessment_jobs([1, 2, 3], [('a1', 'Aws')])
+    _assessments(mocker)
+    calls = []
+
+    def crash(job, result):
+        calls.append(job['rulesetId'])
+        if len(calls) == 2:
+            raise KeyboardInterrupt()
+    with pytest.raises(KeyboardInterrupt):
+        dome9.run_assessments_bulk(jobs, workers=1, callback=crash, progressFile=progress)
+
+    post = _assessments(mocker)
+    summary = dome9.run_assessments_bulk(jobs, workers=1, progressFile=progress)
+    assert summary['skipped'] == 1
+    assert summary['completed'] == 2
+    assert post.call_count == 2
+
+
+def test_progress_log_drops_truncated_line(tmp_path):
+    path = tmp_path / 'progress'
+    path.write_bytes(b'"1|a1|"\n"2|a1|"\n"3|a')
+    progress = ProgressLog(str(path))
+    progress.add('3|a1|')
+    progress.close()
+    assert path.read_bytes() == b'"1|a1|"\n"2|a1|"\n"3|a1|"\n'
+    path.write_bytes(b'"1|a1|"')
+    progress = ProgressLog(str(path))
+    progress.add('2|a1|')
+    progress.close()
+    assert path.read_bytes() == b'"1|a1|"\n"2|a1|"\n'
+
+
+def test_create_exclusions_bulk(mocker, dome9):
+    def post(url, data=None, **kwargs):
+        exclusion = json.loads(data)
+        if exclusion['comment'] == 'bad':
+            return mocker.Mock(status_code=400, reason='Bad Request', content=b'')
+        return mocker.Mock(status_code=201, content=json.dumps(dict(exclusion, id=exclusion['comment'])).encode())
+    post = mocker.patch('requests.Session.post', side_effect=post)
+    results = dome9.create_exclusions_bulk([{'comment': c} for c in ['a', 'bad', 'c']], workers=3)
+    assert [r.result and r.result['id'] for r in results] == ['a', None, 'c']
+    assert results[1].error.code == 400
+    assert post.call_count == 3
+
+
+def test_bulk_dry_run(mocker, dome9):
+    delete = mocker.patch('requests.Session.delete')
+    post = mocker.patch('requests.Session.post')
+    results = dome9.delete_users_bulk([1, 2], dryRun=True)
+    assert [r.result for r in results] == [{'method': 'delete', 'route': 'user/1', 'payload': None},
+                                           {'method': 'delete', 'route': 'user/2', 'payload': None}]
+    results = dome9.create_users_bulk([{'email': 'a@b.c', 'name': 'A'}, {'name': 'missing email'}], dryRun=True)
+    assert results[0].result['payload']['email'] == 'a@b.c'
+    assert isinstance(results[1].error, TypeError)
+    assert not delete.called and not post.called
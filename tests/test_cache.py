@@ -0,0 +1,89 @@
+import json
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from dome9 import Dome9, ResponseCache, MemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache(maxSize=2)
+    return SQLiteCache(str(tmp_path / 'cache.db'), maxSize=2)
+
+
+def test_backend_lru_and_ttl(backend):
+    backend.set('a', 'f', '1', 60)
+    backend.set('b', 'f', '2', 60)
+    assert backend.get('a') == '1'
+    time.sleep(0.01)
+    backend.set('c', 'g', '3', 60)
+    assert backend.get('b') is None
+    assert backend.get('a') == '1'
+    backend.set('d', 'g', '4', -1)
+    assert backend.get('d') is None
+
+
+def test_backend_invalidate(backend):
+    backend.set('a', 'f', '1', 60)
+    backend.set('b', 'g', '2', 60)
+    backend.invalidate('f')
+    assert backend.get('a') is None
+    assert backend.get('b') == '2'
+
+
+def test_client_caches_reads(mocker):
+    get = mocker.patch('requests.Session.get',
+                       return_value=mocker.Mock(status_code=200, content=json.dumps([{'id': 1, 'name': 'x'}]).encode()))
+    d9 = Dome9('U53RN4M3', 'P455W0RD', cache=ResponseCache(ttl=60))
+    assert d9.list_rulesets() == d9.list_rulesets()
+    d9.list_rulesets()[0]['name'] = 'mutated'
+    assert d9.list_rulesets()[0]['name'] == 'x'
+    assert get.call_count == 1
+
+
+def test_client_invalidates_on_write(mocker):
+    get = mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps([]).encode()))
+    mocker.patch('requests.Session.post', return_value=mocker.Mock(status_code=200, content=json.dumps({'id': 1}).encode()))
+    d9 = Dome9('U53RN4M3', 'P455W0RD', cache=ResponseCache(ttl=60))
+    d9.list_rulesets()
+    d9.list_users()
+    d9.create_ruleset({'name': 'x'})
+    d9.list_rulesets()
+    d9.list_users()
+    assert get.call_count == 3
+
+
+def test_client_ttl_per_family(mocker):
+    get = mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps([]).encode()))
+    d9 = Dome9('U53RN4M3', 'P455W0RD', cache=ResponseCache(ttl=0, ttls={'user': 60}))
+    d9.list_users()
+    d9.list_users()
+    d9.list_exclusions()
+    d9.list_exclusions()
+    assert get.call_count == 3
+
+
+def test_reads_sent_before_a_write_are_not_cached(mocker):
+    started, release = threading.Event(), threading.Event()
+    bodies = iter([b'{"id": "1", "name": "old"}', b'{"id": "1", "name": "new"}'])
+
+    def get(url, **kwargs):
+        content = next(bodies)
+        if content.endswith(b'"old"}'):
+            started.set()
+            release.wait(5)
+        return mocker.Mock(status_code=200, content=content)
+    mock = mocker.patch('requests.Session.get', side_effect=get)
+    mocker.patch('requests.Session.put', return_value=mocker.Mock(status_code=200, content=b'{"id": "1", "name": "new"}'))
+    d9 = Dome9('U53RN4M3', 'P455W0RD', cache=ResponseCache(ttl=60), singleFlight=False)
+    with ThreadPoolExecutor(1) as pool:
+        before = pool.submit(d9.get_ruleset, 1)
+        started.wait(5)
+        d9.update_ruleset({'id': '1', 'name': 'new'})
+        release.set()
+        assert before.result() == {'id': '1', 'name': 'old'}
+    assert d9.get_ruleset(1) == {'id': '1', 'name': 'new'}
+    assert d9.get_ruleset(1) == {'id': '1', 'name': 'new'}
+    assert mock.call_count == 2
@@ -0,0 +1,78 @@
+import json
+import time
+import asyncio
+import pytest
+from dome9 import (AdaptiveConcurrency, AsyncDome9, CircuitBreaker, CircuitOpenError, Dome9, Dome9APIError,
+                   RetryPolicy)
+
+
+def test_circuit_opens_and_recovers():
+    breaker = CircuitBreaker(failureThreshold=2, recoveryTime=0.05)
+    route = 'CompliancePolicy/1'
+    breaker.record(route, False)
+    breaker.allow(route)
+    breaker.record(route, False)
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.allow('CompliancePolicy/2')
+    assert error.value.family == 'CompliancePolicy' and 0 < error.value.retryAfter <= 0.05
+    breaker.allow('CloudAccounts')
+
+    time.sleep(0.06)
+    breaker.allow(route)
+    assert breaker.states()['CompliancePolicy'] == 'half-open'
+    with pytest.raises(CircuitOpenError):
+        breaker.allow(route)
+    breaker.record(route, False)
+    assert breaker.states()['CompliancePolicy'] == 'open'
+
+    time.sleep(0.06)
+    breaker.allow(route)
+    breaker.record(route, True)
+    assert breaker.states()['CompliancePolicy'] == 'closed'
+
+
+def test_client_fails_fast(mocker):
+    mock = mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=503, reason='Unavailable',
+                                                                           content=b'', headers={}))
+    d9 = Dome9('U53RN4M3', 'P455W0RD', retry=RetryPolicy(maxAttempts=1), circuitBreaker=CircuitBreaker(failureThreshold=2))
+    for _ in range(2):
+        with pytest.raises(Dome9APIError):
+            d9.get_ruleset(1)
+    with pytest.raises(CircuitOpenError):
+        d9.get_ruleset(1)
+    assert mock.call_count == 2
+    # 429 is not a failure (the API is up): the trial request closes the circuit
+    d9.circuitBreaker.circuits['CompliancePolicy'].openedAt -= 30
+    mock.return_value = mocker.Mock(status_code=429, reason='Too Many', content=b'', headers={})
+    with pytest.raises(Dome9APIError):
+        d9.list_rulesets()
+    assert d9.circuitBreaker.states()['CompliancePolicy'] == 'closed'
+
+
+def test_timeouts(mocker):
+    mock = mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps([]).encode()))
+    Dome9('U53RN4M3', 'P455W0RD').list_rulesets()
+    assert mock.call_args[1]['timeout'] == (10, 300)
+    Dome9('U53RN4M3', 'P455W0RD', connectTimeout=2, readTimeout=5).list_rulesets()
+    assert mock.call_args[1]['timeout'] == (2, 5)
+
+
+def test_cancelled_trial_is_given_back(mocker):
+    async def request(self, method, url, **kwargs):
+        await asyncio.sleep(5)
+    mocker.patch('dome9.transport.AsyncTransport.request', side_effect=request, autospec=True)
+    breaker = CircuitBreaker(failureThreshold=1, recoveryTime=0)
+    breaker.record('CompliancePolicy', False)
+    d9 = AsyncDome9('U53RN4M3', 'P455W0RD', circuitBreaker=breaker, concurrency=AdaptiveConcurrency(initial=1))
+
+    async def main():
+        trial = asyncio.ensure_future(d9.get_ruleset(1))
+        await asyncio.sleep(0.01)
+        assert breaker.states()['CompliancePolicy'] == 'half-open'
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+    asyncio.run(main())
+    assert breaker.states()['CompliancePolicy'] == 'half-open'
+    assert d9.concurrency.limits()['CompliancePolicy']['inFlight'] == 0
+    breaker.allow('CompliancePolicy/1')
@@ -0,0 +1,52 @@
+import io
+import json
+import pytest
+from dome9.cli import main, parse_filters, cloud_account
+
+ARGS = ['--key', 'U53RN4M3', '--secret', 'P455W0RD', '--quiet']
+
+
+def _lines(out):
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def test_inventory(mocker, capsys):
+    page = {'assets': [{'id': 'a'}, {'id': 'b'}], 'totalCount': 2, 'searchAfter': None}
+    mock = mocker.patch('requests.Session.post', return_value=mocker.Mock(status_code=200, content=json.dumps(page).encode()))
+    assert main(['inventory', '--filter', 'region=us_east_1'] + ARGS) == 0
+    assert _lines(capsys.readouterr().out) == [{'id': 'a'}, {'id': 'b'}]
+    assert json.loads(mock.call_args[1]['data'])['filter']['fields'] == [{'name': 'region', 'value': 'us_east_1'}]
+
+
+def test_bulk(mocker, capsys, monkeypatch):
+    mocker.patch('requests.Session.delete', return_value=mocker.Mock(status_code=204, content=b''))
+    monkeypatch.setattr('sys.stdin', io.StringIO('"x1"\n\n{"id": "x2"}\n'))
+    assert main(['bulk', 'delete', 'exclusions'] + ARGS) == 0
+    lines = sorted(_lines(capsys.readouterr().out), key=lambda line: line['item'])
+    assert lines == [{'item': 'x1', 'result': True, 'error': None}, {'item': 'x2', 'result': True, 'error': None}]
+
+
+def test_bulk_dry_run(tmp_path, capsys):
+    items = tmp_path / 'users.ndjson'
+    items.write_text('{"email": "a@b.c", "name": "A"}\n')
+    assert main(['bulk', 'create', 'users', '--dry-run', '-i', str(items)] + ARGS) == 0
+    assert _lines(capsys.readouterr().out)[0]['result']['route'] == 'user'
+
+
+def test_errors(capsys, monkeypatch):
+    with pytest.raises(SystemExit):
+        main(['bulk', 'update', 'users'] + ARGS)
+    monkeypatch.delenv('DOME9_ACCESS_KEY', raising=False)
+    monkeypatch.delenv('DOME9_SECRET_KEY', raising=False)
+    assert main(['inventory', '-q']) == 2
+    assert 'No provided credentials' in capsys.readouterr().err
+    with pytest.raises(ValueError):
+        parse_filters(['region'])
+
+
+def test_account_argument(capsys):
+    assert cloud_account('1234:Aws') == ('1234', 'Aws')
+    with pytest.raises(SystemExit) as exc:
+        main(['assess', '--ruleset', '1', '--account', '1234'] + ARGS)
+    assert exc.value.code == 2
+    assert "invalid account '1234', expected ID:TYPE" in capsys.readouterr().err
@@ -1,52 +1,54 @@
+import json
 import pytest
+from dome9 import PartialResultError
 from . import dome9, mymock
 
 def test_get_cloud_account(mocker, dome9):
-    mymock(mocker, 'requests.get', 'CloudAccount.json', 200)
+    mymock(mocker, 'requests.Session.get', 'CloudAccount.json', 200)
     x = dome9.get_cloud_account('1234567890')
     assert x['id'] == '00000000-0000-0000-0000-000000000000'
 
 
 def test_list_cloud_accounts(mocker, dome9):
-    mymock(mocker, 'requests.get', 'CloudAccounts.json', 200)
+    mymock(mocker, 'requests.Session.get', 'CloudAccounts.json', 200)
     x = dome9.list_cloud_accounts()
     assert isinstance(x, list)
     assert x[0]['id'] == '00000000-0000-0000-0000-000000000000'
 
 
 def test_list_aws_accounts(mocker, dome9):
-    mymock(mocker, 'requests.get', 'CloudAccounts.json', 200)
+    mymock(mocker, 'requests.Session.get', 'CloudAccounts.json', 200)
     x = dome9.list_aws_accounts()
     assert len(x) == 4
     assert next(filter(lambda z: z['vendor'] == 'aws', x))
 
 
 def test_list_azure_accounts(mocker, dome9):
-    mymock(mocker, 'requests.get', 'CloudAccounts.json', 200)
+    mymock(mocker, 'requests.Session.get', 'CloudAccounts.json', 200)
     x = dome9.list_azure_accounts()
     assert next(filter(lambda z: z['vendor'] == 'azure', x))
 
 
 def test_list_google_accounts(mocker, dome9):
-    mymock(mocker, 'requests.get', 'CloudAccounts.json', 200)
+    mymock(mocker, 'requests.Session.get', 'CloudAccounts.json', 200)
     x = dome9.list_google_accounts()
     assert next(filter(lambda z: z['vendor'] == 'google', x))
 
 
 def test_list_kubernetes_accounts(mocker, dome9):
-    mymock(mocker, 'requests.get', 'CloudAccounts.json', 200)
+    mymock(mocker, 'requests.Session.get', 'CloudAccounts.json', 200)
     x = dome9.list_kubernetes_accounts()
     assert next(filter(lambda z: z['vendor'] == 'kubernetes', x))
 
 
 def test_connect_aws_account(mocker, dome9):
-    mymock(mocker, 'requests.post', 'CloudAccount.json', 200)
+    mymock(mocker, 'requests.Session.post', 'CloudAccount.json', 200)
     x = dome9.connect_aws_account('accountName', 'MYS3CR3T', 'arn:123456789:role/myrole')
     assert x['id'] == '00000000-0000-0000-0000-000000000000'
     
 
 def test_connect_azure_account(mocker, dome9):
-    mymock(mocker, 'requests.post', 'CloudAccount.json', 200)
+    mymock(mocker, 'requests.Session.post', 'CloudAccount.json', 200)
     x = dome9.connect_azure_account(
         name='Testname',
         tenantId='b1b2b3b4-abcd-1234-1234-7bc77bc7',
@@ -56,3 +58,38 @@ def test_connect_azure_account(mocker, dome9):
     )
     assert x['id'] == '00000000-0000-0000-0000-000000000000'
 
+
+
+def _vendor_mock(mocker, failing):
+    accounts = json.loads(open('tests/mocks/CloudAccounts.json', 'r').read())
+
+    def get(url, **kwargs):
+        route = url.rsplit('/', 1)[-1]
+        if route == failing:
+            return mocker.Mock(status_code=400, reason='Bad Request', content=b'')
+        return mocker.Mock(status_code=200, content=json.dumps([x for x in accounts if x['vendor'] == VENDORS[route]]).encode())
+    mocker.patch('requests.Session.get', side_effect=get)
+
+
+VENDORS = {'AzureCloudAccount': 'azure', 'CloudAccounts': 'aws',
+           'GoogleCloudAccount': 'google', 'KubernetesAccount': 'kubernetes'}
+
+
+def test_list_cloud_accounts_order(mocker, dome9):
+    _vendor_mock(mocker, None)
+    x = dome9.list_cloud_accounts()
+    assert [z['vendor'] for z in x] == ['azure', 'aws', 'google', 'kubernetes']
+
+
+def test_list_cloud_accounts_partial_failure(mocker, dome9):
+    _vendor_mock(mocker, 'GoogleCloudAccount')
+    with pytest.raises(PartialResultError) as ex:
+        dome9.list_cloud_accounts()
+    assert list(ex.value.errors) == ['google']
+    assert [z['vendor'] for z in ex.value.results] == ['azure', 'aws', 'kubernetes']
+
+
+def test_list_cloud_accounts_not_strict(mocker, dome9):
+    _vendor_mock(mocker, 'CloudAccounts')
+    x = dome9.list_cloud_accounts(strict=False)
+    assert [z['vendor'] for z in x] == ['azure', 'google', 'kubernetes']
@@ -0,0 +1,33 @@
+import json
+import pytest
+from dome9 import Dome9
+from dome9.codec import CODECS, JSONCodec, get_codec
+
+
+@pytest.mark.parametrize('name', list(CODECS))
+def test_codecs(name):
+    try:
+        codec = get_codec(name)
+    except ImportError:
+        pytest.skip('%s is not installed' % name)
+    obj = {'name': 'café/1', 'ids': [1, 2.5, None, True]}
+    assert codec.loads(json.dumps(obj).encode()) == obj
+    assert json.loads(codec.dumps(obj)) == obj
+    assert json.loads(codec.encode(obj)) == obj
+
+
+def test_get_codec():
+    assert get_codec().name in CODECS
+    codec = JSONCodec()
+    assert get_codec(codec) is codec
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+
+
+def test_client_codec(mocker):
+    dome9 = Dome9('U53RN4M3', 'P455W0RD', codec='json')
+    loads = mocker.spy(dome9.codec, 'loads')
+    post = mocker.patch('requests.Session.post', return_value=mocker.Mock(status_code=200, content=b'{"id": 1}'))
+    assert dome9.create_ruleset({'name': 'x'}) == {'id': 1}
+    assert loads.call_args.args[0] == b'{"id": 1}'
+    assert post.call_args.kwargs['data'] == b'{"name": "x"}'
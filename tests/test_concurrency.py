@@ -0,0 +1,74 @@
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dome9 import AdaptiveConcurrency, Dome9
+from dome9.concurrency import AIMDLimit
+
+
+def _limit(initial=4):
+    return AIMDLimit(initial, minLimit=1, maxLimit=8, increase=1.0, backoff=0.5, tolerance=2.0)
+
+
+def test_additive_increase_multiplicative_decrease():
+    limit = _limit()
+    for _ in range(8):
+        limit.acquire()
+        limit.release(time.monotonic(), 0.1, False)
+    assert limit.capacity() == 5
+    sent = time.monotonic()
+    limit.acquire()
+    limit.acquire()
+    limit.release(sent, 0.1, True)
+    # Sent before the decrease: it does not decrease it again
+    limit.release(sent, 0.1, True)
+    assert limit.capacity() == 2
+    limit.acquire()
+    limit.release(time.monotonic(), 0.5, False)
+    assert limit.capacity() == 1
+    assert limit.inFlight == 0
+
+
+def test_limits_requests_in_flight(mocker):
+    inFlight, peak, lock = [0], [0], threading.Lock()
+
+    def get(url, **kwargs):
+        with lock:
+            inFlight[0] += 1
+            peak[0] = max(peak[0], inFlight[0])
+        time.sleep(0.01)
+        with lock:
+            inFlight[0] -= 1
+        return mocker.Mock(status_code=503 if 'fail' in url else 200, reason='', headers={}, content=b'{}')
+
+    mocker.patch('requests.Session.get', side_effect=get)
+    concurrency = AdaptiveConcurrency(initial=2, maxLimit=2)
+    d9 = Dome9('U53RN4M3', 'P455W0RD', concurrency=concurrency, singleFlight=False)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(d9.get_ruleset, range(16)))
+    assert peak[0] == 2
+    assert concurrency.limits()['CompliancePolicy']['inFlight'] == 0
+
+
+def test_async_waiters():
+    limit = _limit(initial=1)
+    order = []
+
+    async def task(n):
+        await limit.acquire_async()
+        order.append(n)
+        await asyncio.sleep(0.01)
+        limit.release(time.monotonic(), 0.01, False)
+
+    async def main():
+        limit.acquire()
+        cancelled = asyncio.ensure_future(task('cancelled'))
+        tasks = [asyncio.ensure_future(task(n)) for n in range(3)]
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        limit.release(time.monotonic(), 0.01, False)
+        await asyncio.gather(*tasks)
+    asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert limit.inFlight == 0 and not limit.waiters
@@ -0,0 +1,51 @@
+import json
+from dome9.diff import diff_assessments
+from . import dome9
+
+
+def _result(statuses):
+    tests = []
+    for ruleId, entities in statuses.items():
+        entityResults = [{'isRelevant': status != 'irrelevant', 'isValid': status == 'passed',
+                          'isExcluded': status == 'excluded', 'testObj': {'id': entityId}}
+                         for entityId, status in entities.items()]
+        tests.append({'rule': {'ruleId': ruleId, 'name': 'rule %s' % ruleId, 'severity': 'High'},
+                      'entityResults': entityResults})
+    return {'tests': tests}
+
+
+def _records(result):
+    return [(test['rule'], entityResult) for test in result['tests'] for entityResult in test['entityResults']]
+
+
+PREVIOUS = _result({'R1': {'a': 'failed', 'b': 'passed', 'c': 'failed', 'd': 'failed'}, 'R2': {'a': 'passed'}})
+CURRENT = _result({'R1': {'a': 'failed', 'b': 'failed', 'c': 'passed', 'd': 'excluded', 'e': 'failed'}})
+
+
+def test_diff_assessments():
+    delta = diff_assessments(_records(PREVIOUS), _records(CURRENT))
+    assert delta.unchanged == 1
+    assert sorted(c.entityId for c in delta.new_failures()) == ['b', 'e']
+    assert [(c.rule, c.entityId, c.current) for c in delta.resolved()] == [('R1', 'c', 'passed')]
+    assert [c.entityId for c in delta.new_exclusions()] == ['d']
+    assert delta.transitions()[('passed', None)] == 1
+
+
+def test_report():
+    report = diff_assessments(_records(PREVIOUS), _records(CURRENT)).report()
+    assert report['counts'] == {'newFailures': 2, 'resolved': 1, 'newExclusions': 1, 'unchanged': 1}
+    assert report['rules']['R1']['name'] == 'rule R1'
+    assert report['rules']['R1']['newFailures'] == ['b', 'e']
+    assert 'R2' not in report['rules']
+    json.dumps(report)
+
+
+def test_client_diff_assessments(mocker, dome9):
+    payloads = {'AssessmentHistoryV2/1': json.dumps(PREVIOUS).encode(), 'AssessmentHistoryV2/2': json.dumps(CURRENT).encode()}
+
+    def get(url, **kwargs):
+        data = payloads[url.split('/v2/')[1]]
+        return mocker.Mock(status_code=200, iter_content=lambda size: [data])
+
+    mocker.patch('requests.Session.get', side_effect=get)
+    assert dome9.diff_assessments(1, 2).report()['counts']['newFailures'] == 2
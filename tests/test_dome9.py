@@ -1,3 +1,4 @@
+import json
 import pytest
 import os
 from dome9 import Dome9
@@ -46,31 +47,54 @@ def dome9():
     return dome9
 
 def test_get_requests(mocker, dome9):
-    mocker.patch('requests.get',
-        return_value=mocker.Mock(status_code=200, json=lambda: {'foo': 'bar'}))
+    mocker.patch('requests.Session.get',
+        return_value=mocker.Mock(status_code=200, content=json.dumps({'foo': 'bar'}).encode()))
     x = dome9._get('/random_URI')
     assert x['foo'] == 'bar'
 
 def test_post_requests(mocker, dome9):
-    mocker.patch('requests.post',
-        return_value=mocker.Mock(status_code=200, json=lambda: {'foo': 'bar'}))
+    mocker.patch('requests.Session.post',
+        return_value=mocker.Mock(status_code=200, content=json.dumps({'foo': 'bar'}).encode()))
     x = dome9._post('/random_URI')
     assert x['foo'] == 'bar'
 
 def test_put_requests(mocker, dome9):
-    mocker.patch('requests.put',
-        return_value=mocker.Mock(status_code=200, json=lambda: {'foo': 'bar'}))
+    mocker.patch('requests.Session.put',
+        return_value=mocker.Mock(status_code=200, content=json.dumps({'foo': 'bar'}).encode()))
     x = dome9._put('/random_URI')
     assert x['foo'] == 'bar'
 
 def test_patch_requests(mocker, dome9):
-    mocker.patch('requests.patch',
-        return_value=mocker.Mock(status_code=200, json=lambda: {'foo': 'bar'}))
+    mocker.patch('requests.Session.patch',
+        return_value=mocker.Mock(status_code=200, content=json.dumps({'foo': 'bar'}).encode()))
     x = dome9._patch('/random_URI')
     assert x['foo'] == 'bar'
 
 def test_delete_requests(mocker, dome9):
-    mocker.patch('requests.delete',
-        return_value=mocker.Mock(status_code=204, json=lambda: {'foo': 'bar'}))
+    mocker.patch('requests.Session.delete',
+        return_value=mocker.Mock(status_code=204, content=json.dumps({'foo': 'bar'}).encode()))
     x = dome9._delete('/random_URI')
-    assert x == True
\ No newline at end of file
+    assert x == True
+# ---------------- TRANSPORT -----------------
+
+def test_transport_pool_size():
+    d9 = Dome9('U53RN4M3', 'P455W0RD', poolSize=32)
+    adapter = d9.transport.session.get_adapter('https://api.dome9.com')
+    assert adapter._pool_maxsize == 32
+
+def test_transport_is_reused(mocker, dome9):
+    mock = mocker.patch('requests.Session.get', autospec=True,
+        return_value=mocker.Mock(status_code=200, content=json.dumps({'foo': 'bar'}).encode()))
+    dome9._get('/random_URI')
+    dome9._get('/random_URI')
+    assert mock.call_count == 2
+    first, second = (call[0][0] for call in mock.call_args_list)
+    assert first is second is dome9.transport.session
+    assert first.get_adapter('https://') is first.get_adapter('http://')
+
+
+def test_context_manager_closes_transport(mocker):
+    close = mocker.patch('requests.Session.close')
+    with Dome9('U53RN4M3', 'P455W0RD') as d9:
+        assert d9.transport
+    assert close.called
@@ -0,0 +1,70 @@
+import json
+import pytest
+from dome9.exclusions import ExclusionMatcher, compile_logic
+from . import dome9
+
+RESULT = {
+    'request': {'id': 10, 'dome9CloudAccountId': 'acc-1', 'region': None},
+    'tests': [
+        {'rule': {'ruleId': 'R1', 'logicHash': 'h1', 'name': 'rule 1'}, 'exclusionStats': {},
+         'entityResults': [
+             {'isRelevant': True, 'isValid': False, 'isExcluded': False, 'testObj': {'id': 'i-1', 'region': 'us_east_1'}},
+             {'isRelevant': True, 'isValid': False, 'isExcluded': True, 'testObj': {'id': 'i-2', 'region': 'eu_west_1'}},
+             {'isRelevant': True, 'isValid': True, 'isExcluded': False, 'testObj': {'id': 'i-3', 'region': 'us_east_1'}},
+         ]},
+        {'rule': {'ruleId': 'R2', 'logicHash': 'h2', 'name': 'rule 2'},
+         'entityResults': [
+             {'isRelevant': True, 'isValid': False, 'isExcluded': False, 'testObj': {'id': 'i-1', 'name': 'web'}},
+         ]},
+    ],
+}
+
+
+def test_compile_logic():
+    assert compile_logic("Instance where id='i-1' and region='us_east_1'") == {'id': 'i-1', 'region': 'us_east_1'}
+    assert compile_logic("name='it\\'s'") == {'name': "it's"}
+    with pytest.raises(ValueError):
+        compile_logic("name like 'web%'")
+
+
+def test_apply():
+    exclusions = [
+        {'id': 'x1', 'ruleLogicHash': 'h1', 'logic': "Instance where id='i-1'"},
+        {'id': 'x2', 'ruleId': 'R2', 'logic': "name='web'", 'bundleId': 10},
+        {'id': 'x3', 'ruleId': 'R1', 'cloudAccountId': 'acc-2'},
+        {'id': 'x4', 'bundleId': 11},
+        {'id': 'x5', 'logic': "name like"},
+        {'id': 'x6', 'ruleId': 'R1', 'logic': "Instance where region like 'eu%' and id in('i-2', 'i-3')"},
+    ]
+    matcher = ExclusionMatcher(exclusions)
+    assert [exclusion['id'] for exclusion, _ in matcher.unsupported] == ['x5']
+    result = matcher.apply(RESULT)
+    assert [er['exclusionId'] for er in result['tests'][0]['entityResults']] == ['x1', 'x6', None]
+    assert result['tests'][0]['exclusionStats'] == {'testedCount': 2, 'relevantCount': 2, 'nonComplyingCount': 2}
+    assert result['tests'][0]['testPassed'] is True
+    assert result['tests'][1]['testPassed'] is True
+    assert result['assessmentPassed'] is True
+    assert RESULT['tests'][0]['exclusionStats'] == {}
+
+
+def test_regions_and_impact():
+    matcher = ExclusionMatcher([{'id': 'x1', 'ruleId': 'R1', 'regions': ['us-east-1']}])
+    report = matcher.impact(RESULT)
+    assert report['counts'] == {'excluded': 2, 'newlyExcluded': 2, 'noLongerExcluded': 1, 'failuresExcluded': 1}
+    assert report['exclusions'] == {'x1': 2}
+    assert report['rules']['R1'] == {'name': 'rule 1', 'severity': None, 'newlyExcluded': ['i-1', 'i-3'],
+                                     'noLongerExcluded': ['i-2']}
+    json.dumps(report)
+
+
+def test_simulate_exclusions(mocker, dome9):
+    existing = [{'id': 'x1', 'ruleId': 'R1', 'logic': "id='i-2'"}]
+    payloads = {'Exclusion': existing, 'AssessmentHistoryV2/1': RESULT}
+
+    def get(url, **kwargs):
+        return mocker.Mock(status_code=200, content=json.dumps(payloads[url.split('/v2/')[1]]).encode())
+
+    mocker.patch('requests.Session.get', side_effect=get)
+    assert dome9.simulate_exclusions(1)['counts']['newlyExcluded'] == 0
+    report = dome9.simulate_exclusions(1, add=[{'id': 'new', 'ruleId': 'R2'}], remove=['x1'])
+    assert report['counts'] == {'excluded': 1, 'newlyExcluded': 1, 'noLongerExcluded': 1, 'failuresExcluded': 1}
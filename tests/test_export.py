@@ -0,0 +1,70 @@
+import csv
+import gzip
+import json
+import pytest
+from dome9.export import ASSET_COLUMNS, ENTITY_RESULT_COLUMNS, RULE_COLUMNS, Exporter
+from . import dome9
+
+
+def _schema(name):
+    return json.load(open('docs/source/schemas/%s.json' % name))
+
+
+def test_columns_match_schemas():
+    assert set(ASSET_COLUMNS) == set(_schema('ProtectedAsset')['assets'][0])
+    test = _schema('AssessmentResult')['tests'][0]
+    assert set(RULE_COLUMNS) == set(test['rule'])
+    assert set(test['entityResults'][0]) - {'testObj'} <= set(ENTITY_RESULT_COLUMNS)
+
+
+def test_ndjson_gzip(tmp_path):
+    path = str(tmp_path / 'assets.ndjson.gz')
+    with Exporter(path, ('id', 'testObj.id', 'tags'), batchSize=2) as exporter:
+        exporter.write_many({'id': n, 'testObj': {'id': 'i-%d' % n}, 'tags': [n]} for n in range(5))
+    rows = [json.loads(line) for line in gzip.open(path, 'rt')]
+    assert exporter.count == 5
+    assert rows[4] == {'id': 4, 'testObj.id': 'i-4', 'tags': [4]}
+
+
+def test_csv(tmp_path):
+    path = str(tmp_path / 'assets.csv')
+    with Exporter(path, ('id', 'isValid', 'tags', 'missing')) as exporter:
+        exporter.write({'id': 'a,1', 'isValid': False, 'tags': [{'key': 'k'}]})
+    rows = list(csv.reader(open(path, newline='')))
+    assert rows == [['id', 'isValid', 'tags', 'missing'], ['a,1', 'false', '[{"key":"k"}]', '']]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        Exporter(str(tmp_path / 'assets.xml'), ASSET_COLUMNS)
+
+
+def test_export_protected_assets(mocker, dome9, tmp_path):
+    page = {'assets': [{'id': 'a-1', 'type': 'Instance', 'tags': []}], 'totalCount': 1, 'searchAfter': None}
+    mocker.patch('requests.Session.post', return_value=mocker.Mock(status_code=200, content=json.dumps(page).encode()))
+    path = str(tmp_path / 'assets.csv')
+    assert dome9.export_protected_assets(path) == 1
+    rows = list(csv.DictReader(open(path, newline='')))
+    assert rows[0]['type'] == 'Instance' and rows[0]['tags'] == '[]'
+
+
+def test_export_assessment(mocker, dome9, tmp_path):
+    data = open('tests/mocks/AssessmentResult.json', 'rb').read()
+    mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, iter_content=lambda size: [data]))
+    path = str(tmp_path / 'results.ndjson')
+    count = dome9.export_assessment(7, path)
+    rows = [json.loads(line) for line in open(path)]
+    assert count == len(rows) == sum(len(t['entityResults']) for t in json.loads(data)['tests'])
+    assert rows[0]['assessmentId'] == 7
+    assert rows[0]['rule.name'] == json.loads(data)['tests'][0]['rule']['name']
+
+
+def test_parquet(tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'results.parquet')
+    with Exporter(path, ENTITY_RESULT_COLUMNS, batchSize=2) as exporter:
+        exporter.write_many({'isValid': n % 2 == 0, 'rule': {'name': 'r'}, 'testObj': {'id': n}} for n in range(5))
+    table = parquet.read_table(path)
+    assert table.num_rows == 5
+    assert table.column('isValid').to_pylist() == [True, False, True, False, True]
+    assert table.column('testObj.id').to_pylist() == ['0', '1', '2', '3', '4']
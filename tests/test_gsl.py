@@ -0,0 +1,98 @@
+import time
+import pytest
+from dome9.gsl import GSLError, _timestamp, compile_condition, compile_rule, evaluate_ruleset
+
+USER = {
+    'entityType': 'IamUser', 'name': 'alice', 'passwordEnabled': True, 'mfaActive': False, 'age': '42',
+    'firstAccessKey': {'isActive': True, 'lastRotated': '2020-01-01T00:00:00.0000000Z'},
+    'tags': [{'key': 'Owner', 'value': 'sec'}, {'key': 'env', 'value': 'prod'}],
+    'groups': ['admins', 'dev'], 'policies': [],
+}
+
+
+@pytest.mark.parametrize('condition, expected', [
+    ("name='alice'", True),
+    ("name!='alice'", False),
+    ('passwordEnabled=true and not mfaActive', True),
+    ('mfaActive or policies', False),
+    ('age > 40 and age <= 42', True),
+    ("name like 'AL%'", True),
+    ("name unlike '%ce'", False),
+    ('name regexMatch /^a.+e$/', True),
+    ("firstAccessKey.isActive=true", True),
+    ("tags contain [key='Owner' and value='sec']", True),
+    ("tags contain-none [key='Owner']", False),
+    ("tags contain-all [key like '%n%']", True),
+    ("tags contain-single [key like '%']", False),
+    ("groups contain [$='admins']", True),
+    ("tags.key='env'", True),
+    ("groups in('dev', 'qa')", True),
+    ('policies isEmpty()', True),
+    ('groups length() = 2', True),
+    ('passwordEnabled length() > 0', False),
+    ("firstAccessKey with [isActive=true and lastRotated before(-90, 'days')]", True),
+    ("firstAccessKey.lastRotated after(-1, 'days')", False),
+    ('(missing or name) and not missing.field', True),
+])
+def test_condition(condition, expected):
+    assert compile_condition(condition)(USER) is expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2020-01-01T00:00:00.0000000Z', 1577836800.0),
+    ('2020-01-01', 1577836800.0),
+    ('2020-01-01T10:00:00+02:00', 1577865600.0),
+    ('2020-01-01 10:00:00.5-0130', 1577878200.5),
+    (1577836800000, 1577836800.0),
+    ('2020-13-01', None),
+    ('yesterday', None),
+])
+def test_timestamp(value, expected):
+    assert _timestamp(value) == expected
+
+
+@pytest.mark.parametrize('logic', ["name like", "name = ", "tags contain [key='a'", "IamUser must mfaActive", "a # b"])
+def test_invalid(logic):
+    with pytest.raises(GSLError):
+        compile_rule(logic) if 'IamUser' in logic else compile_condition(logic)
+
+
+def test_rule():
+    rule = compile_rule('IamUser where passwordEnabled=true should have mfaActive=true')
+    assert rule.entityType == 'IamUser'
+    assert rule.evaluate(USER) == (True, False)
+    assert rule.evaluate(dict(USER, passwordEnabled=False)) == (False, True)
+    assert compile_rule("IamUser should not have name='alice'").evaluate(USER) == (True, False)
+    assert not rule.applies_to({'type': 'Instance'})
+
+
+def test_evaluate_ruleset():
+    rules = [{'name': 'mfa', 'logic': 'IamUser where passwordEnabled=true should have mfaActive=true'},
+             {'name': 'tags', 'logic': "Instance should have tags contain [key='Owner']"},
+             {'name': 'broken', 'logic': 'Instance should'}]
+    entities = [USER, {'type': 'Instance', 'tags': []}, {'type': 'Instance', 'tags': [{'key': 'Owner'}]}]
+    result = evaluate_ruleset({'rules': rules}, entities)
+    mfa, tags, broken = result['tests']
+    assert (mfa['testedCount'], mfa['relevantCount'], mfa['nonComplyingCount']) == (1, 1, 1)
+    assert [er['isValid'] for er in tags['entityResults']] == [False, True]
+    assert broken['error'] and broken['entityResults'] == []
+    assert result['assessmentPassed'] is False
+
+
+def test_entity_errors(mocker):
+    rules = [{'name': 'count', 'logic': 'Instance should have count length() > 0'}]
+    entities = [{'type': 'Instance', 'count': 5}, {'type': 'Instance', 'count': [1]}]
+    assert [er['isValid'] for er in evaluate_ruleset(rules, entities)['tests'][0]['entityResults']] == [False, True]
+    evaluate = mocker.patch('dome9.gsl.GSLRule.evaluate', side_effect=[ValueError('boom'), (True, True)])
+    test = evaluate_ruleset(rules, entities)['tests'][0]
+    assert evaluate.call_count == 2
+    assert test['nonComplyingCount'] == 1 and test['entityResults'][0]['error'] == 'ValueError: boom'
+    assert test['entityResults'][1]['isValid'] is True
+
+
+def test_throughput():
+    rule = compile_rule("IamUser where passwordEnabled=true should have mfaActive=true and tags contain [key='Owner']")
+    start = time.perf_counter()
+    for _ in range(10000):
+        rule.evaluate(USER)
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,69 @@
+import json
+import pytest
+from dome9.index import ResourceIndex
+from dome9.routes import route_id
+from . import dome9
+
+
+RULESETS = [{'id': 1, 'name': 'CIS'}, {'id': 2, 'name': 'GDPR'}]
+
+
+def test_route_id():
+    assert route_id('CompliancePolicy/123') == '123'
+    assert route_id('Compliance/Remediation?id=abc') == 'abc'
+    assert route_id('CompliancePolicy') is None
+
+
+def test_index_upsert_and_discard():
+    index = ResourceIndex(('id', 'name'))
+    index.load(RULESETS)
+    index.upsert({'id': 1, 'name': 'CIS v2'})
+    assert index.lookup('name', 'CIS') is None
+    assert index.lookup('id', '1')['name'] == 'CIS v2'
+    index.discard('2')
+    assert index.lookup('name', 'GDPR') is None
+
+
+def test_get_ruleset_by_name_uses_index(mocker, dome9):
+    get = mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps(RULESETS).encode()))
+    assert dome9.get_ruleset(name='GDPR')['id'] == 2
+    assert dome9.get_ruleset(name='CIS')['id'] == 1
+    assert get.call_count == 1
+
+
+def test_index_refreshes_on_miss_once(mocker, dome9):
+    get = mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps(RULESETS).encode()))
+    assert dome9.get_ruleset(name='HIPAA') is None
+    assert dome9.get_ruleset(name='HIPAA') is None
+    assert get.call_count == 1
+
+
+def test_index_follows_writes(mocker, dome9):
+    mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps(RULESETS).encode()))
+    mocker.patch('requests.Session.post', return_value=mocker.Mock(status_code=200, content=json.dumps({'id': 3, 'name': 'PCI'}).encode()))
+    mocker.patch('requests.Session.delete', return_value=mocker.Mock(status_code=204))
+    dome9.get_ruleset(name='CIS')
+    dome9.create_ruleset({'name': 'PCI'})
+    assert dome9.get_ruleset(name='PCI')['id'] == 3
+    dome9.delete_ruleset(3)
+    assert dome9.indexes['CompliancePolicy'].lookup('name', 'PCI') is None
+
+
+def test_get_remediation(mocker, dome9):
+    get = mocker.patch('requests.Session.get',
+                       return_value=mocker.Mock(status_code=200, content=json.dumps([{'id': 'a'}, {'id': 'b'}]).encode()))
+    assert dome9.get_remediation('b') == {'id': 'b'}
+    assert dome9.get_remediation('a') == {'id': 'a'}
+    assert get.call_count == 1
+
+
+def test_get_exclusion(mocker, dome9):
+    def get(url, **kwargs):
+        body = {'id': 'c'} if url.endswith('/Exclusion/c') else [{'id': 'a'}, {'id': 'b'}]
+        return mocker.Mock(status_code=200, content=json.dumps(body).encode())
+    mock = mocker.patch('requests.Session.get', side_effect=get)
+    assert dome9.get_exclusion('b') == {'id': 'b'}
+    assert dome9.get_exclusion('a') == {'id': 'a'}
+    assert mock.call_count == 1
+    assert dome9.get_exclusion('c') == {'id': 'c'}
+    assert mock.call_args[1]['url'].endswith('/Exclusion/c')
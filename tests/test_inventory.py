@@ -0,0 +1,55 @@
+import json
+import pytest
+from dome9.inventory import AssetInventory, sync_scope
+from . import dome9
+
+
+def _asset(n, region='us_east_1', **fields):
+    asset = {'id': 'a-%d' % n, 'entityId': 'e-%d' % n, 'cloudAccountId': 'acc-%d' % (n % 2), 'type': 'Instance',
+             'region': region, 'platform': 'aws', 'tags': [{'key': 'n', 'value': str(n)}]}
+    asset.update(fields)
+    return asset
+
+
+def test_sync_and_query():
+    inventory = AssetInventory()
+    stats = inventory.sync([[_asset(n) for n in range(3)], [_asset(3, region='eu_west_1', type='Lambda')]])
+    assert stats == {'added': 4, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+    assert inventory.count() == 4
+    assert [a['id'] for a in inventory.query(cloudAccountId='acc-1')] == ['a-1', 'a-3']
+    assert [a['id'] for a in inventory.query(type=['Lambda', 'Function'])] == ['a-3']
+    assert inventory.count_by('region') == {'us_east_1': 3, 'eu_west_1': 1}
+    assert inventory.get('a-0')['tags'] == [{'key': 'n', 'value': '0'}]
+    with pytest.raises(ValueError):
+        inventory.query(tags='x')
+
+
+def test_incremental_sync_tracks_deletions():
+    inventory = AssetInventory()
+    inventory.sync([[_asset(n) for n in range(4)]])
+    stats = inventory.sync([[_asset(0), _asset(1, name='renamed'), _asset(4)]])
+    assert stats == {'added': 1, 'updated': 1, 'unchanged': 1, 'deleted': 2}
+    assert inventory.get('a-1')['name'] == 'renamed'
+    assert inventory.get('a-2') is None
+    assert sorted(a['id'] for a in inventory.deleted()) == ['a-2', 'a-3']
+    assert len(inventory.query(includeDeleted=True)) == 5
+
+    # A scoped sync only deletes assets of its scope, a reappearing asset is restored
+    stats = inventory.sync([[_asset(2)]], scope={'cloudAccountId': ['acc-0']})
+    assert stats['added'] == 1 and stats['deleted'] == 2
+    assert sorted(a['id'] for a in inventory.query()) == ['a-1', 'a-2']
+
+
+def test_sync_scope():
+    assert sync_scope('', [{'name': 'region', 'value': 'x'}, {'name': 'region', 'value': 'y'}]) == {'region': ['x', 'y']}
+    assert sync_scope('prod', []) is None
+    assert sync_scope('', [{'name': 'organizationalUnitId', 'value': 'x'}]) is None
+
+
+def test_sync_inventory(mocker, dome9):
+    page = {'assets': [_asset(0), _asset(1)], 'totalCount': 2, 'searchAfter': None}
+    mocker.patch('requests.Session.post', return_value=mocker.Mock(status_code=200, content=json.dumps(page).encode()))
+    inventory = AssetInventory()
+    assert dome9.sync_inventory(inventory)['added'] == 2
+    assert dome9.sync_inventory(inventory, textSearch='x')['unchanged'] == 2
+    assert inventory.count(platform='aws') == 2
@@ -0,0 +1,90 @@
+import json
+import threading
+from datetime import timedelta
+import pytest
+from dome9 import AdaptiveConcurrency, Dome9
+from dome9.metrics import Histogram, MetricsCollector
+from dome9.retry import RetryPolicy
+from dome9.routes import route_template
+from .test_aio import asyncmock, run
+
+
+def test_route_template():
+    assert route_template('CompliancePolicy/123') == 'CompliancePolicy/{id}'
+    assert route_template('CompliancePolicy') == 'CompliancePolicy'
+    assert route_template('Compliance/Remediation?id=5') == 'Compliance/Remediation?id={id}'
+    assert route_template('protected-asset/search') == 'protected-asset/search'
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 3))
+    for value in [0.5] * 50 + [1.5] * 40 + [2.5] * 10:
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == pytest.approx(1.0)
+    assert 1 < histogram.quantile(0.9) <= 2
+    assert histogram.quantile(1) == 2.5
+
+
+def test_hooks(mocker):
+    metrics = MetricsCollector()
+    before = []
+    dome9 = Dome9('U53RN4M3', 'P455W0RD', retry=RetryPolicy(backoffFactor=0),
+                  hooks={'before': before.append, 'after': [metrics]})
+    responses = [mocker.Mock(status_code=503, headers={}, content=b''),
+                 mocker.Mock(status_code=200, headers={}, content=b'{"id": 1}')]
+    mocker.patch('requests.Session.get', side_effect=responses)
+    dome9.get_ruleset(123)
+
+    info = before[0]
+    assert (info.method, info.template, info.status, info.attempts) == ('get', 'CompliancePolicy/{id}', 200, 2)
+    assert info.bytesIn == 9
+    assert set(info.timings) == {'wait', 'ttfb', 'download', 'decode', 'total'}
+    stats = metrics.snapshot()['GET CompliancePolicy/{id}']
+    assert stats['count'] == 1 and stats['retries'] == 1 and stats['errors'] == 0
+
+    mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=404, reason='Not Found', content=b''))
+    with pytest.raises(Exception):
+        dome9.get_ruleset(123)
+    assert metrics.snapshot()['GET CompliancePolicy/{id}']['errors'] == 1
+    assert metrics.slowest(1)[0][0] == 'GET CompliancePolicy/{id}'
+
+
+def test_unknown_hook():
+    with pytest.raises(ValueError):
+        Dome9('U53RN4M3', 'P455W0RD', hooks={'response': print})
+
+
+def test_async_hooks(mocker):
+    from dome9 import AsyncDome9
+    metrics = MetricsCollector()
+    adome9 = AsyncDome9('U53RN4M3', 'P455W0RD', hooks={'after': metrics})
+    asyncmock(mocker, body=[{'id': 1}])
+    run(adome9.list_rulesets())
+    stats = metrics.snapshot()['GET CompliancePolicy']
+    assert stats['count'] == 1 and stats['bytesIn'] == len(json.dumps([{'id': 1}]))
+
+
+def test_prometheus_exporter(mocker):
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from dome9.metrics import PrometheusExporter
+    registry = prometheus_client.CollectorRegistry()
+    dome9 = Dome9('U53RN4M3', 'P455W0RD', hooks={'after': PrometheusExporter(registry=registry)})
+    mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=b'[]'))
+    dome9.list_users()
+    labels = {'method': 'GET', 'route': 'user', 'status': '200'}
+    assert registry.get_sample_value('dome9_request_duration_seconds_count', labels) == 1
+    assert registry.get_sample_value('dome9_request_bytes_in_total', labels) == 2
+
+
+def test_concurrency_wait_is_not_download(mocker):
+    requests = []
+    dome9 = Dome9('U53RN4M3', 'P455W0RD', concurrency=AdaptiveConcurrency(initial=1, minLimit=1),
+                  hooks={'after': requests.append})
+    mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=b'{"id": 1}',
+                                                                  elapsed=timedelta(milliseconds=1)))
+    started = dome9.concurrency.acquire('CompliancePolicy')
+    threading.Timer(0.1, dome9.concurrency.release, ('CompliancePolicy', started, False)).start()
+    dome9.get_ruleset(1)
+    timings = requests[0].timings
+    assert timings['wait'] >= 0.09
+    assert timings['download'] < 0.05
@@ -0,0 +1,77 @@
+import json
+import time
+import pytest
+from dome9 import Dome9, Dome9Pool, PartialResultError, RateLimiter
+
+
+def _get(mocker):
+    def get(url, auth=None, **kwargs):
+        if auth[0] == 'broken':
+            return mocker.Mock(status_code=401, reason='Unauthorized', content=b'', headers={})
+        body = [{'id': '%s-%d' % (auth[0], n)} for n in range(2)]
+        return mocker.Mock(status_code=200, content=json.dumps(body).encode())
+    return mocker.patch('requests.Session.get', side_effect=get)
+
+
+def test_clients_are_reused_and_share_the_transport():
+    with Dome9Pool(maxConnections=4) as pool:
+        pool.add_tenant('a', 'key-a', 'secret')
+        client = pool.get('a')
+        assert pool.client('key-a', 'secret') is client
+        assert pool.client('key-b', 'secret') is not client
+        assert pool.client('key-b', 'secret').transport is client.transport is pool.shared
+        assert client.transport.transport is pool.transport
+        assert pool.transport.session.adapters['https://']._pool_block
+
+
+def test_eviction():
+    pool = Dome9Pool(maxIdle=0.05, maxClients=2)
+    first = pool.client('k1', 's')
+    pool.client('k2', 's')
+    pool.client('k1', 's')
+    pool.client('k3', 's')
+    assert [identity[1] for identity in pool.clients] == ['k1', 'k3']
+    assert pool.client('k1', 's') is first
+    time.sleep(0.06)
+    assert pool.evict_idle() == 2
+
+
+def test_clients_do_not_close_the_shared_transport(mocker):
+    close = mocker.patch('requests.Session.close')
+    closed = []
+
+    class Client(Dome9):
+        def close(self):
+            closed.append(self.key)
+            super(Client, self).close()
+    pool = Dome9Pool(maxClients=1, factory=lambda key, secret, endpoint, transport: Client(key, secret, transport=transport))
+    with pool.client('k1', 's'):
+        pass
+    assert not close.called
+    pool.client('k2', 's')
+    assert closed == ['k1', 'k1']
+    pool.close()
+    assert closed == ['k1', 'k1', 'k2'] and close.call_count == 1
+
+
+def test_factory():
+    def factory(key, secret, endpoint, transport):
+        return Dome9(key, secret, endpoint=endpoint, transport=transport, rateLimiter=RateLimiter(default=10))
+    pool = Dome9Pool(factory=factory)
+    assert pool.client('k1', 's').rateLimiter is not pool.client('k2', 's').rateLimiter
+    assert Dome9Pool(readTimeout=5).client('k', 's').timeout == (10, 5)
+
+
+def test_gather(mocker):
+    _get(mocker)
+    pool = Dome9Pool()
+    for name in ('a', 'b', 'broken'):
+        pool.add_tenant(name, name, 'secret')
+    outcomes = pool.map('list_rulesets')
+    assert list(outcomes) == ['a', 'b', 'broken'] and not outcomes['broken'].ok
+    assert pool.gather('list_rulesets', tenants=['a', 'b']) == [
+        {'id': 'a-0', 'tenant': 'a'}, {'id': 'a-1', 'tenant': 'a'}, {'id': 'b-0', 'tenant': 'b'}, {'id': 'b-1', 'tenant': 'b'}]
+    with pytest.raises(PartialResultError) as error:
+        pool.gather(lambda name, client: client.list_rulesets())
+    assert list(error.value.errors) == ['broken'] and len(error.value.results) == 4
+    assert len(pool.gather('get_ruleset', args=(1,), strict=False)) == 4
@@ -0,0 +1,64 @@
+import json
+import os
+import time
+import threading
+from multiprocessing import Process
+from dome9 import Dome9, RateLimiter
+from dome9.ratelimit import TokenBucket, FileTokenBucket
+from dome9.routes import route_family
+
+
+def test_route_family():
+    assert route_family('CompliancePolicy/1234') == 'CompliancePolicy'
+    assert route_family('protected-asset/search') == 'protected-asset/search'
+    assert route_family('Compliance/Remediation?id=1') == 'Compliance/Remediation'
+    assert route_family('CloudAccounts') == 'CloudAccounts'
+
+
+def test_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert 0.09 < bucket.reserve() <= 0.1
+    assert 0.19 < bucket.reserve() <= 0.2
+
+
+def test_bucket_shared_by_threads():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.time()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert time.time() - start >= 19 / 50.0
+
+
+def _drain(path):
+    bucket = FileTokenBucket(path, rate=1, capacity=3)
+    for _ in range(3):
+        bucket.reserve()
+
+
+def test_file_bucket_shared_by_processes(tmp_path):
+    path = str(tmp_path / 'search.bucket')
+    proc = Process(target=_drain, args=(path,))
+    proc.start()
+    proc.join()
+    assert FileTokenBucket(path, rate=1, capacity=3).reserve() > 0.9
+
+
+def test_limiter_per_family(tmp_path):
+    limiter = RateLimiter(limits={'protected-asset/search': (1, 1)}, path=str(tmp_path))
+    assert limiter.reserve('protected-asset/search') == 0
+    assert limiter.reserve('protected-asset/search') > 0.9
+    assert limiter.reserve('CloudAccounts') == 0
+    assert os.listdir(str(tmp_path)) == ['protected-asset_search.bucket']
+
+
+def test_client_waits_for_limiter(mocker):
+    limiter = RateLimiter(default=(1000, 1))
+    acquire = mocker.spy(limiter, 'acquire')
+    mocker.patch('requests.Session.get', return_value=mocker.Mock(status_code=200, content=json.dumps([]).encode()))
+    d9 = Dome9('U53RN4M3', 'P455W0RD', rateLimiter=limiter)
+    d9.list_rulesets()
+    d9.list_users()
+    assert [c.args[0] for c in acquire.call_args_list] == ['CompliancePolicy', 'user']
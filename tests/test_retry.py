@@ -0,0 +1,92 @@
+import json
+import pytest
+import requests
+from dome9 import Dome9
+from dome9.exceptions import Dome9APIError
+from dome9.retry import RetryPolicy, parse_retry_after
+
+
+@pytest.fixture
+def dome9():
+    return Dome9('U53RN4M3', 'P455W0RD', retry=RetryPolicy(maxAttempts=3, backoffFactor=0))
+
+
+def response(mocker, status_code, body=None, headers=None):
+    return mocker.Mock(status_code=status_code, reason='reason', headers=headers or {},
+                       content=json.dumps(body).encode())
+
+
+def test_backoff_is_exponential_and_capped():
+    policy = RetryPolicy(backoffFactor=1, maxBackoff=5, jitter=False)
+    assert [policy.delay(n) for n in (1, 2, 3, 4)] == [1, 2, 4, 5]
+
+
+def test_jitter_stays_below_backoff():
+    policy = RetryPolicy(backoffFactor=2)
+    assert all(0 <= policy.delay(2) <= 4 for _ in range(50))
+
+
+def test_retry_after_has_precedence():
+    policy = RetryPolicy(backoffFactor=1, jitter=False)
+    assert policy.delay(1, '7') == 7
+    assert policy.delay(1, '86400') == 30
+    assert RetryPolicy(maxBackoff=5).delay(1, 'Wed, 21 Oct 2099 07:28:00 GMT') == 5
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+
+def test_idempotency():
+    policy = RetryPolicy()
+    assert policy.should_retry(1, 'get', 'CloudAccounts', 503)
+    assert policy.should_retry(1, 'post', 'protected-asset/search', 503)
+    assert not policy.should_retry(1, 'post', 'CompliancePolicy', 503)
+    assert policy.should_retry(1, 'post', 'CompliancePolicy', 429)
+    assert not policy.should_retry(1, 'get', 'CloudAccounts', 404)
+    assert not policy.should_retry(3, 'get', 'CloudAccounts', 503)
+
+
+def test_request_retries_throttled_calls(mocker, dome9):
+    mock = mocker.patch('requests.Session.get', side_effect=[
+        response(mocker, 429, headers={'Retry-After': '0'}),
+        response(mocker, 503),
+        response(mocker, 200, {'foo': 'bar'})])
+    assert dome9._get('CloudAccounts') == {'foo': 'bar'}
+    assert mock.call_count == 3
+
+
+def test_request_gives_up(mocker, dome9):
+    mock = mocker.patch('requests.Session.get', return_value=response(mocker, 502))
+    with pytest.raises(Dome9APIError) as ex:
+        dome9._get('CloudAccounts')
+    assert ex.value.code == 502
+    assert mock.call_count == 3
+
+
+def test_unsafe_post_is_not_retried(mocker, dome9):
+    mock = mocker.patch('requests.Session.post', return_value=response(mocker, 500))
+    with pytest.raises(Dome9APIError):
+        dome9.create_ruleset({'name': 'x'})
+    assert mock.call_count == 1
+
+
+def test_connection_errors_are_retried(mocker, dome9):
+    mock = mocker.patch('requests.Session.get', side_effect=[
+        requests.ConnectionError('reset'), response(mocker, 200, {'foo': 'bar'})])
+    assert dome9._get('CloudAccounts') == {'foo': 'bar'}
+    assert mock.call_count == 2
+
+
+def test_asset_scan_can_be_resumed(mocker, dome9):
+    first = {'assets': [{'id': '1'}], 'searchAfter': ['c1']}
+    last = {'assets': [{'id': '2'}], 'searchAfter': None}
+    mocker.patch('requests.Session.post', side_effect=[response(mocker, 200, first)] + [response(mocker, 503)] * 3)
+    seen = []
+    with pytest.raises(Dome9APIError) as ex:
+        for asset in dome9.iter_protected_assets():
+            seen.append(asset['id'])
+    assert seen == ['1']
+    assert ex.value.searchAfter == ['c1']
+
+    post = mocker.patch('requests.Session.post', return_value=response(mocker, 200, last))
+    seen.extend(a['id'] for a in dome9.iter_protected_assets(searchAfter=ex.value.searchAfter))
+    assert seen == ['1', '2']
+    assert json.loads(post.call_args.kwargs['data'])['searchAfter'] == ['c1']
@@ -0,0 +1,87 @@
+import json
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from dome9 import Dome9, MetricsCollector
+from dome9.singleflight import SingleFlight
+
+
+def _blocking_get(mocker):
+    # Answers once released
+    release = threading.Event()
+
+    def get(url, **kwargs):
+        release.wait(5)
+        return mocker.Mock(status_code=200, content=json.dumps({'id': url.rsplit('/', 1)[1]}).encode())
+    return release, mocker.patch('requests.Session.get', side_effect=get)
+
+
+def test_identical_gets_are_coalesced(mocker):
+    metrics = MetricsCollector()
+    d9 = Dome9('U53RN4M3', 'P455W0RD', hooks={'after': metrics})
+    release, mock = _blocking_get(mocker)
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(d9.get_ruleset, 1) for _ in range(8)]
+        while d9.singleFlight.stats()['calls'] < 8:
+            pass
+        release.set()
+        results = [future.result() for future in futures]
+    assert mock.call_count == 1
+    assert results == [{'id': '1'}] * 8
+    assert len(set(map(id, results))) == 8
+    assert d9.singleFlight.stats() == {'calls': 8, 'coalesced': 7, 'inFlight': 0}
+    assert metrics.snapshot()['GET CompliancePolicy/{id}']['coalesced'] == 7
+
+
+def test_disabled(mocker):
+    d9 = Dome9('U53RN4M3', 'P455W0RD', singleFlight=False)
+    release, mock = _blocking_get(mocker)
+    release.set()
+    d9.get_ruleset(1)
+    assert d9.singleFlight is None and mock.call_count == 1
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError('boom')
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'k', fail)
+        started.wait(5)
+        waiter = pool.submit(flight.do, 'k', lambda: 'unused')
+        while flight.stats()['coalesced'] < 1:
+            pass
+        release.set()
+        for future in (leader, waiter):
+            with pytest.raises(ValueError):
+                future.result()
+    assert flight.do('k', lambda: 1) == (1, False)
+
+
+def test_writes_detach_gets_in_flight(mocker):
+    d9 = Dome9('U53RN4M3', 'P455W0RD')
+    started, release = threading.Event(), threading.Event()
+    bodies = iter([b'{"id": "1", "name": "old"}', b'{"id": "1", "name": "new"}'])
+
+    def get(url, **kwargs):
+        content = next(bodies)
+        if content.endswith(b'"old"}'):
+            started.set()
+            release.wait(5)
+        return mocker.Mock(status_code=200, content=content)
+    mock = mocker.patch('requests.Session.get', side_effect=get)
+    mocker.patch('requests.Session.put', return_value=mocker.Mock(status_code=200, content=b'{"id": "1", "name": "new"}'))
+    with ThreadPoolExecutor(1) as pool:
+        before = pool.submit(d9.get_ruleset, 1)
+        started.wait(5)
+        d9.update_ruleset({'id': '1', 'name': 'new'})
+        assert d9.get_ruleset(1) == {'id': '1', 'name': 'new'}
+        release.set()
+        assert before.result() == {'id': '1', 'name': 'old'}
+    assert mock.call_count == 2
+    assert d9.singleFlight.stats() == {'calls': 2, 'coalesced': 0, 'inFlight': 0}
@@ -0,0 +1,62 @@
+import json
+import pytest
+from dome9.streaming import EntityResultParser, iter_entity_results
+from . import dome9
+
+
+def _result(tests=3, entities=50, ruleFirst=False):
+    result = {'request': {'region': 'eu_west_1'}, 'tests': [], 'testEntities': {'instance': [{'id': '"]}'}] * 20}, 'id': 7}
+    for t in range(tests):
+        rule = {'name': 'rule-%d' % t, 'severity': 'High'}
+        entityResults = [{'isRelevant': True, 'isValid': bool(e % 2), 'isExcluded': False,
+                          'testObj': {'id': 'i-%d-%d' % (t, e), 'entityType': 'Instance', 'blob': 'x' * 100}}
+                         for e in range(entities)]
+        test = {'rule': rule, 'entityResults': entityResults} if ruleFirst else {'entityResults': entityResults, 'rule': rule}
+        result['tests'].append(test)
+    return result
+
+
+def _chunks(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize('size', [1, 17, 4096])
+@pytest.mark.parametrize('ruleFirst', [True, False])
+def test_parser_matches_json(size, ruleFirst):
+    result = _result(ruleFirst=ruleFirst)
+    expected = [(t['rule'], e) for t in result['tests'] for e in t['entityResults']]
+    meta = {}
+    records = list(iter_entity_results(_chunks(json.dumps(result).encode(), size), includeTestObj=True, meta=meta))
+    assert records == expected
+    assert meta == {'request': {'region': 'eu_west_1'}, 'id': 7}
+
+
+def test_parser_projection():
+    data = json.dumps(_result(tests=1, entities=2)).encode()
+    records = list(iter_entity_results([data]))
+    assert records[0][1]['testObj'] == {'id': 'i-0-0', 'entityType': 'Instance'}
+    records = list(iter_entity_results([data], fields=['isValid', 'testObj.id']))
+    assert records[1][1] == {'isValid': True, 'testObj': {'id': 'i-0-1'}}
+
+
+def test_parser_yields_before_the_end():
+    data = json.dumps(_result(tests=1, entities=1000, ruleFirst=True)).encode()
+    parser = EntityResultParser()
+    assert len(parser.feed(data[:len(data) // 2])) > 400
+
+
+def test_parser_truncated():
+    data = json.dumps(_result()).encode()
+    with pytest.raises(ValueError):
+        list(iter_entity_results([data[:-10]]))
+
+
+def test_iter_assessment(mocker, dome9):
+    data = open('tests/mocks/AssessmentResult.json', 'rb').read()
+    res = mocker.Mock(status_code=200, iter_content=lambda size: _chunks(data, size))
+    get = mocker.patch('requests.Session.get', return_value=res)
+    records = list(dome9.iter_assessment('1234', fields=['isValid']))
+    expected = [(t['rule'], {'isValid': e['isValid']}) for t in json.loads(data)['tests'] for e in t['entityResults']]
+    assert records == expected
+    assert get.call_args.kwargs['stream'] is True
+    assert res.close.called
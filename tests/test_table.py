@@ -0,0 +1,46 @@
+import json
+from dome9.table import AssessmentTable
+
+
+def _result():
+    tests = []
+    for n, severity in enumerate(['High', 'Low']):
+        entityResults = [
+            {'isRelevant': True, 'isValid': False, 'isExcluded': False, 'testObj': {'id': 'i-1', 'region': 'eu'}},
+            {'isRelevant': True, 'isValid': True, 'isExcluded': False, 'testObj': {'id': 'i-2'}},
+            {'isRelevant': True, 'isValid': False, 'isExcluded': True, 'testObj': {'id': 'i-3', 'region': 'eu'}},
+            {'isRelevant': False, 'isValid': True, 'isExcluded': False, 'testObj': {'id': 'i-4', 'region': 'us'}},
+        ]
+        tests.append({'rule': {'name': 'rule-%d' % n, 'ruleId': 'R%d' % n, 'severity': severity},
+                      'entityResults': entityResults})
+    return {'request': {'region': 'ap'}, 'tests': tests}
+
+
+def test_columns():
+    table = AssessmentTable.from_result(_result())
+    assert len(table) == 8
+    assert table.column('region')[:4] == ['eu', 'ap', 'eu', 'us']
+    assert table.column('status')[:4] == ['failed', 'passed', 'excluded', 'irrelevant']
+    assert table.column('rule')[4] == 'R1'
+    assert table.rules[1]['name'] == 'rule-1'
+
+
+def test_count_by():
+    table = AssessmentTable.from_result(_result())
+    assert table.count_by('severity', status='failed') == {'High': 1, 'Low': 1}
+    assert table.count_by('region', 'isExcluded')[('eu', True)] == 2
+    assert table.count_by('status', severity='Critical') == {}
+
+
+def test_filter_and_summary():
+    table = AssessmentTable.from_result(_result()).filter(region='eu')
+    assert len(table) == 4
+    assert table.column('entityId') == ['i-1', 'i-3', 'i-1', 'i-3']
+    assert table.summary()['High'] == {'passed': 0, 'failed': 1, 'excluded': 1, 'irrelevant': 0}
+    assert AssessmentTable.from_result(_result()).summary()['Low']['passed'] == 1
+
+
+def test_from_mock_records():
+    result = json.loads(open('tests/mocks/AssessmentResult.json').read())
+    table = AssessmentTable.from_result(result)
+    assert len(table) == sum(len(t['entityResults']) for t in result['tests'])